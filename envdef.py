@@ -26,6 +26,12 @@ env.zookeeper('127.0.0.1', 2181)
 env.workdir('/tmp')
 env.cluster_prefix('sample')
 #env.remote_process_timeout(300)
+#env.snapshot_dir('/tmp/jubatest-snapshot')
+#env.instrument_clients(True, count_bytes=False)
+#env.interpose_clients(True)
+#env.output_limit(16 * 1024 * 1024)
+#env.spool_logs(True)
+#env.benchmark_baseline('/tmp/jubatest-baseline.json')
 
 ###
 ### Test Parameters
@@ -35,3 +41,6 @@ basedir = '/home/jubatus/Development'
 env.param('JUBATUS_TUTORIAL_DIR', basedir + '/jubatus-tutorial-python')
 env.param('JUBATUS_BENCH_CLASSIFIER', basedir + '/jubatus-benchmark/jubatus-bench-classifier')
 env.param('JUBATUS_BENCH_CLASSIFIER_DATASET', basedir + '/jubatus-benchmark/url_svmlight/Day0.svm')
+#env.param('JUBATEST_SCALING_MAX_SERVERS', 8)
+#env.param('JUBATEST_BENCHMARK_DURATION', 10)
+#env.param('JUBATEST_SOAK_DURATION', 4 * 3600)
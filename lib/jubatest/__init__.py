@@ -1,4 +1,5 @@
 # -*- coding: utf-8 -*-
 
-from .unit import JubaTestCase
+from .unit import JubaTestCase, JubaBenchmarkCase
+from .soak import JubaSoakCase
 from .constants import *
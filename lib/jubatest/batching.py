@@ -0,0 +1,188 @@
+# -*- coding: utf-8 -*-
+
+"""
+Client-side batching of update RPCs (e.g. `train`).
+"""
+
+import time
+
+from .pipeline import PipelinedClient
+from .unit import JubaTestFixtureFailedError
+from .logger import log
+
+class BatchingWriter(object):
+    """
+    Buffers records and sends them as batches through the RPC method that
+    takes a list (e.g. `train`, `push`, `add_documents`).
+
+    A batch is flushed when `batch_size` records are buffered, or when a
+    record is added `flush_interval` seconds or later after the first
+    buffered one.  The interval is only checked on `add`, as clients are not
+    thread-safe and nothing is sent in the background: a partial batch stays
+    buffered while the producer pauses, so call `flush` before pausing.
+    Failed batches raise JubaTestFixtureFailedError (with the pipelined
+    client, on a later `add` or `flush`).
+    With the pipelined client (see `JubaRPCServer.get_async_client`), up to
+    `max_in_flight` batches are sent concurrently; with the synchronous
+    client, each batch is sent in turn.
+
+    When `adaptive` is True, the batch size is tuned every `adapt_window`
+    completed batches by hill climbing on the measured throughput
+    (records/sec), within [`min_batch_size`, `max_batch_size`]; the batch
+    size is reduced whenever the batch latency exceeds `latency_bound`
+    (seconds).  The batch sizes chosen are kept in `history`.
+    """
+
+    ADAPT_FACTOR = 1.5
+
+    def __init__(self, client, method='train', batch_size=100, flush_interval=1.0, max_in_flight=4,
+                 adaptive=True, min_batch_size=1, max_batch_size=10000, latency_bound=None, adapt_window=8):
+        self._client = client
+        self._method = getattr(client, method)
+        self._pipelined = isinstance(client, PipelinedClient)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_in_flight = max_in_flight
+        self.adaptive = adaptive
+        self.min_batch_size = min_batch_size
+        self.max_batch_size = max_batch_size
+        self.latency_bound = latency_bound
+        self.adapt_window = adapt_window
+
+        self.flushes = 0
+        self.records = 0
+        self.history = [] # list of (batch size, throughput, max latency) of each window
+        self._buffer = []
+        self._buffer_since = None
+        self._in_flight = []
+        self._error = None
+        self._direction = 1
+        self._last_throughput = None
+        self._new_window()
+
+    def add(self, record):
+        """
+        Adds the record; may flush the buffered records.
+        """
+        self._check_error()
+        if not self._buffer:
+            self._buffer_since = time.time()
+        self._buffer.append(record)
+        if self.batch_size <= len(self._buffer) or self.flush_interval <= time.time() - self._buffer_since:
+            self._send()
+
+    def extend(self, records):
+        for record in records:
+            self.add(record)
+
+    def flush(self):
+        """
+        Sends the buffered records and waits for all batches to complete.
+        """
+        if self._buffer:
+            self._send()
+        self._wait(0)
+        self._check_error()
+
+    def close(self):
+        """
+        Flushes the records and closes the client.
+        """
+        try:
+            self.flush()
+        finally:
+            self._client.get_client().close()
+
+    def chosen_batch_sizes(self):
+        """
+        Returns the list of batch sizes used in each adaptation window.
+        """
+        return [size for (size, throughput, latency) in self.history]
+
+    def to_record(self, prefix='batching.'):
+        """
+        Returns the summary as dict, to be attached to the test case.
+        """
+        record = {
+            prefix + 'batch_size': self.batch_size,
+            prefix + 'flushes': self.flushes,
+            prefix + 'records': self.records,
+            prefix + 'windows': len(self.history),
+        }
+        if self.flushes:
+            record[prefix + 'mean_batch_size'] = float(self.records) / self.flushes
+        if self.history:
+            (size, throughput, latency) = max(self.history, key=lambda h: h[1])
+            record[prefix + 'best_batch_size'] = size
+            record[prefix + 'best_throughput'] = throughput
+        return record
+
+    def _send(self):
+        batch = self._buffer
+        self._buffer = []
+        self._buffer_since = None
+        self.flushes += 1
+        self.records += len(batch)
+        if self._pipelined:
+            self._wait(self.max_in_flight - 1)
+            future = self._method(batch)
+            future.add_done_callback(lambda f: self._on_done(f, len(batch)))
+            self._in_flight.append(future)
+        else:
+            begin = time.time()
+            try:
+                self._method(batch)
+            except Exception as e:
+                raise JubaTestFixtureFailedError('batch failed: %s' % e)
+            self._completed(len(batch), time.time() - begin)
+
+    def _wait(self, limit):
+        while limit < len(self._in_flight):
+            self._in_flight[0].wait()
+            self._in_flight = [f for f in self._in_flight if not f.done()]
+
+    def _on_done(self, future, records):
+        if future.error() is not None:
+            if self._error is None:
+                self._error = future.error()
+            return
+        self._completed(records, future.latency())
+
+    def _check_error(self):
+        if self._error is not None:
+            error = self._error
+            self._error = None
+            raise JubaTestFixtureFailedError('batch failed: %s' % error)
+
+    def _completed(self, records, latency):
+        w = self._window
+        w['records'] += records
+        w['batches'] += 1
+        w['latency'] = max(w['latency'], latency)
+        if self.adaptive and self.adapt_window <= w['batches']:
+            self._adapt()
+
+    def _new_window(self):
+        self._window = {'begin': time.time(), 'records': 0, 'batches': 0, 'latency': 0.0}
+
+    def _adapt(self):
+        w = self._window
+        elapsed = time.time() - w['begin']
+        throughput = w['records'] / elapsed if elapsed else float('inf')
+        self.history.append((self.batch_size, throughput, w['latency']))
+        if self.latency_bound is not None and self.latency_bound < w['latency']:
+            self._direction = -1
+            self._last_throughput = None
+        elif self._last_throughput is None:
+            self._direction = 1
+            self._last_throughput = throughput
+        else:
+            if throughput < self._last_throughput:
+                self._direction = -self._direction
+            self._last_throughput = throughput
+        size = int(round(self.batch_size * self.ADAPT_FACTOR ** self._direction))
+        if size == self.batch_size:
+            size += self._direction
+        self.batch_size = max(self.min_batch_size, min(self.max_batch_size, size))
+        log.debug('batch size: %d (throughput %f records/sec, latency %f sec)', self.batch_size, throughput, w['latency'])
+        self._new_window()
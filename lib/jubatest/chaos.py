@@ -0,0 +1,188 @@
+# -*- coding: utf-8 -*-
+
+"""
+Fault injection into RPC servers while the load is running.
+"""
+
+import time
+import threading
+from collections import namedtuple
+
+from .stats import Histogram
+from .unit import JubaTestFixtureFailedError
+from .logger import log
+
+FaultEvent = namedtuple('FaultEvent', ['time', 'action', 'server', 'error'])
+
+class FaultSchedule(object):
+    """
+    Schedule of faults injected into RPC servers (servers or proxies).
+    Each fault is an action (one of ACTIONS, i.e. the method of the RPC
+    server to call) at the time in seconds from the start of the schedule;
+    `start` restarts the server stopped by `kill` or `stop`.
+    Injected faults are recorded as FaultEvent in `events`.
+    """
+
+    ACTIONS = ('kill', 'stop', 'pause', 'resume', 'start')
+
+    def __init__(self):
+        self.faults = []
+        self.events = []
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def add(self, at, action, server):
+        if action not in self.ACTIONS:
+            raise JubaTestFixtureFailedError('unknown fault action: %s' % action)
+        self.faults.append((at, action, server))
+        self.faults.sort(key=lambda f: f[0])
+        return self
+
+    def start(self):
+        self.begin = time.time()
+        self._thread = threading.Thread(target=self._run)
+        self._thread.daemon = True
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """
+        Waits for the faults in progress; faults not injected yet are cancelled.
+        """
+        if self._thread is None:
+            return
+        self._stopped.set()
+        self._thread.join()
+        self._thread = None
+
+    def _run(self):
+        for (at, action, server) in self.faults:
+            delay = self.begin + at - time.time()
+            if 0 < delay and self._stopped.wait(delay):
+                break
+            if self._stopped.is_set():
+                break
+            timestamp = time.time()
+            log.debug('injecting fault: %s %s', action, server.__class__.__name__)
+            error = None
+            try:
+                getattr(server, action)()
+            except Exception as e:
+                log.warning('failed to inject fault %s (%s)', action, e)
+                error = str(e)
+            self.events.append(FaultEvent(timestamp, action, server, error))
+
+def run_chaos(generator, schedule, duration, interval=1.0):
+    """
+    Runs the LoadGenerator for `duration` seconds while injecting the faults
+    of the FaultSchedule.  Returns ChaosResult with the timeline of the load
+    aggregated per `interval` seconds.
+    """
+    generator.timeline_interval = interval
+    schedule.start()
+    try:
+        load = generator.run(duration=duration)
+    finally:
+        schedule.stop()
+    return ChaosResult(load, schedule.events)
+
+class ChaosResult(object):
+    """
+    Result of the load with faults injected.
+
+    Throughput and latency before the fault are the baseline; the recovery
+    time is the time from the fault until the throughput gets back to
+    `threshold` of the baseline and stays there for `window` intervals.
+    The resolution is the timeline interval of the load.
+    Faults are specified as FaultEvent or the time (UNIX time) of the fault.
+    """
+
+    def __init__(self, load, events):
+        self.load = load
+        self.events = events
+
+    def error_rate(self):
+        total = self.load.calls + self.load.error_count()
+        if total == 0:
+            return 0.0
+        return float(self.load.error_count()) / total
+
+    def baseline(self, before):
+        """
+        Returns tuple of (throughput, latency Histogram) of the intervals
+        completed before the time, excluding the first (partial) interval.
+        """
+        points = [p for p in self.load.timeline_points()[1:] if p[0] + self.load.timeline_interval <= before]
+        latency = Histogram()
+        for p in points:
+            latency.merge(p[4])
+        if not points:
+            return (None, latency)
+        return (sum([p[2] for p in points]) / float(len(points) * self.load.timeline_interval), latency)
+
+    def recovery_time(self, event=None, threshold=0.9, window=3):
+        """
+        Returns seconds to recover from the fault (the first event by
+        default), or None if not recovered or no baseline is available.
+        """
+        fault_time = self._fault_time(event)
+        (baseline, latency) = self.baseline(fault_time)
+        if not baseline:
+            return None
+        interval = self.load.timeline_interval
+        # the last interval is partial
+        points = [p for p in self.load.timeline_points()[:-1] if fault_time <= p[0] + interval]
+        for i in range(len(points) - window + 1):
+            if all([threshold * baseline <= p[2] / float(interval) for p in points[i:i + window]]):
+                return max(0.0, points[i][0] - fault_time)
+        return None
+
+    def peak_latency(self, event=None, percentile=99):
+        """
+        Returns the highest latency (at the percentile, in seconds) of the
+        intervals after the fault (the first event by default).
+        """
+        fault_time = self._fault_time(event)
+        interval = self.load.timeline_interval
+        latencies = [p[4].percentile(percentile) for p in self.load.timeline_points() if fault_time <= p[0] + interval and p[4].count]
+        if not latencies:
+            return None
+        return max(latencies)
+
+    def errors_after(self, event=None):
+        """
+        Returns number of errors in the intervals after the fault (the first event by default).
+        """
+        fault_time = self._fault_time(event)
+        interval = self.load.timeline_interval
+        return sum([p[3] for p in self.load.timeline_points() if fault_time <= p[0] + interval])
+
+    def to_record(self, prefix='chaos.'):
+        """
+        Returns the summary as dict, to be attached to the test case.
+        """
+        record = self.load.to_record(prefix + 'load.')
+        record[prefix + 'error_rate'] = self.error_rate()
+        for (i, event) in enumerate(self.events):
+            key = '%sfault%d.%s.' % (prefix, i, event.action)
+            (baseline, latency) = self.baseline(event.time)
+            if baseline is not None:
+                record[key + 'baseline_throughput'] = baseline
+                record.update(latency.summary(key + 'baseline_latency', (99,)))
+            recovery_time = self.recovery_time(event)
+            if recovery_time is not None:
+                record[key + 'recovery_sec'] = recovery_time
+            peak_latency = self.peak_latency(event)
+            if peak_latency is not None:
+                record[key + 'peak_latency_p99_ms'] = peak_latency * 1000
+            record[key + 'errors'] = self.errors_after(event)
+        return record
+
+    def _fault_time(self, event):
+        if event is None:
+            if not self.events:
+                raise JubaTestFixtureFailedError('no fault injected')
+            event = self.events[0]
+        if isinstance(event, FaultEvent):
+            return event.time
+        return event
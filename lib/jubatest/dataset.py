@@ -0,0 +1,315 @@
+# -*- coding: utf-8 -*-
+
+"""
+Dataset readers for load generation.
+
+Datasets in svmlight or CSV format are read through mmap and parsed lazily.
+Parsed records can be cached in a binary (msgpack) file next to the dataset
+(`<dataset>.jubatest`), which is rebuilt when the size or mtime of the
+dataset changes; once cached, reading datasets requires no text parsing.
+"""
+
+import os
+import csv
+import mmap
+
+import msgpack
+
+from .unit import JubaTestFixtureFailedError
+from .logger import log
+
+CACHE_SUFFIX = '.jubatest'
+CACHE_VERSION = 1
+
+def parse_svmlight_line(line):
+    """
+    Parses one line in svmlight format.
+    Returns tuple of (label, list of (feature, value)), or None for empty lines.
+    """
+    line = line.split('#', 1)[0].strip()
+    if not line:
+        return None
+    fields = line.split()
+    features = []
+    for field in fields[1:]:
+        (key, value) = field.split(':', 1)
+        features.append((key, float(value)))
+    return (fields[0], features)
+
+def parse_csv_row(header, row, label_column=0):
+    """
+    Parses one row of CSV (list of columns) with the header (list of column names).
+    Returns tuple of (label, list of (feature, value)), or None for empty rows.
+    Numeric columns are converted to float; others are left as strings.
+    """
+    if not row:
+        return None
+    if len(row) != len(header):
+        raise ValueError('expected %d columns, but got %d' % (len(header), len(row)))
+    features = []
+    for (i, (key, value)) in enumerate(zip(header, row)):
+        if i == label_column:
+            continue
+        try:
+            features.append((key, float(value)))
+        except ValueError:
+            features.append((key, value))
+    return (row[label_column], features)
+
+def read_svmlight(path):
+    """
+    Iterates over records of the svmlight file.
+    """
+    log.debug('reading svmlight dataset: %s', path)
+    try:
+        for (lineno, line) in enumerate(_read_lines(path), 1):
+            try:
+                record = parse_svmlight_line(line)
+            except ValueError:
+                raise JubaTestFixtureFailedError('invalid svmlight format at %s:%d' % (path, lineno))
+            if record:
+                yield record
+    except (IOError, OSError) as e:
+        raise JubaTestFixtureFailedError('failed to read dataset %s (%s)' % (path, e))
+
+def read_csv(path, label_column=0):
+    """
+    Iterates over records of the CSV file; the first line must be the header.
+    """
+    log.debug('reading CSV dataset: %s', path)
+    try:
+        reader = csv.reader(_read_lines(path))
+        header = next(reader, None)
+        for row in reader:
+            try:
+                record = parse_csv_row(header, row, label_column)
+            except ValueError as e:
+                raise JubaTestFixtureFailedError('invalid CSV format at %s:%d (%s)' % (path, reader.line_num, e))
+            if record:
+                yield record
+    except (IOError, OSError, csv.Error) as e:
+        raise JubaTestFixtureFailedError('failed to read dataset %s (%s)' % (path, e))
+
+def read_svmlight_batches(path, batch_size, worker=0, workers=1):
+    """
+    Iterates over batches of the svmlight file records.
+    Only every `workers`-th batch starting from `worker` is parsed and returned,
+    so that multiple workers can share the dataset.
+    """
+    log.debug('reading svmlight dataset: %s (worker %d of %d)', path, worker, workers)
+    try:
+        lines = (line for line in _read_lines(path) if line.strip() and not line.startswith('#'))
+        for (i, batch) in enumerate(read_batches(lines, batch_size)):
+            if i % workers != worker:
+                continue
+            try:
+                yield [parse_svmlight_line(line) for line in batch]
+            except ValueError:
+                raise JubaTestFixtureFailedError('invalid svmlight format in batch %d of %s' % (i, path))
+    except (IOError, OSError) as e:
+        raise JubaTestFixtureFailedError('failed to read dataset %s (%s)' % (path, e))
+
+def read_dataset(path, format=None, cache=True, label_column=0):
+    """
+    Iterates over records of the dataset (svmlight, or CSV if `format` is
+    'csv' or the file name ends with '.csv').  If `cache` is True, records
+    are read from the binary cache, which is built if not available.
+    """
+    for batch in read_dataset_batches(path, 1000, format=format, cache=cache, label_column=label_column):
+        for record in batch:
+            yield record
+
+def read_dataset_batches(path, batch_size, worker=0, workers=1, format=None, cache=True, label_column=0):
+    """
+    Iterates over batches of the dataset records.
+    Only every `workers`-th batch starting from `worker` is returned.
+    """
+    for batch in _read_raw_batches(path, batch_size, worker, workers, format, cache, label_column):
+        yield [(label, [tuple(f) for f in num_values + string_values]) for (label, num_values, string_values) in batch]
+
+def read_datum_batches(path, batch_size, worker=0, workers=1, format=None, cache=True, label_column=0, label=str, datum_class=None):
+    """
+    Iterates over batches of the dataset as lists of (label, Datum); labels
+    are converted by `label`.
+    Only every `workers`-th batch starting from `worker` is returned.
+    """
+    if datum_class is None:
+        from jubatus.common import Datum as datum_class
+    for batch in _read_raw_batches(path, batch_size, worker, workers, format, cache, label_column):
+        datums = []
+        for (l, num_values, string_values) in batch:
+            d = datum_class()
+            d.num_values = num_values
+            d.string_values = string_values
+            datums.append((label(l), d))
+        yield datums
+
+def prepare_dataset(path, format=None, label_column=0):
+    """
+    Builds the binary cache of the dataset unless it is up to date.
+    Returns the path of the cache, or None if the cache cannot be written.
+    """
+    format = _guess_format(path, format)
+    cache_path = path + CACHE_SUFFIX
+    header = _cache_header(path, format, label_column)
+    if _read_cache_header(cache_path) == header:
+        log.debug('using dataset cache: %s', cache_path)
+        return cache_path
+    log.debug('building dataset cache: %s', cache_path)
+    tmp_path = '%s.%d.tmp' % (cache_path, os.getpid())
+    try:
+        with open(tmp_path, 'wb') as f:
+            packer = msgpack.Packer()
+            f.write(packer.pack(header))
+            for (label, features) in _parse(path, format, label_column):
+                f.write(packer.pack(_split_features(label, features)))
+        os.rename(tmp_path, cache_path)
+    except (IOError, OSError) as e:
+        log.debug('cannot write dataset cache %s (%s); parsing without cache', cache_path, e)
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        return None
+    return cache_path
+
+def to_datum(features, datum_class=None):
+    """
+    Converts list of (feature, value) into Datum.
+    String values are set as string values of the Datum.
+    """
+    if datum_class is None:
+        from jubatus.common import Datum as datum_class
+    d = datum_class()
+    (label, d.num_values, d.string_values) = _split_features(None, features)
+    return d
+
+def to_datums(rows=None, columns=None, datum_class=None):
+    """
+    Converts many records into list of Datum in one call.
+    `rows` is a list of dicts or lists of (feature, value); `columns` is a
+    dict of feature to list of values (all lists must have the same length).
+    """
+    if datum_class is None:
+        from jubatus.common import Datum as datum_class
+    if columns is not None:
+        keys = sorted(columns.keys())
+        if len(set([len(columns[k]) for k in keys])) > 1:
+            raise ValueError('all columns must have the same length')
+        rows = [zip(keys, values) for values in zip(*[columns[k] for k in keys])]
+    elif rows is None:
+        raise ValueError('either rows or columns must be specified')
+    datums = []
+    for row in rows:
+        if isinstance(row, dict):
+            row = row.items()
+        d = datum_class()
+        (label, d.num_values, d.string_values) = _split_features(None, row)
+        datums.append(d)
+    return datums
+
+def read_batches(records, batch_size):
+    """
+    Groups the records into lists of `batch_size` records.
+    """
+    batch = []
+    for record in records:
+        batch.append(record)
+        if len(batch) == batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+def _read_lines(path):
+    """
+    Iterates over lines of the file through mmap.
+    """
+    with open(path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return
+        m = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            readline = m.readline
+            line = readline()
+            while line:
+                yield line
+                line = readline()
+        finally:
+            m.close()
+
+def _guess_format(path, format):
+    if format is None:
+        format = 'csv' if path.endswith('.csv') else 'svmlight'
+    if format not in ('svmlight', 'csv'):
+        raise JubaTestFixtureFailedError('unknown dataset format: %s' % format)
+    return format
+
+def _parse(path, format, label_column):
+    if format == 'csv':
+        return read_csv(path, label_column)
+    return read_svmlight(path)
+
+def _split_features(label, features):
+    num_values = []
+    string_values = []
+    for (k, v) in features:
+        if isinstance(v, basestring):
+            string_values.append([k, v])
+        else:
+            num_values.append([k, v])
+    return (label, num_values, string_values)
+
+def _cache_header(path, format, label_column):
+    try:
+        st = os.stat(path)
+    except OSError as e:
+        raise JubaTestFixtureFailedError('failed to read dataset %s (%s)' % (path, e))
+    return {
+        'version': CACHE_VERSION,
+        'format': format,
+        'label_column': label_column,
+        'size': st.st_size,
+        'mtime': st.st_mtime,
+    }
+
+def _read_cache_header(cache_path):
+    try:
+        with open(cache_path, 'rb') as f:
+            return next(msgpack.Unpacker(f), None)
+    except (IOError, ValueError, msgpack.UnpackException):
+        return None
+
+def _read_raw_batches(path, batch_size, worker, workers, format, cache, label_column):
+    """
+    Iterates over batches of (label, num_values, string_values).
+    """
+    format = _guess_format(path, format)
+    cache_path = None
+    if cache:
+        cache_path = prepare_dataset(path, format, label_column)
+    if cache_path is None:
+        records = (_split_features(label, features) for (label, features) in _parse(path, format, label_column))
+        for (i, batch) in enumerate(read_batches(records, batch_size)):
+            if i % workers == worker:
+                yield batch
+        return
+
+    log.debug('reading dataset cache: %s (worker %d of %d)', cache_path, worker, workers)
+    with open(cache_path, 'rb') as f:
+        unpacker = msgpack.Unpacker(f)
+        unpacker.skip() # header
+        i = 0
+        while True:
+            try:
+                if i % workers == worker:
+                    batch = []
+                    for j in range(batch_size):
+                        batch.append(unpacker.unpack())
+                    yield batch
+                else:
+                    for j in range(batch_size):
+                        unpacker.skip()
+            except msgpack.OutOfData:
+                if i % workers == worker and batch:
+                    yield batch
+                return
+            i += 1
@@ -7,15 +7,27 @@ Abstraction interface of test environment and clusters/servers/proxies.
 import os
 import time
 import json
+import socket
+import pipes
 import tempfile
 import copy
 
 import msgpackrpc
 
 from .process import LocalSubprocess
-from .remote import SyncRemoteProcess, AsyncRemoteProcess
+from .remote import SyncRemoteProcess, AsyncRemoteProcess, RemoteProcessFailedError
 from .log import Log, LogFilter
-from .unit import JubaSkipTest, JubaTestFixtureFailedError
+from .snapshot import SnapshotCache
+from .model import remote_checksum
+from .dataset import to_datums
+from .pipeline import get_async_client_class
+from .batching import BatchingWriter
+from .soak import JubaSoakCase
+from .status import StatusPoller
+from .instrument import RPCStats, instrument_client
+from .interposer import Interposer, WireStats
+from .sampler import ResourceSampler, ResourceSeries
+from .unit import JubaBenchmarkCase, JubaSkipTest, JubaTestFixtureFailedError
 from .exceptions import JubaTestAssertionError
 from .logger import log
 
@@ -51,6 +63,16 @@ class JubaTestEnvironment(object):
         self._remote_process_timeout = None
         self._generated_clusters = 0
         self._rpc_servers = []
+        self._snapshot_cache = SnapshotCache()
+        self._snapshot_uploads = {}
+        self._instrument_clients = False
+        self._instrument_bytes = False
+        self._interpose_clients = False
+        self._output_limit = None
+        self._spool_logs = False
+        self._spool_attach_lines = None
+        self._benchmark_baseline = None
+        self._status_poller = None
 
     class ConfigurationDSL(object):
         """
@@ -99,6 +121,26 @@ class JubaTestEnvironment(object):
         def remote_process_timeout(self, timeout):
             self._env._remote_process_timeout = timeout
 
+        def snapshot_dir(self, directory):
+            self._env._snapshot_cache = SnapshotCache(directory)
+
+        def instrument_clients(self, enabled, count_bytes=False):
+            self._env._instrument_clients = enabled
+            self._env._instrument_bytes = count_bytes
+
+        def interpose_clients(self, enabled):
+            self._env._interpose_clients = enabled
+
+        def output_limit(self, limit):
+            self._env._output_limit = limit
+
+        def spool_logs(self, enabled, attach_lines=1000):
+            self._env._spool_logs = enabled
+            self._env._spool_attach_lines = attach_lines
+
+        def benchmark_baseline(self, baseline_file):
+            self._env._benchmark_baseline = baseline_file
+
     @staticmethod
     def from_config(config):
         log.debug('loading environment configuration: %s', config)
@@ -114,7 +156,23 @@ class JubaTestEnvironment(object):
     def get_rpc_servers(self):
         return self._rpc_servers
 
+    def poll_status(self, interval=1.0):
+        """
+        Starts polling the status of all running servers and proxies every
+        `interval` seconds until the end of the test case.
+        Returns StatusSeries to which the status is added.
+        """
+        if self._status_poller is None:
+            self._status_poller = StatusPoller(self.get_rpc_servers, interval).start()
+        return self._status_poller.series
+
     def finalize_test_case(self, testCase):
+        # attach status of servers
+        if self._status_poller is not None:
+            self._status_poller.stop()
+            testCase.update_record(self._status_poller.series.to_record())
+            self._status_poller = None
+
         # check servers still running
         for rpc_server in self._rpc_servers:
             if rpc_server.is_running():
@@ -128,6 +186,32 @@ class JubaTestEnvironment(object):
             if ports_used != 0:
                 log.warning('%d leaked port(s) detected on node %d (%s)', ports_used, number, node.get_host())
 
+        # attach RPC statistics of clients
+        for rpc_server in self._rpc_servers:
+            stats = rpc_server._client_stats
+            if stats is not None and stats.methods():
+                prefix = 'rpc.{c}_{p}.'.format(c=rpc_server.__class__.__name__, p=rpc_server._last_port)
+                testCase.update_record(stats.to_record(prefix))
+                stats.reset()
+
+        # attach RPC statistics observed on the wire (interposers are kept
+        # until the server stops, as clients may be reused across tests)
+        for rpc_server in self._rpc_servers:
+            stats = rpc_server._wire_stats
+            if stats is not None and stats.methods():
+                prefix = 'wire.{c}_{p}.'.format(c=rpc_server.__class__.__name__, p=rpc_server._last_port)
+                testCase.update_record(stats.to_record(prefix))
+                stats.reset()
+
+        # attach resource usage summaries
+        for rpc_server in self._rpc_servers:
+            rpc_server._stop_resource_sampler()
+            series = rpc_server._resource_series
+            if series is not None and len(series):
+                prefix = 'resource.{c}_{p}.'.format(c=rpc_server.__class__.__name__, p=rpc_server._last_port)
+                testCase.update_record(series.to_record(prefix))
+            rpc_server._resource_series = None
+
         # attach logs for failed tests
         if testCase.attachLogs:
             attach_logs = []
@@ -136,19 +220,32 @@ class JubaTestEnvironment(object):
                     kind = rpc_server.__class__.__name__
                     host = rpc_server.node.get_host()
                     port = rpc_server._last_port
-                    log_raw = '\n'.join(rpc_server.log_raw())
+                    if rpc_server.is_spooled():
+                        log_raw = '\n'.join(rpc_server._read_spool(lambda path: rpc_server.node.tail_file(path, self._spool_attach_lines)))
+                    else:
+                        log_raw = '\n'.join(rpc_server.log_raw_full())
                     attach_logs.append((kind, host, port, log_raw))
             testCase.logs = attach_logs
 
+        # remove unfiltered logs kept on nodes
+        for rpc_server in self._rpc_servers:
+            rpc_server._delete_full_logs()
+
         # reset internal state of RPC server instances for reuse
         for rpc_server in self._rpc_servers:
             rpc_server.reset()
 
     def initialize_test_class(self, testClass):
         log.info('test class started: {}.{}'.format(testClass.__module__, testClass.__name__))
+        if issubclass(testClass, JubaBenchmarkCase) and not testClass.baseline_file:
+            testClass.baseline_file = self._benchmark_baseline
+        if issubclass(testClass, JubaSoakCase) and self.get_param('JUBATEST_SOAK_DURATION'):
+            testClass.soak_duration = float(self.get_param('JUBATEST_SOAK_DURATION'))
 
     def finalize_test_class(self, testClass):
         log.debug('{} RPC fixtures used'.format(len(self._rpc_servers)))
+        for rpc_server in self._rpc_servers:
+            rpc_server._stop_interposer()
         log.info('test class completed: {}.{}'.format(testClass.__module__, testClass.__name__))
         self._rpc_servers = []
 
@@ -165,39 +262,50 @@ class JubaTestEnvironment(object):
             log.debug('generated cluster name = %s', cluster_name)
         return JubaCluster(service, config, cluster_name, self._zkargs())
 
-    def server(self, node, cluster, options=[]):
+    def server(self, node, cluster, options=[], from_snapshot=None, log_filter=None):
         """
         Constructs new server.
+        The server loads the model of snapshot `from_snapshot` on startup, if given.
+        The output of the server is filtered on the node by `log_filter`
+        (RemoteLogFilter), if given.
         """
         options2 = options + [
             ('--datadir', node.get_workdir()),
             ('--zookeeper', self._zkargs()),
-        ]
-        server = JubaServer(node, cluster.service, cluster.name, options2)
+        ] + self._snapshot_options(node, cluster.service, from_snapshot)
+        server = JubaServer(node, cluster.service, cluster.name, options2, self._snapshot_cache)
+        server.remote_log_filter = log_filter
         cluster._servers += [server]
-        self._rpc_servers.append(server)
+        self._register_rpc_server(server)
         return server
 
-    def server_standalone(self, node, service, config, options=[]):
+    def server_standalone(self, node, service, config, options=[], from_snapshot=None, log_filter=None):
         """
         Constructs new standalone server.
+        The server loads the model of snapshot `from_snapshot` on startup, if given.
+        The output of the server is filtered on the node by `log_filter`
+        (RemoteLogFilter), if given.
         """
         options2 = options + [
             ('--datadir', node.get_workdir()),
-        ]
-        server = JubaStandaloneServer(node, service, config, options2)
-        self._rpc_servers.append(server)
+        ] + self._snapshot_options(node, service, from_snapshot)
+        server = JubaStandaloneServer(node, service, config, options2, self._snapshot_cache)
+        server.remote_log_filter = log_filter
+        self._register_rpc_server(server)
         return server
 
-    def proxy(self, node, service, options=[]):
+    def proxy(self, node, service, options=[], log_filter=None):
         """
         Constructs new proxy.
+        The output of the proxy is filtered on the node by `log_filter`
+        (RemoteLogFilter), if given.
         """
         options2 = options + [
             ('--zookeeper', self._zkargs()),
         ]
         proxy = JubaProxy(node, service, options2)
-        self._rpc_servers.append(proxy)
+        proxy.remote_log_filter = log_filter
+        self._register_rpc_server(proxy)
         return proxy
 
     def keeper(self, *args, **kwargs):
@@ -219,11 +327,23 @@ class JubaTestEnvironment(object):
             return node
         raise JubaSkipTest('insufficient number of nodes')
 
+    def get_node_count(self):
+        """
+        Returns the number of nodes defined in the environment.
+        """
+        return len(self._node_records)
+
     def get_param(self, key):
         if key in self._params:
             return self._params[key]
         return None
 
+    def has_snapshot(self, name):
+        """
+        Tests if the snapshot of given name is available in the snapshot cache.
+        """
+        return self._snapshot_cache.has(name)
+
     #########################################################################
     # Private                                                               #
     #########################################################################
@@ -234,6 +354,39 @@ class JubaTestEnvironment(object):
         """
         return ','.join(map(lambda p: p[0] + ':' + str(p[1]), self._zookeepers))
 
+    def _register_rpc_server(self, rpc_server):
+        """
+        Registers the RPC server to the environment and applies the environment-wide settings.
+        """
+        if self._instrument_clients:
+            rpc_server._client_stats = RPCStats(self._instrument_bytes)
+        if self._interpose_clients:
+            rpc_server._wire_stats = WireStats()
+        rpc_server.output_limit = self._output_limit
+        rpc_server.spool_logs = self._spool_logs
+        self._rpc_servers.append(rpc_server)
+
+    def _snapshot_options(self, node, service, name):
+        """
+        Transfers the model file of the snapshot to the node (only once per node,
+        unless the file has been removed from the node since then), and returns
+        the options to load it on startup.
+        """
+        if not name:
+            return []
+        (snapshot_service, digest, local_path) = self._snapshot_cache.get(name)
+        if snapshot_service != service:
+            raise JubaTestFixtureFailedError('snapshot %s is a model of %s, not %s' % (name, snapshot_service, service))
+        key = (node.get_host(), node.get_workdir(), digest)
+        if key in self._snapshot_uploads and not node.has_file(self._snapshot_uploads[key]):
+            log.debug('snapshot %s has been removed from host %s', name, node.get_host())
+            del self._snapshot_uploads[key]
+        if key not in self._snapshot_uploads:
+            log.debug('transferring snapshot %s to host %s', name, node.get_host())
+            remote_path = node.get_workdir() + '/jubatest.snapshot.' + digest + '.jubatus'
+            self._snapshot_uploads[key] = node.put_local_file(local_path, remote_path)
+        return [('--model_file', self._snapshot_uploads[key])]
+
     def _generate_cluster_name(self):
         self._generated_clusters += 1
         return 'jubatest-cluster-%s-%d' % (self._cluster_prefix, self._generated_clusters)
@@ -289,6 +442,18 @@ class JubaCluster(object):
     def __exit__(self, exc_type, exc_value, traceback):
         self.stop()
 
+# Prints lines of log entries whose timestamp (the first 23 characters, which
+# is common to Jubatus and ZooKeeper logs) is between `b` and `e`.
+_WINDOW_AWK = r"""
+/^[0-9][0-9][0-9][0-9]-[0-9][0-9]-[0-9][0-9] [0-9][0-9]:[0-9][0-9]:[0-9][0-9],[0-9][0-9][0-9]/ {
+  t = substr($0, 1, 23); w = (b <= t && t <= e)
+}
+w
+"""
+
+def _log_timestamp(time):
+    return time.strftime('%Y-%m-%d %H:%M:%S,') + '%03d' % (time.microsecond / 1000)
+
 class JubaNode(object):
     """
     Represents a (physical) test node.
@@ -342,16 +507,22 @@ class JubaNode(object):
         """
         Put the contents to the given path
         """
+        with tempfile.NamedTemporaryFile() as tmp_file:
+            tmp_file.write(str(data))
+            tmp_file.flush()
+            return self.put_local_file(tmp_file.name, to_path)
+
+    def put_local_file(self, from_path, to_path=None):
+        """
+        Put the local file to the given path
+        """
         if not to_path:
             log.debug('creating temporary file on host %s', self._host)
             to_path = SyncRemoteProcess.run(self._host, ['mktemp', '--tmpdir=' + self._workdir, 'jubatest.tmp.XXXXXXXXXX']).rstrip()
             log.debug('created temporary file on host %s: %s', self._host, to_path)
-        with tempfile.NamedTemporaryFile() as tmp_file:
-            tmp_file.write(str(data))
-            tmp_file.flush()
-            log.debug('sending file %s to host %s: %s', tmp_file.name, self._host, to_path)
-            SyncRemoteProcess.put_file(self._host, tmp_file.name, to_path)
-            log.debug('sent file %s to host %s: %s', tmp_file.name, self._host, to_path)
+        log.debug('sending file %s to host %s: %s', from_path, self._host, to_path)
+        SyncRemoteProcess.put_file(self._host, from_path, to_path)
+        log.debug('sent file %s to host %s: %s', from_path, self._host, to_path)
         return to_path
 
     def delete_file(self, path):
@@ -371,9 +542,7 @@ class JubaNode(object):
             tmp_file = tempfile.NamedTemporaryFile()
             to_path = tmp_file.name
         try:
-            log.debug('downloading file %s on host %s to %s', from_path, self._host, to_path)
-            SyncRemoteProcess.get_file(self._host, from_path, to_path)
-            log.debug('downloaded file %s on host %s to %s', from_path, self._host, to_path)
+            self.download_file(from_path, to_path)
             if tmp_file:
                 data = tmp_file.read()
             else:
@@ -384,11 +553,65 @@ class JubaNode(object):
             if tmp_file:
                 tmp_file.close()
 
+    def download_file(self, from_path, to_path):
+        """
+        Downloads the given file to the local path, without reading it.
+        """
+        log.debug('downloading file %s on host %s to %s', from_path, self._host, to_path)
+        SyncRemoteProcess.get_file(self._host, from_path, to_path)
+        log.debug('downloaded file %s on host %s to %s', from_path, self._host, to_path)
+
+    def read_file(self, path, offset=0, length=None, filter_command=None):
+        """
+        Returns `length` bytes (until the end by default) from `offset` of the
+        file, optionally filtered on the node by the shell command.
+        """
+        script = 'tail -c +%d %s' % (offset + 1, pipes.quote(path))
+        if length is not None:
+            script += ' | head -c %d' % length
+        return self._read(script, filter_command)
+
+    def tail_file(self, path, lines, filter_command=None):
+        """
+        Returns the last `lines` lines of the file, optionally filtered on the
+        node by the shell command.
+        """
+        return self._read('tail -n %d %s' % (lines, pipes.quote(path)), filter_command)
+
+    def read_log_window(self, path, begin, end, filter_command=None):
+        """
+        Returns log entries (Jubatus or ZooKeeper) of the log file logged
+        between `begin` and `end` (datetime), with continuation lines.
+        """
+        script = 'awk -v b=%s -v e=%s %s %s' % (
+            pipes.quote(_log_timestamp(begin)), pipes.quote(_log_timestamp(end)),
+            pipes.quote(_WINDOW_AWK), pipes.quote(path))
+        return self._read(script, filter_command)
+
+    def has_file(self, path):
+        """
+        Tests if the file exists on the node.
+        """
+        try:
+            self.run_process(['test', '-f', pipes.quote(path)])
+            return True
+        except RemoteProcessFailedError:
+            return False
+
+    def get_file_size(self, path):
+        return int(self.run_process(['stat', '-c', '%s', pipes.quote(path)]))
+
+    def _read(self, script, filter_command):
+        if filter_command:
+            script += ' | { %s; }' % filter_command
+        log.debug('reading file on host %s: %s', self._host, script)
+        return self.run_process([script])
+
     def run_process(self, args):
         return SyncRemoteProcess.run(self._host, args, self._envvars(), self._remote_process_timeout)
 
-    def get_process(self, args):
-        return AsyncRemoteProcess(self._host, args, self._envvars(), self._remote_process_timeout)
+    def get_process(self, args, output_limit=None, output_filters=None, spool_paths=None):
+        return AsyncRemoteProcess(self._host, args, self._envvars(), self._remote_process_timeout, output_limit, output_filters, spool_paths)
 
     def _envvars(self):
         envvars2 = {}
@@ -404,19 +627,37 @@ class JubaRPCServer(object):
     """
 
     CLIENT_TIMEOUT = 5 # TODO make it configurable
+    STARTUP_TIMEOUT = 5 # sec
+    READY_POLL_INTERVAL = 0.005 # sec
+
+    status_method = 'get_status'
 
     def __init__(self, node, service, options):
         self.node = node
         self.service = service
         self.options = options
         self.port = None
+        self.output_limit = None # bytes of stdout/stderr kept; None for unlimited
+        self.remote_log_filter = None # RemoteLogFilter applied on the node
+        self.spool_logs = False # keep the output in files on the node
+        self._full_log_paths = [] # for each start
+        self._spool_paths = None
         self._last_port = None
         self._backend = None
+        self._paused = False
         self._log_filter = None
+        self._client_stats = None
+        self._wire_stats = None
+        self._interposer = None
+        self._resource_sampler = None
+        self._resource_series = None
+        self._types = None
 
     def reset(self):
         self._backend = None
+        self._paused = False
         self._log_filter = None
+        self._spool_paths = None
 
     def is_used(self):
         """
@@ -430,15 +671,30 @@ class JubaRPCServer(object):
         """
         if self.is_running():
             raise JubaTestFixtureFailedError('this instance is already running')
+        self._start(self.node.lease_port(), sync)
 
+    def _start(self, port, sync):
+        """
+        Starts the RPC server with the leased port.
+        """
         self.reset()
-        self.port = self.node.lease_port()
+        self.port = port
         self._last_port = self.port
         options2 = self.options + [
             ('--rpc-port', self.port),
         ]
         flat_opts = self._flatten_options(options2)
-        self._backend = self.node.get_process([self.program()] + flat_opts)
+        output_filters = None
+        if self.spool_logs:
+            # unique for each start, so that logs stay on the node for post-mortem
+            self._spool_paths = self._node_log_paths('%d_' % (time.time() * 1000))
+        elif self.remote_log_filter is not None:
+            # keep the unfiltered output on the node to be attached on failure;
+            # unique for each start, so that restarts do not truncate them
+            full_log_paths = self._node_log_paths('%d_full_' % (time.time() * 1000))
+            self._full_log_paths.append(full_log_paths)
+            output_filters = tuple([self.remote_log_filter.shell_command(path) for path in full_log_paths])
+        self._backend = self.node.get_process([self.program()] + flat_opts, self.output_limit, output_filters, self._spool_paths)
 
         log.debug('starting remote process')
         self._backend.start()
@@ -446,24 +702,99 @@ class JubaRPCServer(object):
             return
 
         log.debug('waiting for RPC server to startup')
-        delay = 20000 # usec
-        for i in range(8):
-            time.sleep(delay / 1000000.0) # usec -> sec
-            if self.is_ready():
-                log.debug('RPC server ready after %d retries', i)
-                return
-            delay *= 2
+        if self.wait_until_ready() is not None:
+            return
         try:
             log.warning('RPC server startup sync timed out, stopping')
             self.stop()
         finally:
             raise JubaTestFixtureFailedError('failed to start server: stdout = %s, stderr = %s' % (self._backend.stdout, self._backend.stderr))
 
+    def wait_until_ready(self, timeout=STARTUP_TIMEOUT):
+        """
+        Waits for the RPC server to accept RPC calls.
+        Returns the seconds waited, or None if timed out or the process exited.
+        The port is probed with TCP connect every READY_POLL_INTERVAL seconds,
+        and then pinged with RPC.
+        """
+        begin = time.time()
+        retries = 0
+        while time.time() - begin < timeout:
+            if not self.is_running():
+                log.debug('RPC server exited during startup')
+                return None
+            if self._is_listening() and self.is_ready():
+                log.debug('RPC server ready after %d retries', retries)
+                return time.time() - begin
+            retries += 1
+            time.sleep(self.READY_POLL_INTERVAL)
+        return None
+
+    def _is_listening(self):
+        try:
+            sock = socket.create_connection((self.node.get_host(), self.port), self.READY_POLL_INTERVAL * 10)
+        except socket.error:
+            return False
+        sock.close()
+        return True
+
+    def restart(self, signal='TERM', keep_port=True, load_model=None):
+        """
+        Stops the RPC server with the signal and starts it again, reusing the
+        same port unless `keep_port` is False (options including the data
+        directory are unchanged).  When `load_model` is given, the model saved
+        with the ID is loaded after the restart.
+        Returns the downtime in seconds, from stopping the server until the new
+        server accepts RPC calls (with the model loaded).
+        Note that logs of the stopped server are discarded.
+        """
+        if not self.is_running():
+            raise JubaTestFixtureFailedError('this instance is not running')
+
+        log.debug('restarting remote process')
+        begin = time.time()
+        port = self.port
+        self._stop_resource_sampler()
+        if self._paused:
+            self.resume()
+        self._backend.stop(signal)
+        if not keep_port:
+            self.node.free_port(port)
+            port = self.node.lease_port()
+        self.port = None
+        self._start(port, True)
+        if load_model is not None:
+            self.load_model(load_model)
+        downtime = time.time() - begin
+        log.debug('RPC server restarted: downtime %f seconds', downtime)
+        return downtime
+
+    def load_model(self, model_id, timeout=CLIENT_TIMEOUT):
+        """
+        Loads the model saved with the ID.
+        Returns the wall time (in seconds) taken for the load.
+        """
+        log.debug('sending load request for model %s', model_id)
+        cli = msgpackrpc.Client(msgpackrpc.Address(self.node.get_host(), self.port), timeout)
+        try:
+            begin = time.time()
+            if not cli.call('load', self.cluster_name(), model_id):
+                raise JubaTestFixtureFailedError('failed to load model %s' % model_id)
+            elapsed = time.time() - begin
+        finally:
+            cli.close()
+        log.debug('model %s loaded in %f seconds', model_id, elapsed)
+        return elapsed
+
     def stop(self, signal='TERM'):
         """
         Stops the RPC server.
         """
         log.debug('stopping remote process')
+        self._stop_resource_sampler()
+        self._stop_interposer()
+        if self._paused:
+            self.resume()
         self._backend.stop(signal)
         self.node.free_port(self.port)
         self.port = None
@@ -476,10 +807,38 @@ class JubaRPCServer(object):
             raise JubaTestFixtureFailedError('this instance is not running')
 
         log.debug('stopping remote process with SIGKILL')
+        self._stop_resource_sampler()
+        self._stop_interposer()
         self._backend.stop('KILL')
+        self._paused = False
         self.node.free_port(self.port)
         self.port = None
 
+    def pause(self):
+        """
+        Suspends the RPC server using SIGSTOP to simulate unresponsive server.
+        """
+        if not self.is_running():
+            raise JubaTestFixtureFailedError('this instance is not running')
+
+        log.debug('pausing remote process with SIGSTOP')
+        self._backend.pause()
+        self._paused = True
+
+    def resume(self):
+        """
+        Resumes the RPC server suspended by `pause` using SIGCONT.
+        """
+        if not self._paused:
+            raise JubaTestFixtureFailedError('this instance is not paused')
+
+        log.debug('resuming remote process with SIGCONT')
+        self._backend.resume()
+        self._paused = False
+
+    def is_paused(self):
+        return self._paused
+
     def is_running(self):
         """
         Tests if the backed process is still running.
@@ -499,11 +858,97 @@ class JubaRPCServer(object):
         cli = None
         try:
             cli_class = self.get_client_class()
-            cli = cli_class(self.node.get_host(), self.port, cluster_name, timeout_sec)
+            (host, port) = self._get_client_address()
+            cli = cli_class(host, port, cluster_name, timeout_sec)
         except BaseException as e:
             raise JubaTestFixtureFailedError('failed to create client class for %s (%s)' % (self.service, e.message))
+        if self._client_stats is not None:
+            instrument_client(cli, self._client_stats)
+        return cli
+
+    def get_async_client(self, cluster_name=None, timeout_sec=CLIENT_TIMEOUT, max_in_flight=128):
+        """
+        Returns the pipelined client instance for this RPC server.
+        Methods of the client return futures instead of results.
+        """
+        if not cluster_name:
+            cluster_name = self.cluster_name()
+
+        if not self.port:
+            raise JubaTestAssertionError('port for this RPC server is not available (maybe not started yet?)')
+
+        cli = None
+        try:
+            cli_class = get_async_client_class(self.get_client_class())
+            (host, port) = self._get_client_address()
+            cli = cli_class(host, port, cluster_name, timeout_sec, max_in_flight)
+        except BaseException as e:
+            raise JubaTestFixtureFailedError('failed to create async client class for %s (%s)' % (self.service, e.message))
+        if self._client_stats is not None:
+            instrument_client(cli, self._client_stats)
         return cli
 
+    def get_batching_writer(self, method='train', cluster_name=None, timeout_sec=CLIENT_TIMEOUT, **kwds):
+        """
+        Returns BatchingWriter that sends records to the method of this RPC
+        server in batches, using the pipelined client.
+        """
+        return BatchingWriter(self.get_async_client(cluster_name, timeout_sec), method, **kwds)
+
+    def get_client_stats(self):
+        """
+        Returns RPCStats of clients for this RPC server, or None if clients are not instrumented.
+        """
+        return self._client_stats
+
+    def get_wire_stats(self):
+        """
+        Returns WireStats observed by the interposer for this RPC server, or None if clients are not interposed.
+        """
+        return self._wire_stats
+
+    def _get_client_address(self):
+        """
+        Returns the host/port for clients to connect to, starting the interposer if enabled.
+        """
+        if self._wire_stats is None:
+            return self.get_host_port()
+        if self._interposer is None or self._interposer.upstream != self.get_host_port():
+            self._stop_interposer()
+            (host, port) = self.get_host_port()
+            self._interposer = Interposer(host, port, self._wire_stats).start()
+        return self._interposer.get_host_port()
+
+    def _stop_interposer(self):
+        if self._interposer is not None:
+            self._interposer.stop()
+            self._interposer = None
+
+    def sample_resources(self, interval=1.0):
+        """
+        Starts sampling CPU time, RSS, threads and open fds of the server
+        process (and its descendants) every `interval` seconds, until the
+        server is stopped.  Returns ResourceSeries to which samples are added.
+        """
+        if not self.is_running():
+            raise JubaTestAssertionError('this instance is not running')
+        self._stop_resource_sampler()
+        if self._resource_series is None:
+            self._resource_series = ResourceSeries()
+        self._resource_sampler = ResourceSampler(self.node, self.program(), self.port, interval, self._resource_series).start()
+        return self._resource_series
+
+    def get_resource_series(self):
+        """
+        Returns ResourceSeries sampled for this RPC server, or None if not sampled.
+        """
+        return self._resource_series
+
+    def _stop_resource_sampler(self):
+        if self._resource_sampler is not None:
+            self._resource_sampler.stop()
+            self._resource_sampler = None
+
     def get_client_class(self):
         service_name = self.service
         client_class = ''.join(map(str.capitalize, service_name.split('_')))
@@ -513,31 +958,40 @@ class JubaRPCServer(object):
         """
         Returns the client data structure.
         """
-        c = None
-        try:
-            if typename == 'datum':
-                # migration support for Jubatus 0.4.5
-                datumClass = self._get_class('.'.join(['jubatus', 'common', 'Datum']))
-                class Datum04(datumClass):
-                    def __init__(self_inner, string_values, num_values):
-                        datumClass.__init__(self_inner)
-                        self_inner.string_values = string_values
-                        self_inner.num_values = num_values
-                c = Datum04
-            elif typename == 'Datum':
-                c = self._get_class('.'.join(['jubatus', 'common', 'Datum']))
-            else:
-                c = self._get_class('.'.join(['jubatus', self.service, 'types', typename]))
-        except BaseException as e:
-            raise JubaTestFixtureFailedError('failed to create client type %s (%s)' % (typename, e.message))
-        return c
+        key = (self.service, typename)
+        if key not in _client_types:
+            try:
+                if typename == 'datum':
+                    # migration support for Jubatus 0.4.5
+                    datumClass = self._get_class('.'.join(['jubatus', 'common', 'Datum']))
+                    class Datum04(datumClass):
+                        def __init__(self_inner, string_values, num_values):
+                            datumClass.__init__(self_inner)
+                            self_inner.string_values = string_values
+                            self_inner.num_values = num_values
+                    c = Datum04
+                elif typename == 'Datum':
+                    c = self._get_class('.'.join(['jubatus', 'common', 'Datum']))
+                else:
+                    c = self._get_class('.'.join(['jubatus', self.service, 'types', typename]))
+            except BaseException as e:
+                raise JubaTestFixtureFailedError('failed to create client type %s (%s)' % (typename, e.message))
+            _client_types[key] = c
+        return _client_types[key]
 
     @property
     def types(self):
-        class TypeAccessor():
-            def __getattr__(self_inner, name):
-                    return self.get_client_type(name)
-        return TypeAccessor()
+        if self._types is None:
+            self._types = _TypeAccessor(self)
+        return self._types
+
+    def build_datums(self, rows=None, columns=None):
+        """
+        Builds list of Datum in one call, either from `rows` (list of dicts or
+        lists of (key, value)) or `columns` (dict of key to list of values).
+        Numeric values are set as number values, and strings as string values.
+        """
+        return to_datums(rows, columns, self.get_client_type('Datum'))
 
     def get_host_port(self):
         """
@@ -566,14 +1020,95 @@ class JubaRPCServer(object):
     def log_raw(self):
         """
         Returns raw log; tuple of (Jubatus, ZooKeeper) logs.
+        Spooled logs are read entirely; use `log_tail`, `log_window` or
+        `log_range` for large logs.
         """
+        if self.is_spooled():
+            return self._read_spool(lambda path: self.node.read_file(path, filter_command=self._spool_filter_command()))
         if self._backend and self._backend.stdout is not None and self._backend.stderr is not None:
             return (self._backend.stdout, self._backend.stderr)
         raise JubaTestAssertionError('no log data collected (maybe the server is not stopped yet?)')
 
+    def is_spooled(self):
+        """
+        Tests if the output is kept in spool files on the node (see
+        `env.spool_logs`) instead of being transferred.
+        """
+        return self._spool_paths is not None
+
+    def log_spool_paths(self):
+        """
+        Returns paths of spool files on the node; tuple of (Jubatus, ZooKeeper) logs.
+        """
+        if not self.is_spooled():
+            raise JubaTestAssertionError('logs are not spooled for this RPC server')
+        return self._spool_paths
+
+    def log_tail(self, lines=1000):
+        """
+        Returns LogFilter for the last `lines` lines of spooled logs.
+        """
+        return self._parse_spool(lambda path: self.node.tail_file(path, lines, self._spool_filter_command()))
+
+    def log_window(self, begin, end):
+        """
+        Returns LogFilter for the entries of spooled logs logged between
+        `begin` and `end` (datetime, in the clock of the node).
+        """
+        return self._parse_spool(lambda path: self.node.read_log_window(path, begin, end, self._spool_filter_command()))
+
+    def log_range(self, offset, length=None):
+        """
+        Returns raw spooled logs of `length` bytes from `offset`; tuple of
+        (Jubatus, ZooKeeper) logs.  Lines may be cut at the boundaries.
+        """
+        return self._read_spool(lambda path: self.node.read_file(path, offset, length))
+
+    def log_size(self):
+        """
+        Returns sizes (in bytes) of spooled logs; tuple of (Jubatus, ZooKeeper) logs.
+        """
+        return self._read_spool(self.node.get_file_size)
+
+    def _read_spool(self, read):
+        return tuple([read(path) for path in self.log_spool_paths()])
+
+    def _parse_spool(self, read):
+        (juba_log, zk_log) = self._read_spool(read)
+        return LogFilter(Log.parse_logs(self.node, juba_log) + Log.parse_logs(self.node, zk_log))
+
+    def _spool_filter_command(self):
+        if self.remote_log_filter is None:
+            return None
+        return self.remote_log_filter.shell_command()
+
+    def _node_log_paths(self, suffix=''):
+        program = os.path.basename(self.program())
+        return tuple(['%s/jubatest_%s_%d_%s%s' % (self.node.get_workdir(), program, self.port, suffix, stream) for stream in ('stdout', 'stderr')])
+
+    def log_raw_full(self):
+        """
+        Returns raw log before filtered on the node (see `remote_log_filter`);
+        tuple of (Jubatus, ZooKeeper) logs, concatenated over all starts
+        (including restarts) since the last test case.
+        """
+        if not self._full_log_paths:
+            return self.log_raw()
+        try:
+            return tuple([''.join([self.node.get_file(paths[i]) for paths in self._full_log_paths]) for i in range(2)])
+        except RemoteProcessFailedError as e:
+            log.warning('failed to get unfiltered log, using filtered one (%s)', e)
+            return self.log_raw()
+
+    def _delete_full_logs(self):
+        for paths in self._full_log_paths:
+            for path in paths:
+                self.node.delete_file(path)
+        self._full_log_paths = []
+
     def _get_log_filter(self):
         (juba_log, zk_log) = self.log_raw()
-        if not self._log_filter:
+        if not self._log_filter or self.is_running():
             self._log_filter = LogFilter(
                 Log.parse_logs(self.node, juba_log) +
                 Log.parse_logs(self.node, zk_log))
@@ -611,9 +1146,7 @@ class JubaRPCServer(object):
         """
         Imports and returns the class of given name.
         """
-        levels = name.split('.')
-        (package, module, basename) = (levels[0], '.'.join(levels[:-1]), levels[-1])
-        return getattr(__import__(module, fromlist=[package]), basename)
+        return _resolve_class(name)
 
     def _flatten_options(self, options):
         """
@@ -644,13 +1177,44 @@ class JubaRPCServer(object):
         except:
             return super(JubaRPCServer, self).__str__()
 
+class _TypeAccessor(object):
+    """
+    Provides client data structures of the RPC server as attributes.
+    """
+
+    def __init__(self, server):
+        self._server = server
+
+    def __getattr__(self, name):
+        c = self._server.get_client_type(name)
+        setattr(self, name, c)
+        return c
+
+_classes = {}
+_client_types = {}
+
+def _resolve_class(name):
+    """
+    Imports and returns the class of given name; memoized.
+    """
+    if name not in _classes:
+        levels = name.split('.')
+        (package, module, basename) = (levels[0], '.'.join(levels[:-1]), levels[-1])
+        _classes[name] = getattr(__import__(module, fromlist=[package]), basename)
+    return _classes[name]
+
 class JubaServer(JubaRPCServer):
     """
     Represents a Jubatus server.
+    Models saved by snapshot() are stored in `snapshot_cache` (SnapshotCache).
     """
 
-    def __init__(self, node, service, name, options):
+    SNAPSHOT_MODEL_ID = 'jubatest_snapshot'
+
+    def __init__(self, node, service, name, options, snapshot_cache=None):
         self._server_id_cache = None
+        self._snapshot_cache = snapshot_cache
+        self._mix_history = []
         options2 = options
         if name:
             self.name = name
@@ -689,24 +1253,99 @@ class JubaServer(JubaRPCServer):
 
     def get_saved_model(self, model_id):
         log.debug('sending request: saved model ID %s', model_id)
-        model_file = self.node.get_file(
-            self.node.get_workdir() + '/' +
-            self.get_id() + '_' + self.service + '_' + model_id + '.jubatus')
+        model_file = self.node.get_file(self._saved_model_path(model_id))
         log.debug('got reply: saved model ID %s', model_id)
         return model_file
 
+    def save_model(self, model_id, timeout=JubaRPCServer.CLIENT_TIMEOUT):
+        """
+        Saves the current model with the ID.
+        Returns the wall time (in seconds) taken for the save.
+        """
+        log.debug('sending save request for model %s', model_id)
+        cli = msgpackrpc.Client(msgpackrpc.Address(self.node.get_host(), self.port), timeout)
+        try:
+            begin = time.time()
+            if not cli.call('save', self.name, model_id):
+                raise JubaTestFixtureFailedError('failed to save model %s' % model_id)
+            elapsed = time.time() - begin
+        finally:
+            cli.close()
+        log.debug('model %s saved in %f seconds', model_id, elapsed)
+        return elapsed
+
+    def download_saved_model(self, model_id, to_path):
+        """
+        Downloads the saved model file to the local path, to be inspected
+        with ModelReader without loading the whole model into memory.
+        """
+        self.node.download_file(self._saved_model_path(model_id), to_path)
+        return to_path
+
+    def get_saved_model_checksum(self, model_id):
+        """
+        Returns ModelChecksum of the saved model file, computed on the node.
+        Use `get_saved_model` only when the model itself is needed.
+        """
+        return remote_checksum(self.node, self._saved_model_path(model_id))
+
+    def get_saved_model_size(self, model_id):
+        """
+        Returns the size (in bytes) of the saved model file on the node.
+        """
+        return int(self.node.run_process(['stat', '-c', '%s', self._saved_model_path(model_id)]))
+
+    def snapshot(self, name):
+        """
+        Saves the current model and stores it in the snapshot cache as `name`.
+        The snapshot can be restored using `from_snapshot` option of the environment.
+        """
+        if not self._snapshot_cache:
+            raise JubaTestAssertionError('snapshot cache is not available for this server')
+        model_id = self.SNAPSHOT_MODEL_ID
+        log.debug('saving model for snapshot %s', name)
+        self.save_model(model_id)
+        model_data = self.get_saved_model(model_id)
+        self.node.delete_file(self._saved_model_path(model_id))
+        return self._snapshot_cache.put(name, self.service, model_data)
+
+    def _saved_model_path(self, model_id):
+        return self.node.get_workdir() + '/' + self.get_id() + '_' + self.service + '_' + model_id + '.jubatus'
+
     def do_mix(self, timeout=120):
+        """
+        Triggers MIX and waits for completion.
+        Returns the wall time (in seconds) taken for the MIX.
+        """
         log.debug('sending do_mix request with timeout of %d seconds', timeout)
         cli = msgpackrpc.Client(msgpackrpc.Address(self.node.get_host(), self.port), timeout)
+        begin = time.time()
         cli.call('do_mix')
+        elapsed = time.time() - begin
         cli.close()
-        log.debug('MIX done')
+        self._mix_history.append(elapsed)
+        log.debug('MIX done in %f seconds', elapsed)
+        return elapsed
+
+    def get_mix_history(self):
+        """
+        Returns list of wall times of `do_mix` calls made for this server.
+        """
+        return list(self._mix_history)
+
+    def mix_rounds(self):
+        """
+        Returns list of MixRound (including the ones triggered automatically)
+        that this server has done as a MIX master, parsed from the log.
+        Available after the server is stopped.
+        """
+        return self.log().mix_rounds()
 
 class JubaStandaloneServer(JubaServer):
     """
     Represents a Jubatus servers that run in standalone mode.
     """
-    def __init__(self, node, service, config, options):
+    def __init__(self, node, service, config, options, snapshot_cache=None):
         log.debug('transfering temporary configuration file for a standalone server')
         self._config = config
         self._config_path = node.put_file(json.dumps(config))
@@ -714,7 +1353,7 @@ class JubaStandaloneServer(JubaServer):
         options2 = options + [
             ('--configpath', self._config_path),
         ]
-        super(JubaStandaloneServer, self).__init__(node, service, None, options2)
+        super(JubaStandaloneServer, self).__init__(node, service, None, options2, snapshot_cache)
 
 class JubaProxy(JubaRPCServer):
     """
@@ -756,6 +1395,8 @@ class JubaProxy(JubaRPCServer):
     def cluster_name(self):
         raise JubaTestAssertionError('Cannot assume cluster name for proxies!')
 
+    status_method = 'get_proxy_status'
+
     def program(self):
         return 'juba' + self.service + '_proxy'
 
@@ -0,0 +1,168 @@
+# -*- coding: utf-8 -*-
+
+"""
+Latency instrumentation for RPC clients.
+"""
+
+import time
+import threading
+
+import msgpack
+
+from .stats import Histogram
+from .pipeline import PipelinedClient
+
+class MethodStats(object):
+    """
+    Statistics of calls for one RPC method.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.errors = 0
+        self.request_bytes = 0
+        self.response_bytes = 0
+        self.latency = Histogram()
+
+    def merge(self, other):
+        self.count += other.count
+        self.errors += other.errors
+        self.request_bytes += other.request_bytes
+        self.response_bytes += other.response_bytes
+        self.latency.merge(other.latency)
+        return self
+
+class RPCStats(object):
+    """
+    Per-method statistics of RPC calls, which can be recorded from multiple
+    threads.
+    When `count_bytes` is True, clients instrumented with the stats also
+    measure request/response sizes; sizes are not recorded otherwise.
+    """
+
+    def __init__(self, count_bytes=False):
+        self.count_bytes = count_bytes
+        self._lock = threading.Lock()
+        self._methods = {}
+
+    def record(self, method, latency, request_bytes, response_bytes, error=False):
+        with self._lock:
+            if method not in self._methods:
+                self._methods[method] = MethodStats()
+            stats = self._methods[method]
+            stats.count += 1
+            stats.request_bytes += request_bytes
+            stats.response_bytes += response_bytes
+            if error:
+                stats.errors += 1
+            else:
+                stats.latency.record(latency)
+
+    def methods(self):
+        with self._lock:
+            return sorted(self._methods.keys())
+
+    def get(self, method):
+        with self._lock:
+            return self._methods.get(method)
+
+    def merge(self, other):
+        items = other._snapshot()
+        with self._lock:
+            for (method, stats) in items:
+                if method not in self._methods:
+                    self._methods[method] = MethodStats()
+                self._methods[method].merge(stats)
+        return self
+
+    def reset(self):
+        with self._lock:
+            self._methods = {}
+
+    def _snapshot(self):
+        """
+        Returns list of (method, copy of MethodStats).
+        """
+        with self._lock:
+            return [(method, MethodStats().merge(stats)) for (method, stats) in self._methods.items()]
+
+    def to_record(self, prefix='rpc.'):
+        """
+        Returns the summary as dict, to be attached to the test case.
+        """
+        record = {}
+        for (method, stats) in self._snapshot():
+            key = prefix + method + '.'
+            record[key + 'count'] = stats.count
+            record[key + 'errors'] = stats.errors
+            if stats.request_bytes or stats.response_bytes:
+                record[key + 'request_bytes'] = stats.request_bytes
+                record[key + 'response_bytes'] = stats.response_bytes
+            for (name, value) in stats.latency.summary('latency', (50, 99)).items():
+                record[key + name] = value
+        return record
+
+def instrument_client(cli, stats):
+    """
+    Instruments the Jubatus client (either synchronous or pipelined) so that
+    every RPC call is recorded to the RPCStats.
+    Latency is measured from sending the request to receiving the response.
+    Request/response sizes are measured only if `stats.count_bytes` is set,
+    by serializing the arguments/results again, which costs a few
+    microseconds per call (interpose clients to measure sizes on the wire).
+    """
+    if isinstance(cli, PipelinedClient):
+        core = cli._client.jubatus_client
+    else:
+        core = cli.jubatus_client
+    if not isinstance(core.client, _MeteredSession):
+        core.client = _MeteredSession(core.client, stats)
+    return cli
+
+class _MeteredSession(object):
+    """
+    Wraps msgpack-rpc client (session) to measure the calls.
+    """
+
+    def __init__(self, session, stats):
+        self._session = session
+        self._stats = stats
+        self._packer = msgpack.Packer(default=lambda x: x.to_msgpack())
+
+    def call_async(self, method, *args):
+        count_bytes = self._stats.count_bytes
+        request_bytes = len(self._packer.pack(args)) if count_bytes else 0
+        begin = time.time()
+        def on_done(future):
+            latency = time.time() - begin
+            if future.error is not None:
+                self._stats.record(method, latency, request_bytes, 0, True)
+            else:
+                self._stats.record(method, latency, request_bytes, len(self._packer.pack(future.result)) if count_bytes else 0)
+        return MeteredFuture(self._session.call_async(method, *args), on_done)
+
+    def __getattr__(self, name):
+        return getattr(self._session, name)
+
+class MeteredFuture(object):
+    """
+    Wraps msgpack-rpc future to get notified on completion, while allowing
+    another callback to be attached.
+    """
+
+    def __init__(self, future, on_done):
+        self._future = future
+        self._on_done = on_done
+        self._callback = None
+        future.attach_callback(self._done)
+
+    def attach_callback(self, callback):
+        self._callback = callback
+
+    def _done(self, future):
+        self._on_done(future)
+        if self._callback:
+            self._callback(future)
+
+    def __getattr__(self, name):
+        return getattr(self._future, name)
@@ -0,0 +1,233 @@
+# -*- coding: utf-8 -*-
+
+"""
+Interposer that forwards msgpack-rpc traffic between clients and the RPC
+server to measure it on the wire.
+"""
+
+import time
+import select
+import socket
+import threading
+
+import msgpack
+
+from .instrument import RPCStats
+from .logger import log
+
+REQUEST = 0
+RESPONSE = 1
+
+class WireStats(RPCStats):
+    """
+    Per-method statistics of RPC calls observed on the wire, with the number
+    of requests in flight (concurrency) observed when each request is sent.
+    """
+
+    def __init__(self):
+        super(WireStats, self).__init__(count_bytes=True)
+        self.reset()
+
+    def record_concurrency(self, in_flight):
+        with self._lock:
+            self.requests += 1
+            self.concurrency_sum += in_flight
+            self.concurrency_max = max(self.concurrency_max, in_flight)
+
+    def concurrency_mean(self):
+        if self.requests == 0:
+            return 0.0
+        return float(self.concurrency_sum) / self.requests
+
+    def reset(self):
+        super(WireStats, self).reset()
+        self.requests = 0
+        self.concurrency_sum = 0
+        self.concurrency_max = 0
+
+    def to_record(self, prefix='wire.'):
+        record = super(WireStats, self).to_record(prefix)
+        if self.requests:
+            record[prefix + 'concurrency_mean'] = self.concurrency_mean()
+            record[prefix + 'concurrency_max'] = self.concurrency_max
+        return record
+
+class Interposer(object):
+    """
+    Listens on a local port and forwards every connection to the RPC server
+    at `host`:`port`, recording requests and responses to WireStats.
+
+    Latency is measured from forwarding the request to receiving the
+    response, which excludes serialization and other overhead of the Python
+    client; request/response sizes are the sizes of the msgpack-rpc messages.
+    """
+
+    def __init__(self, host, port, stats=None):
+        self.upstream = (host, port)
+        self.stats = stats if stats is not None else WireStats()
+        self._in_flight = 0
+        self._lock = threading.Lock()
+        self._connections = []
+        self._running = False
+        self._listener = None
+        self._thread = None
+
+    def start(self):
+        self._listener = socket.socket()
+        self._listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._listener.bind(('127.0.0.1', 0))
+        self._listener.listen(128)
+        self._running = True
+        self._thread = _daemon(self._accept_loop)
+        log.debug('interposer started: 127.0.0.1:%d -> %s:%d', self.get_port(), self.upstream[0], self.upstream[1])
+        return self
+
+    def stop(self):
+        if not self._running:
+            return
+        self._running = False
+        self._thread.join()
+        self._listener.close()
+        with self._lock:
+            connections = self._connections
+            self._connections = []
+        for conn in connections:
+            conn.close()
+        log.debug('interposer stopped: %s:%d', self.upstream[0], self.upstream[1])
+
+    def is_running(self):
+        return self._running
+
+    def get_port(self):
+        return self._listener.getsockname()[1]
+
+    def get_host_port(self):
+        """
+        Returns the host/port clients should connect to as tuple.
+        """
+        return ('127.0.0.1', self.get_port())
+
+    def _accept_loop(self):
+        while self._running:
+            (readable, _, _) = select.select([self._listener], [], [], 0.1)
+            if not readable:
+                continue
+            (client, address) = self._listener.accept()
+            try:
+                server = socket.create_connection(self.upstream)
+            except socket.error as e:
+                log.warning('interposer failed to connect to %s:%d (%s)', self.upstream[0], self.upstream[1], e)
+                client.close()
+                continue
+            conn = _Connection(self, client, server)
+            with self._lock:
+                self._connections.append(conn)
+            conn.start()
+
+    def _request_sent(self):
+        with self._lock:
+            self._in_flight += 1
+            in_flight = self._in_flight
+        self.stats.record_concurrency(in_flight)
+
+    def _response_received(self, count=1):
+        with self._lock:
+            self._in_flight -= count
+
+    def _connection_closed(self, conn):
+        with self._lock:
+            if conn in self._connections:
+                self._connections.remove(conn)
+
+class _Connection(object):
+    """
+    Pair of sockets (client and server side) forwarded by the interposer.
+    """
+
+    def __init__(self, interposer, client, server):
+        self._interposer = interposer
+        self._client = client
+        self._server = server
+        self._pending = {} # msgid -> (sent time, method, request bytes)
+        self._forwarders = 2
+        self._lock = threading.Lock()
+        for sock in (client, server):
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+    def start(self):
+        _daemon(self._forward, self._client, self._server, self._on_request)
+        _daemon(self._forward, self._server, self._client, self._on_response)
+
+    def close(self):
+        for sock in (self._client, self._server):
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except socket.error:
+                pass # already closed
+
+    def _forward(self, src, dst, on_message):
+        unpacker = msgpack.Unpacker()
+        size = [0]
+        def count(data):
+            size[0] += len(data)
+        try:
+            while True:
+                data = src.recv(65536)
+                if not data:
+                    break
+                unpacker.feed(data)
+                messages = []
+                while True:
+                    try:
+                        message = unpacker.unpack(write_bytes=count)
+                    except msgpack.OutOfData:
+                        break
+                    messages.append((message, size[0]))
+                    size[0] = 0
+                now = time.time()
+                # messages are recorded before forwarding, so that the stats are
+                # up to date when the peer receives them
+                for (message, message_size) in messages:
+                    on_message(message, message_size, now)
+                dst.sendall(data)
+        except socket.error:
+            pass # connection closed
+        finally:
+            self._closed()
+
+    def _on_request(self, message, size, now):
+        if message[0] != REQUEST:
+            return
+        with self._lock:
+            self._pending[message[1]] = (now, message[2], size)
+        self._interposer._request_sent()
+
+    def _on_response(self, message, size, now):
+        if message[0] != RESPONSE:
+            return
+        with self._lock:
+            request = self._pending.pop(message[1], None)
+        if request is None:
+            return
+        (sent, method, request_size) = request
+        self._interposer._response_received()
+        self._interposer.stats.record(method, now - sent, request_size, size, message[2] is not None)
+
+    def _closed(self):
+        self.close()
+        with self._lock:
+            pending = len(self._pending)
+            self._pending = {}
+            self._forwarders -= 1
+            if self._forwarders == 0:
+                self._client.close()
+                self._server.close()
+        if pending:
+            self._interposer._response_received(pending)
+        self._interposer._connection_closed(self)
+
+def _daemon(target, *args):
+    thread = threading.Thread(target=target, args=args)
+    thread.daemon = True
+    thread.start()
+    return thread
@@ -0,0 +1,558 @@
+# -*- coding: utf-8 -*-
+
+"""
+Load generator that drives workloads at Jubatus servers and proxies.
+"""
+
+import time
+import threading
+import multiprocessing
+import Queue
+
+from .dataset import prepare_dataset, read_datum_batches
+from .stats import Histogram
+from .pipeline import get_async_client_class
+from .unit import JubaTestFixtureFailedError
+from .exceptions import JubaTestAssertionError
+from .logger import log
+
+class DatasetWorkload(object):
+    """
+    Streams records of the dataset (svmlight or CSV) as batched RPC calls.
+    For `train`, each record is sent as (label, datum) with the label
+    converted by `label` (e.g. use `float` for regression); for other
+    methods (e.g. `classify`), the labels are discarded.
+    The binary cache of the dataset is prepared on construction, so that
+    workers do not have to parse the dataset.
+    """
+
+    def __init__(self, path, method='train', batch_size=100, label=str, repeat=False, format=None, cache=True):
+        self.path = path
+        self.method = method
+        self.batch_size = batch_size
+        self.label = label
+        self.repeat = repeat
+        self.format = format
+        self.cache = cache
+        if cache:
+            prepare_dataset(path, format)
+
+    def calls(self, worker, workers):
+        """
+        Yields (method, args) tuples assigned to the given worker.
+        """
+        while True:
+            for batch in read_datum_batches(self.path, self.batch_size, worker, workers, self.format, self.cache, label=self.label):
+                if self.method == 'train':
+                    yield (self.method, (batch,))
+                else:
+                    yield (self.method, ([d for (label, d) in batch],))
+            if not self.repeat:
+                break
+
+class LoadResult(object):
+    """
+    Aggregated result of the load generation.
+    When `timeline_interval` (seconds) is given, calls are also aggregated
+    into the timeline, per interval of their completion time.
+    """
+
+    def __init__(self, timeline_interval=None):
+        self.calls = 0
+        self.records = 0
+        self.errors = {}
+        self.latency = Histogram()
+        self.begin = None
+        self.end = None
+        self.failures = []
+        self.timeline_interval = timeline_interval
+        self.timeline = {} # index of interval -> [calls, records, errors, latency Histogram]
+
+    def record_call(self, begin, end, records):
+        self.calls += 1
+        self.records += records
+        self.latency.record(end - begin)
+        self._update_period(begin, end)
+        if self.timeline_interval:
+            bucket = self._bucket(end)
+            bucket[0] += 1
+            bucket[1] += records
+            bucket[3].record(end - begin)
+
+    def record_error(self, begin, end, error):
+        name = error.__class__.__name__
+        self.errors[name] = self.errors.get(name, 0) + 1
+        self._update_period(begin, end)
+        if self.timeline_interval:
+            self._bucket(end)[2] += 1
+
+    def merge(self, other):
+        self.calls += other.calls
+        self.records += other.records
+        for (name, count) in other.errors.items():
+            self.errors[name] = self.errors.get(name, 0) + count
+        self.latency.merge(other.latency)
+        if other.begin is not None:
+            self._update_period(other.begin, other.end)
+        self.failures += other.failures
+        if other.timeline:
+            self.timeline_interval = other.timeline_interval
+        for (index, (calls, records, errors, latency)) in other.timeline.items():
+            if index not in self.timeline:
+                self.timeline[index] = [0, 0, 0, Histogram()]
+            bucket = self.timeline[index]
+            bucket[0] += calls
+            bucket[1] += records
+            bucket[2] += errors
+            bucket[3].merge(latency)
+        return self
+
+    def error_count(self):
+        return sum(self.errors.values())
+
+    def elapsed(self):
+        if self.begin is None:
+            return 0.0
+        return self.end - self.begin
+
+    def throughput(self):
+        """
+        Number of records processed per second.
+        """
+        elapsed = self.elapsed()
+        if elapsed == 0:
+            return 0.0
+        return self.records / elapsed
+
+    def call_rate(self):
+        """
+        Number of calls completed per second.
+        """
+        elapsed = self.elapsed()
+        if elapsed == 0:
+            return 0.0
+        return self.calls / elapsed
+
+    def timeline_points(self):
+        """
+        Returns list of (start time, calls, records, errors, latency Histogram)
+        for each interval from the first to the last one in the timeline;
+        intervals without calls are included with zero counts.
+        """
+        if not self.timeline:
+            return []
+        points = []
+        for index in range(min(self.timeline), max(self.timeline) + 1):
+            (calls, records, errors, latency) = self.timeline.get(index, [0, 0, 0, Histogram()])
+            points.append((index * self.timeline_interval, calls, records, errors, latency))
+        return points
+
+    def slo_violations(self, slo):
+        """
+        Returns list of messages for percentiles exceeding the SLO; `slo` is a
+        dict of {percentile: latency in seconds}.
+        """
+        violations = []
+        for p in sorted(slo):
+            actual = self.latency.percentile(p)
+            if actual is not None and slo[p] < actual:
+                violations.append('p%g latency %.3f ms exceeds SLO %.3f ms' % (p, actual * 1000, slo[p] * 1000))
+        return violations
+
+    def to_record(self, prefix=''):
+        """
+        Returns the summary as dict, to be attached to the test case.
+        """
+        record = {
+            'calls': self.calls,
+            'records': self.records,
+            'errors': self.error_count(),
+            'throughput': self.throughput(),
+            'calls_per_sec': self.call_rate(),
+        }
+        record.update(self.latency.summary())
+        return dict([(prefix + key, value) for (key, value) in record.items()])
+
+    def _update_period(self, begin, end):
+        if self.begin is None or begin < self.begin:
+            self.begin = begin
+        if self.end is None or self.end < end:
+            self.end = end
+
+    def _bucket(self, end):
+        index = int(end // self.timeline_interval)
+        if index not in self.timeline:
+            self.timeline[index] = [0, 0, 0, Histogram()]
+        return self.timeline[index]
+
+class LoadCurve(object):
+    """
+    Latency-vs-throughput curve; list of (target rate, LoadResult) of each step.
+    """
+
+    def __init__(self):
+        self.points = []
+
+    def add(self, rate, result):
+        self.points.append((rate, result))
+
+    def slo_violations(self, slo):
+        violations = []
+        for (rate, result) in self.points:
+            violations += ['at %g calls/sec: %s' % (rate, v) for v in result.slo_violations(slo)]
+        return violations
+
+    def sustainable_rate(self, slo):
+        """
+        Returns the highest target rate whose latency met the SLO, or None.
+        """
+        rates = [rate for (rate, result) in self.points if not result.slo_violations(slo)]
+        if not rates:
+            return None
+        return max(rates)
+
+    def to_record(self, prefix=''):
+        record = {}
+        for (rate, result) in self.points:
+            record.update(result.to_record('%srate_%g.' % (prefix, rate)))
+        return record
+
+class ScalingCurve(object):
+    """
+    Throughput/latency curve over the number of servers; list of
+    (number of servers, LoadResult) of each cluster size.
+    Parallel efficiency is the throughput relative to the linear scaling of
+    the smallest cluster measured.
+    """
+
+    def __init__(self):
+        self.points = []
+
+    def add(self, servers, result):
+        self.points.append((servers, result))
+        self.points.sort(key=lambda p: p[0])
+
+    @staticmethod
+    def steps(maximum, minimum=1):
+        """
+        Returns the numbers of servers to measure: powers of two from
+        `minimum` below `maximum`, then `maximum` itself.
+        """
+        steps = []
+        servers = minimum
+        while servers < maximum:
+            steps.append(servers)
+            servers *= 2
+        return steps + [maximum]
+
+    def efficiency(self, servers):
+        (base_servers, base_result) = self.points[0]
+        for (n, result) in self.points:
+            if n == servers:
+                base = base_result.throughput() / base_servers * n
+                if base == 0:
+                    return 0.0
+                return result.throughput() / base
+        raise KeyError(servers)
+
+    def speedup(self, servers):
+        return self.efficiency(servers) * servers / self.points[0][0]
+
+    def to_record(self, prefix=''):
+        record = {}
+        for (servers, result) in self.points:
+            key = '%sservers_%d.' % (prefix, servers)
+            record.update(result.to_record(key))
+            record[key + 'efficiency'] = self.efficiency(servers)
+        return record
+
+class LoadGenerator(object):
+    """
+    Pushes the workload to the target RPC server (server or proxy) from
+    `processes` worker processes, each having `connections` connections.
+    When `pipeline` is greater than 1, each connection keeps up to `pipeline`
+    requests in flight using the pipelined client.
+
+    In the closed-loop mode (`run`), each connection issues the next call as
+    soon as the previous one completes.  In the open-loop mode (`run_open_loop`),
+    calls are scheduled at the target rate regardless of the responses, and the
+    latency is measured from the intended send time so that the queueing delay
+    is not hidden (i.e., free from coordinated omission).  Note that in the
+    open-loop mode, `connections` must be large enough to keep up with the rate.
+    When `timeline_interval` (seconds) is given, results are also aggregated
+    per interval (see LoadResult.timeline_points).
+
+    The workload yields (method, args) tuples from `calls(worker, workers)`;
+    a call may have a callable as the third element, which receives the
+    result of the call when it succeeds (called from connection threads).
+    """
+
+    WORKER_POLL_INTERVAL = 1 # sec
+    OPEN_LOOP_START_DELAY = 0.5 # sec; time for workers to get ready
+
+    def __init__(self, target, workload, processes=1, connections=1, cluster_name=None, timeout_sec=None, pipeline=1, timeline_interval=None):
+        self.target = target
+        self.workload = workload
+        self.processes = processes
+        self.connections = connections
+        self.pipeline = pipeline
+        self.timeline_interval = timeline_interval
+        self.cluster_name = cluster_name
+        self.timeout_sec = timeout_sec
+
+    def run(self, duration=None, max_calls=None):
+        """
+        Runs the workload until it is exhausted, `duration` seconds elapsed,
+        or `max_calls` calls are issued.  Returns LoadResult.
+        """
+        deadline = None
+        if duration:
+            deadline = time.time() + duration
+        plans = []
+        for i in range(self.processes):
+            worker_max_calls = None
+            if max_calls is not None:
+                worker_max_calls = max_calls // self.processes + (1 if i < max_calls % self.processes else 0)
+            plans.append(_ClosedLoopPlan(deadline, worker_max_calls))
+        log.debug('starting closed-loop load generation: %d process(es) x %d connection(s)', self.processes, self.connections)
+        return self._run_workers(plans)
+
+    def run_open_loop(self, rates, step_duration, slo=None):
+        """
+        Runs the workload at each of the target `rates` (calls/sec; a number or
+        a list for stepped ramp-up) for `step_duration` seconds.  Returns LoadCurve.
+        When `slo` ({percentile: latency in seconds}) is given, stops ramping
+        up after the step violating the SLO.
+        """
+        if not isinstance(rates, (list, tuple)):
+            rates = [rates]
+        curve = LoadCurve()
+        for rate in rates:
+            begin = time.time() + self.OPEN_LOOP_START_DELAY
+            end = begin + step_duration
+            plans = [_OpenLoopPlan(float(rate) / self.processes, begin + float(i) / rate, end) for i in range(self.processes)]
+            log.debug('starting open-loop load generation at %g calls/sec: %d process(es) x %d connection(s)', rate, self.processes, self.connections)
+            result = self._run_workers(plans)
+            curve.add(rate, result)
+            if slo and result.slo_violations(slo):
+                log.debug('SLO violated at %g calls/sec; stop ramping up', rate)
+                break
+        return curve
+
+    def _run_workers(self, plans):
+        client_args = self._client_args()
+        queue = multiprocessing.Queue()
+        workers = []
+        for (i, plan) in enumerate(plans):
+            worker = multiprocessing.Process(target=_run_worker, args=(
+                i, len(plans), self.connections, self.pipeline, client_args, self.workload, plan, queue, self.timeline_interval))
+            worker.daemon = True
+            worker.start()
+            workers.append(worker)
+
+        result = LoadResult(self.timeline_interval)
+        for r in self._collect(workers, queue):
+            result.merge(r)
+        for worker in workers:
+            worker.join()
+
+        if result.failures:
+            raise JubaTestFixtureFailedError('load generator worker failed: %s' % '; '.join(result.failures))
+        log.debug('load generation completed: %d calls, %d errors in %f seconds', result.calls, result.error_count(), result.elapsed())
+        return result
+
+    def _collect(self, workers, queue):
+        results = []
+        while len(results) < len(workers):
+            try:
+                results.append(queue.get(True, self.WORKER_POLL_INTERVAL))
+            except Queue.Empty:
+                if not any([w.is_alive() for w in workers]) and queue.empty():
+                    raise JubaTestFixtureFailedError('load generator worker exited unexpectedly')
+        return results
+
+    def _client_args(self):
+        (host, port) = self.target.get_host_port()
+        if not port:
+            raise JubaTestAssertionError('port for this RPC server is not available (maybe not started yet?)')
+        cluster_name = self.cluster_name
+        if cluster_name is None:
+            cluster_name = self.target.cluster_name()
+        timeout_sec = self.timeout_sec
+        if timeout_sec is None:
+            timeout_sec = self.target.CLIENT_TIMEOUT
+        return (self.target.get_client_class(), host, port, cluster_name, timeout_sec)
+
+def count_records(args):
+    """
+    Number of records in the RPC call; length of the first argument if it is a batch.
+    """
+    if args and isinstance(args[0], list):
+        return len(args[0])
+    return 1
+
+class _ClosedLoopPlan(object):
+    """
+    Issues calls without schedule until the deadline or the number of calls reached.
+    """
+
+    def __init__(self, deadline, max_calls):
+        self.deadline = deadline
+        self.remaining = max_calls
+
+    def next_slot(self):
+        """
+        Returns the intended send time of the next call (None for "now"),
+        or raises StopIteration when no more calls should be issued.
+        """
+        if self.deadline and self.deadline <= time.time():
+            raise StopIteration
+        if self.remaining is not None:
+            if self.remaining <= 0:
+                raise StopIteration
+            self.remaining -= 1
+        return None
+
+class _OpenLoopPlan(object):
+    """
+    Schedules calls at the constant rate from `begin` until `end`.
+    """
+
+    def __init__(self, rate, begin, end):
+        self.interval = 1.0 / rate
+        self.begin = begin
+        self.end = end
+        self.issued = 0
+
+    def next_slot(self):
+        intended = self.begin + self.issued * self.interval
+        if self.end <= intended:
+            raise StopIteration
+        self.issued += 1
+        return intended
+
+def _run_worker(index, processes, connections, pipeline, client_args, workload, plan, queue, timeline_interval=None):
+    result = LoadResult(timeline_interval)
+    try:
+        calls = workload.calls(index, processes)
+        lock = threading.Lock()
+        def next_call():
+            with lock:
+                try:
+                    intended = plan.next_slot()
+                except StopIteration:
+                    return None
+                call = next(calls, None)
+                if call is None:
+                    return None
+                return (intended,) + call
+        if 1 < pipeline:
+            threads = [_PipelinedConnectionThread(client_args, next_call, pipeline, timeline_interval) for i in range(connections)]
+        else:
+            threads = [_ConnectionThread(client_args, next_call, timeline_interval) for i in range(connections)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+            result.merge(thread.result)
+    except BaseException as e:
+        result.failures.append('%s: %s' % (e.__class__.__name__, e))
+    queue.put(result)
+
+class _ConnectionThread(threading.Thread):
+    """
+    Issues calls over one client connection.
+    """
+
+    def __init__(self, client_args, next_call, timeline_interval=None):
+        super(_ConnectionThread, self).__init__()
+        self.client_args = client_args
+        self.next_call = next_call
+        self.result = LoadResult(timeline_interval)
+
+    def run(self):
+        cli = None
+        try:
+            (cli_class, host, port, cluster_name, timeout_sec) = self.client_args
+            cli = cli_class(host, port, cluster_name, timeout_sec)
+            while True:
+                call = self.next_call()
+                if call is None:
+                    break
+                (intended, method, args) = call[:3]
+                on_result = call[3] if 3 < len(call) else None
+                if intended is not None:
+                    delay = intended - time.time()
+                    if 0 < delay:
+                        time.sleep(delay)
+                    begin = intended
+                else:
+                    begin = time.time()
+                try:
+                    result = getattr(cli, method)(*args)
+                except Exception as e:
+                    self.result.record_error(begin, time.time(), e)
+                    # the connection may be broken after errors (e.g. timeout)
+                    cli.get_client().close()
+                    cli = cli_class(host, port, cluster_name, timeout_sec)
+                else:
+                    self.result.record_call(begin, time.time(), count_records(args))
+                    if on_result is not None:
+                        on_result(result)
+        except BaseException as e:
+            self.result.failures.append('%s: %s' % (e.__class__.__name__, e))
+        finally:
+            if cli:
+                cli.get_client().close()
+
+class _PipelinedConnectionThread(_ConnectionThread):
+    """
+    Issues calls over one pipelined client connection.
+    """
+
+    def __init__(self, client_args, next_call, pipeline, timeline_interval=None):
+        super(_PipelinedConnectionThread, self).__init__(client_args, next_call, timeline_interval)
+        self.pipeline = pipeline
+
+    def run(self):
+        cli = None
+        try:
+            (cli_class, host, port, cluster_name, timeout_sec) = self.client_args
+            cli = get_async_client_class(cli_class)(host, port, cluster_name, timeout_sec, self.pipeline)
+            while True:
+                call = self.next_call()
+                if call is None:
+                    break
+                (intended, method, args) = call[:3]
+                on_result = call[3] if 3 < len(call) else None
+                if intended is not None:
+                    delay = intended - time.time()
+                    if 0 < delay:
+                        cli.poll(delay)
+                    begin = intended
+                else:
+                    begin = time.time()
+                future = getattr(cli, method)(*args)
+                future.add_done_callback(self._callback(begin, count_records(args), on_result))
+            cli.wait()
+        except BaseException as e:
+            self.result.failures.append('%s: %s' % (e.__class__.__name__, e))
+        finally:
+            if cli:
+                cli.close()
+
+    def _callback(self, begin, records, on_result=None):
+        def on_done(future):
+            error = future.error()
+            if error is not None:
+                if not isinstance(error, Exception):
+                    error = _RPCError(error)
+                self.result.record_error(begin, future.done_time, error)
+            else:
+                self.result.record_call(begin, future.done_time, records)
+                if on_result is not None:
+                    on_result(future.result())
+        return on_done
+
+class _RPCError(Exception):
+    pass
@@ -5,6 +5,8 @@ Log parser for Jubatus servers/keepers
 """
 
 import re
+import pipes
+import collections
 from datetime import datetime
 
 from .exceptions import JubaTestAssertionError
@@ -16,6 +18,11 @@ class Log:
     """
 
     log_juba = re.compile('^(\d{4})-(\d{2})-(\d{2}) (\d{2}):(\d{2}):(\d{2}),(\d{3})\s+(\d+)\s+([A-Z]+)\s+\[(.+?):(\d+)\] ')
+    log_mix  = re.compile('mixed with (\d+) servers in ([0-9.eE+-]+) secs, (\d+) bytes')
+    log_start = re.compile('starting (juba\w+) \S+ RPC server at ')
+    log_listen = re.compile('start listening at port (\d+)')
+    log_load_begin = re.compile('starting load from (.+)')
+    log_load_end = re.compile('loaded from (.+)')
     log_zk   = re.compile('^(\d{4})-(\d{2})-(\d{2}) (\d{2}):(\d{2}):(\d{2}),(\d{3}):(\d+)\((0x[0-9a-f]+)\):ZOO_([A-Z]+)@(.+?)@(\d+): ')
 
     def __init__(self, node, line):
@@ -74,6 +81,17 @@ class Log:
                 log.warning('failed to parse log line: %s', line)
         return entries
 
+MixRound = collections.namedtuple('MixRound', ['time', 'node', 'servers', 'seconds', 'bytes'])
+Startup = collections.namedtuple('Startup', ['time', 'node', 'program', 'listen_time', 'milliseconds'])
+ModelLoad = collections.namedtuple('ModelLoad', ['time', 'node', 'path', 'milliseconds'])
+
+def milliseconds(begin, end):
+    """
+    Returns milliseconds between two log times (datetime).
+    """
+    delta = end - begin
+    return (delta.days * 86400 + delta.seconds) * 1000 + delta.microseconds / 1000.0
+
 class LogLevel:
     """
     Represents log levels.
@@ -131,6 +149,45 @@ class LogFilter:
     def message(self, pattern):
         return LogFilter(filter(lambda l: re.search(pattern, l.message), self.logs))
 
+    def mix_rounds(self):
+        """
+        Returns list of MixRound parsed from MIX completion logs.
+        """
+        rounds = []
+        for l in self.message(Log.log_mix).logs:
+            m = Log.log_mix.search(l.message)
+            rounds.append(MixRound(l.time, l.node, int(m.group(1)), float(m.group(2)), int(m.group(3))))
+        return rounds
+
+    def startups(self):
+        """
+        Returns list of Startup parsed from server startup logs; `milliseconds`
+        is the time from the startup message until the server starts listening
+        (None if the server did not start listening).
+        """
+        startups = []
+        for l in self.message(Log.log_start).logs:
+            m = Log.log_start.search(l.message)
+            listen = self.consume(l).node(l.node).message(Log.log_listen).logs
+            if listen:
+                startups.append(Startup(l.time, l.node, m.group(1), listen[0].time, milliseconds(l.time, listen[0].time)))
+            else:
+                startups.append(Startup(l.time, l.node, m.group(1), None, None))
+        return startups
+
+    def model_loads(self):
+        """
+        Returns list of ModelLoad parsed from completed model load logs.
+        """
+        loads = []
+        for l in self.message(Log.log_load_begin).logs:
+            path = Log.log_load_begin.search(l.message).group(1).strip()
+            for e in self.consume(l).node(l.node).message(Log.log_load_end).logs:
+                if Log.log_load_end.search(e.message).group(1).strip() == path:
+                    loads.append(ModelLoad(l.time, l.node, path, milliseconds(l.time, e.time)))
+                    break
+        return loads
+
     def consume(self, log):
         return LogFilter(self.logs[self.logs.index(log)+1:])
 
@@ -139,3 +196,69 @@ class LogFilter:
 
     def __str__(self):
         return '\n'.join(map(lambda x: str(x), self.logs))
+
+# Filters log entries (including continuation lines of multi-line entries)
+# of Jubatus and ZooKeeper logs; regular expressions are given as environment
+# variables to avoid escape processing.
+_FILTER_AWK = r"""
+BEGIN { keep = 1; inc = ENVIRON["JUBATEST_LOG_INCLUDE"]; exc = ENVIRON["JUBATEST_LOG_EXCLUDE"] }
+{
+  lv = ""
+  if ($0 ~ /^[0-9][0-9][0-9][0-9]-[0-9][0-9]-[0-9][0-9] [0-9][0-9]:[0-9][0-9]:[0-9][0-9],[0-9][0-9][0-9] +[0-9]+ +[A-Z]+ +\[/) {
+    lv = $4
+  } else if (match($0, /^[0-9][0-9][0-9][0-9]-[0-9][0-9]-[0-9][0-9] [0-9][0-9]:[0-9][0-9]:[0-9][0-9],[0-9][0-9][0-9]:[0-9]+\(0x[0-9a-f]+\):ZOO_[A-Z]+@/)) {
+    lv = substr($0, index($0, ":ZOO_") + 5, 1)
+  }
+  if (lv != "") {
+    r = index("FEWID", substr(lv, 1, 1))
+    if (r == 0) r = 4
+    keep = 1
+    if (2 < r) {
+      if (%(rank)d < r) keep = 0
+      if (keep && inc != "" && $0 !~ inc) keep = 0
+      if (keep && exc != "" && $0 ~ exc) keep = 0
+      if (keep && 1 < %(sample)d) { k = $0; gsub(/[0-9]+/, "", k); if (seen[k]++ %% %(sample)d != 0) keep = 0 }
+    }
+  }
+  if (keep) { print; fflush() }
+}
+"""
+
+class RemoteLogFilter(object):
+    """
+    Filters the output of servers on the node, before transferring it to
+    the test process.  Log entries are passed if the level is `level` or
+    more severe, matches `include` and does not match `exclude` (POSIX
+    extended regular expressions); when `sample` is given, only one of every
+    `sample` entries of the same form (ignoring digits) is passed.
+    ERROR and FATAL entries always pass.  Lines other than log entries pass
+    unless they follow a dropped entry (i.e. continuation lines).
+    """
+
+    def __init__(self, level=None, include=None, exclude=None, sample=None):
+        self.level = LogLevel.normalize(level) if level else LogLevel.DEBUG
+        self.include = include
+        self.exclude = exclude
+        self.sample = sample or 1
+
+    def awk_program(self):
+        return _FILTER_AWK % {
+            'rank': LogLevel.levels.index(self.level) + 1,
+            'sample': self.sample,
+        }
+
+    def shell_command(self, tee_path=None):
+        """
+        Returns the shell command that filters the standard input.  When
+        `tee_path` is given, the unfiltered input is also written to the file.
+        The filter ignores SIGTERM so that it can drain the output after the
+        server is terminated.
+        """
+        command = 'awk ' + pipes.quote(self.awk_program())
+        if self.include:
+            command = 'JUBATEST_LOG_INCLUDE=' + pipes.quote(self.include) + ' ' + command
+        if self.exclude:
+            command = 'JUBATEST_LOG_EXCLUDE=' + pipes.quote(self.exclude) + ' ' + command
+        if tee_path:
+            command = 'tee ' + pipes.quote(tee_path) + ' | ' + command
+        return "trap '' TERM; " + command
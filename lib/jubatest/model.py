@@ -0,0 +1,347 @@
+# -*- coding: utf-8 -*-
+
+"""
+Inspection of Jubatus model files.
+
+A model file consists of a 48-byte header, system data (msgpack, including
+the server ID and the timestamp of the save) and user data (msgpack, the
+model itself).  All integers in the header are big endian.
+"""
+
+import os
+import json
+import mmap
+import pipes
+import struct
+import hashlib
+import collections
+
+import msgpack
+
+from .remote import RemoteProcessFailedError
+from .unit import JubaTestFixtureFailedError
+from .exceptions import JubaTestAssertionError
+from .logger import log
+
+MAGIC = 'jubatus\0'
+HEADER_SIZE = 48
+
+class ModelHeader(object):
+    """
+    Header of the model file.
+    """
+
+    _format = struct.Struct('>8sQIIIIQQ')
+
+    def __init__(self, format_version, jubatus_version, crc32, system_data_size, user_data_size):
+        self.format_version = format_version
+        self.jubatus_version = jubatus_version
+        self.crc32 = crc32
+        self.system_data_size = system_data_size
+        self.user_data_size = user_data_size
+
+    @staticmethod
+    def parse(data):
+        """
+        Parses the header from the first HEADER_SIZE bytes of the model file.
+        """
+        if len(data) < HEADER_SIZE:
+            raise JubaTestAssertionError('model file too short: %d bytes' % len(data))
+        (magic, format_version, major, minor, maintenance, crc32, system_data_size, user_data_size) = ModelHeader._format.unpack(data[:HEADER_SIZE])
+        if magic != MAGIC:
+            raise JubaTestAssertionError('invalid magic number in model file: %r' % magic)
+        return ModelHeader(format_version, (major, minor, maintenance), crc32, system_data_size, user_data_size)
+
+    def user_data_offset(self):
+        return HEADER_SIZE + self.system_data_size
+
+    def file_size(self):
+        return HEADER_SIZE + self.system_data_size + self.user_data_size
+
+    def __repr__(self):
+        return '<ModelHeader format %d, jubatus %s, system %d bytes, user %d bytes>' % (
+            self.format_version, '.'.join(map(str, self.jubatus_version)), self.system_data_size, self.user_data_size)
+
+ModelChecksum = collections.namedtuple('ModelChecksum', ['size', 'header', 'sha1'])
+
+# Prints the header in hex, the file size, and SHA-1 of the user data (which
+# excludes the system data, as it differs between servers).
+_CHECKSUM_SCRIPT = (
+    'f={path}; '
+    'test -r "$f" || exit 1; '
+    'od -An -v -tx1 -N{header} "$f" | tr -d " \\n"; echo; '
+    's=0; for b in $(od -An -v -tu1 -j32 -N8 "$f"); do s=$((s * 256 + b)); done; '
+    'stat -c %s "$f"; '
+    'tail -c +$(({header} + s + 1)) "$f" | sha1sum'
+)
+
+def parse_checksum(output):
+    """
+    Parses the output of the checksum script into ModelChecksum.
+    """
+    lines = output.splitlines()
+    if len(lines) < 3:
+        raise JubaTestAssertionError('unexpected checksum output: %r' % output)
+    header = ModelHeader.parse(lines[0].strip().decode('hex'))
+    size = int(lines[1])
+    if size != header.file_size():
+        raise JubaTestAssertionError('model file size %d does not match the header (%d bytes)' % (size, header.file_size()))
+    return ModelChecksum(size, header, lines[2].split()[0])
+
+def remote_checksum(node, path):
+    """
+    Computes ModelChecksum of the model file on the node, without
+    downloading it.
+    """
+    log.debug('computing checksum of model %s on host %s', path, node.get_host())
+    try:
+        output = node.run_process([_CHECKSUM_SCRIPT.format(path=pipes.quote(path), header=HEADER_SIZE)])
+    except RemoteProcessFailedError as e:
+        raise JubaTestFixtureFailedError('failed to compute checksum of model %s (%s)' % (path, e))
+    return parse_checksum(output)
+
+class ModelReader(object):
+    """
+    Reads the model file incrementally, so that large models can be
+    inspected without loading them into memory.
+
+    User data is an array of [user data version, model], where the model is
+    an array of sections packed by the engine (e.g. storage, converter state).
+    Boundaries of sections are found by walking msgpack headers without
+    decoding values, and digests are computed over the byte ranges in
+    chunks of READ_SIZE bytes; memory usage does not depend on the size of
+    sections (`sections` still decodes each section into memory).
+    """
+
+    READ_SIZE = 1024 * 1024
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, 'rb')
+        size = os.fstat(self._file.fileno()).st_size
+        if size < HEADER_SIZE:
+            self._file.close()
+            raise JubaTestAssertionError('model file too short: %d bytes' % size)
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        self.header = ModelHeader.parse(self._map[:HEADER_SIZE])
+        if size != self.header.file_size():
+            self.close()
+            raise JubaTestAssertionError('model file size %d does not match the header (%d bytes)' % (size, self.header.file_size()))
+        self._system = None
+        self._section_ranges = None
+
+    def close(self):
+        self._map.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def system(self):
+        """
+        Returns the system data as dict of version, timestamp, type (engine),
+        id (server ID) and config (JSON string).
+        """
+        if self._system is None:
+            data = msgpack.unpackb(self._map[HEADER_SIZE:self.header.user_data_offset()])
+            self._system = dict(zip(['version', 'timestamp', 'type', 'id', 'config'], data))
+        return self._system
+
+    def engine(self):
+        return self.system()['type']
+
+    def server_id(self):
+        return self.system()['id']
+
+    def config(self):
+        return json.loads(self.system()['config'])
+
+    def metadata(self):
+        """
+        Returns dict of metadata, excluding the config.
+        """
+        system = self.system()
+        return {
+            'engine': system['type'],
+            'server_id': system['id'],
+            'timestamp': system['timestamp'],
+            'format_version': self.header.format_version,
+            'jubatus_version': '.'.join(map(str, self.header.jubatus_version)),
+            'system_data_size': self.header.system_data_size,
+            'user_data_size': self.header.user_data_size,
+        }
+
+    def sections(self):
+        """
+        Iterates over the decoded sections of the model, one at a time.
+        """
+        for (begin, end) in self.section_ranges():
+            yield msgpack.unpackb(self._map[begin:end])
+
+    def section_ranges(self):
+        """
+        Returns list of (begin, end) byte offsets of the sections in the file.
+        """
+        if self._section_ranges is None:
+            reader = _ChunkReader(self._file, self.header.user_data_offset(), self.header.file_size(), self.READ_SIZE)
+            try:
+                if _read_container_header(reader) != (list, 2):
+                    raise JubaTestAssertionError('unexpected user data in model file %s' % self.path)
+                _skip_object(reader) # user data version
+                (kind, count) = _read_container_header(reader)
+                if kind is not list:
+                    raise JubaTestAssertionError('unexpected user data in model file %s' % self.path)
+                ranges = []
+                for i in range(count):
+                    begin = reader.tell()
+                    _skip_object(reader)
+                    ranges.append((begin, reader.tell()))
+            except ValueError as e:
+                raise JubaTestAssertionError('unexpected user data in model file %s (%s)' % (self.path, e))
+            self._section_ranges = ranges
+        return self._section_ranges
+
+    def section_digests(self):
+        """
+        Returns list of (size in bytes, SHA-1) of the sections, computed
+        without decoding them.
+        """
+        digests = []
+        for (begin, end) in self.section_ranges():
+            digest = hashlib.sha1()
+            self._file.seek(begin)
+            remaining = end - begin
+            while remaining:
+                data = self._file.read(min(remaining, self.READ_SIZE))
+                digest.update(data)
+                remaining -= len(data)
+            digests.append((end - begin, digest.hexdigest()))
+        return digests
+
+    def user_data_version(self):
+        unpacker = msgpack.Unpacker(read_size=self.READ_SIZE)
+        offset = self.header.user_data_offset()
+        unpacker.feed(self._map[offset:offset + min(self.READ_SIZE, self.header.user_data_size)])
+        unpacker.read_array_header()
+        return unpacker.unpack()
+
+class _ChunkReader(object):
+    """
+    Reads the byte range of the file sequentially through a buffer of
+    `read_size` bytes; skipped bytes are not read.
+    """
+
+    def __init__(self, f, begin, end, read_size):
+        self._file = f
+        self._end = end
+        self._read_size = read_size
+        self._buffer = ''
+        self._buffer_offset = begin # file offset of the buffer
+        self._pos = 0 # position in the buffer
+
+    def tell(self):
+        return self._buffer_offset + self._pos
+
+    def read(self, n):
+        if len(self._buffer) < self._pos + n:
+            offset = self.tell()
+            if self._end < offset + n:
+                raise ValueError('unexpected end of data at offset %d' % offset)
+            self._file.seek(offset)
+            self._buffer = self._file.read(max(n, min(self._read_size, self._end - offset)))
+            self._buffer_offset = offset
+            self._pos = 0
+        data = self._buffer[self._pos:self._pos + n]
+        self._pos += n
+        return data
+
+    def skip(self, n):
+        offset = self.tell()
+        if self._end < offset + n:
+            raise ValueError('unexpected end of data at offset %d' % offset)
+        if self._pos + n <= len(self._buffer):
+            self._pos += n
+        else:
+            self._buffer = ''
+            self._buffer_offset = offset + n
+            self._pos = 0
+
+# msgpack type byte -> (struct format of the length, kind), for variable-size types
+_VARIABLE_TYPES = {
+    0xc4: ('>B', 'raw'), 0xc5: ('>H', 'raw'), 0xc6: ('>I', 'raw'), # bin
+    0xc7: ('>B', 'ext'), 0xc8: ('>H', 'ext'), 0xc9: ('>I', 'ext'), # ext
+    0xd9: ('>B', 'raw'), 0xda: ('>H', 'raw'), 0xdb: ('>I', 'raw'), # str
+    0xdc: ('>H', list), 0xdd: ('>I', list), # array
+    0xde: ('>H', dict), 0xdf: ('>I', dict), # map
+}
+
+# msgpack type byte -> size of the payload, for fixed-size types
+_FIXED_SIZES = {
+    0xc0: 0, 0xc2: 0, 0xc3: 0, # nil, false, true
+    0xca: 4, 0xcb: 8, # float
+    0xcc: 1, 0xcd: 2, 0xce: 4, 0xcf: 8, # uint
+    0xd0: 1, 0xd1: 2, 0xd2: 4, 0xd3: 8, # int
+    0xd4: 2, 0xd5: 3, 0xd6: 5, 0xd7: 9, 0xd8: 17, # fixext (type + data)
+}
+
+def _read_header(reader):
+    """
+    Reads the header of the next object and skips its payload (if not a
+    container).  Returns (kind, number of elements) for arrays and maps,
+    (None, 0) otherwise.
+    """
+    b = ord(reader.read(1))
+    if b <= 0x7f or 0xe0 <= b:
+        return (None, 0) # fixint
+    if b <= 0x8f:
+        return (dict, b & 0x0f)
+    if b <= 0x9f:
+        return (list, b & 0x0f)
+    if b <= 0xbf:
+        reader.skip(b & 0x1f) # fixstr
+        return (None, 0)
+    if b in _FIXED_SIZES:
+        reader.skip(_FIXED_SIZES[b])
+        return (None, 0)
+    if b in _VARIABLE_TYPES:
+        (fmt, kind) = _VARIABLE_TYPES[b]
+        (length,) = struct.unpack(fmt, reader.read(struct.calcsize(fmt)))
+        if kind == 'raw':
+            reader.skip(length)
+        elif kind == 'ext':
+            reader.skip(1 + length)
+        else:
+            return (kind, length)
+        return (None, 0)
+    raise ValueError('invalid msgpack type 0x%02x' % b)
+
+def _read_container_header(reader):
+    (kind, count) = _read_header(reader)
+    if kind is None:
+        raise ValueError('array or map expected')
+    return (kind, count)
+
+def _skip_object(reader):
+    """
+    Skips the next object, walking nested containers without recursion.
+    """
+    remaining = 1
+    while remaining:
+        remaining -= 1
+        (kind, count) = _read_header(reader)
+        remaining += count * 2 if kind is dict else count
+
+def compare_models(path1, path2):
+    """
+    Compares the models section by section without loading them.
+    Returns list of indices of the sections that differ.
+    """
+    with ModelReader(path1) as r1:
+        with ModelReader(path2) as r2:
+            (d1, d2) = (r1.section_digests(), r2.section_digests())
+    if len(d1) != len(d2):
+        raise JubaTestAssertionError('number of model sections differ: %d, %d' % (len(d1), len(d2)))
+    return [i for (i, (s1, s2)) in enumerate(zip(d1, d2)) if s1 != s2]
@@ -0,0 +1,215 @@
+# -*- coding: utf-8 -*-
+
+"""
+Pipelined RPC client that keeps many requests in flight over one connection.
+"""
+
+import time
+import inspect
+
+import jubatus.common
+
+from .logger import log
+
+class RPCFuture(object):
+    """
+    Result of the pipelined RPC call.
+    """
+
+    def __init__(self, future, ret_type):
+        self._future = future
+        self._ret_type = ret_type
+        self._callbacks = []
+        self.send_time = time.time()
+        self.done_time = None
+        future.attach_error_handler(jubatus.common.client.error_handler)
+        future.attach_callback(self._on_done)
+
+    def add_done_callback(self, callback):
+        """
+        Registers the callback, which will be called with this future when
+        the response (or error) arrived.  Callbacks are called in the thread
+        that waits for responses (see `PipelinedClient.wait` and `poll`), and
+        must not block.
+        """
+        if self.done():
+            callback(self)
+        else:
+            self._callbacks.append(callback)
+
+    def done(self):
+        return self.done_time is not None
+
+    def error(self):
+        """
+        Returns the error of the call if failed, otherwise None.
+        This method does not block.
+        """
+        return self._future.error
+
+    def result(self):
+        """
+        Returns the result of the call if succeeded, otherwise None.
+        This method does not block; use this in done callbacks.
+        """
+        result = self._future.result
+        if result is not None and self._ret_type is not None:
+            return self._ret_type.from_msgpack(result)
+        return result
+
+    def latency(self):
+        if self.done_time is None:
+            return None
+        return self.done_time - self.send_time
+
+    def get(self):
+        """
+        Waits for the response and returns the result.
+        """
+        result = self._future.get()
+        if self._ret_type is not None:
+            return self._ret_type.from_msgpack(result)
+        return result
+
+    def wait(self):
+        """
+        Waits for the response, without raising errors.
+        """
+        self._future.join()
+
+    def _on_done(self, future):
+        self.done_time = time.time()
+        for callback in self._callbacks:
+            callback(self)
+
+class PipelinedClient(object):
+    """
+    Client that sends requests without waiting for the responses of preceding
+    requests; responses are matched with the requests by msgid, so they may
+    arrive out of order.  At most `max_in_flight` requests are kept outstanding;
+    further calls block until any of them completes.
+    Typed methods (e.g. `train`) are provided by the subclass generated for each
+    service (see `get_async_client_class`), and return RPCFuture.
+    This class is not thread-safe; use one instance per thread.
+    """
+
+    WAIT_INTERVAL = 0.1 # sec
+
+    def __init__(self, host, port, name, timeout_sec=10, max_in_flight=128):
+        self._client = self.CLIENT_CLASS(host, port, name, timeout_sec)
+        self._client.jubatus_client = _PipelinedCall(self, self._client.get_client(), name)
+        self._max_in_flight = max_in_flight
+        self._in_flight = []
+
+    def call(self, method, *args):
+        """
+        Calls the method without type conversion.
+        Cluster name is automatically prepended to the arguments.
+        """
+        return self._client.jubatus_client.call(method, args, None, [_RawType()] * len(args))
+
+    def wait(self, futures=None):
+        """
+        Waits for the given futures (or all requests in flight) to complete.
+        """
+        if futures is None:
+            futures = list(self._in_flight)
+        for future in futures:
+            future.wait()
+        self._prune()
+
+    def poll(self, timeout):
+        """
+        Processes responses arriving within `timeout` seconds.
+        Use this instead of `time.sleep` to keep the response times accurate.
+        """
+        deadline = time.time() + timeout
+        ioloop = self._client.get_client()._loop._ioloop
+        while time.time() < deadline:
+            handle = ioloop.add_timeout(deadline, ioloop.stop)
+            ioloop.start() # returns on each response, or at the deadline
+            ioloop.remove_timeout(handle)
+        self._prune()
+
+    def in_flight(self):
+        self._prune()
+        return len(self._in_flight)
+
+    def get_name(self):
+        return self._client.get_name()
+
+    def get_client(self):
+        return self._client.get_client()
+
+    def close(self):
+        self._client.get_client().close()
+
+    def _send(self, send_request):
+        self._prune()
+        while self._max_in_flight <= len(self._in_flight):
+            self._wait_any()
+            self._prune()
+        future = send_request()
+        self._in_flight.append(future)
+        return future
+
+    def _wait_any(self):
+        """
+        Processes responses until one arrives (or WAIT_INTERVAL elapses, so
+        that requests timed out are also noticed).
+        """
+        ioloop = self._client.get_client()._loop._ioloop
+        handle = ioloop.add_timeout(time.time() + self.WAIT_INTERVAL, ioloop.stop)
+        ioloop.start() # returns on each response
+        ioloop.remove_timeout(handle)
+
+    def _prune(self):
+        """
+        Removes all completed requests, which may complete out of order.
+        """
+        if any([future.done() for future in self._in_flight]):
+            self._in_flight = [future for future in self._in_flight if not future.done()]
+
+class _PipelinedCall(jubatus.common.client.Client):
+    """
+    Replacement of the Jubatus client core, which returns futures instead of results.
+    """
+
+    def __init__(self, pipeline, client, name):
+        super(_PipelinedCall, self).__init__(client, name)
+        self._pipeline = pipeline
+
+    def call(self, method, args, ret_type, args_type):
+        if len(args) != len(args_type):
+            raise TypeError('"%s" takes %d argument, but %d given' % (method, len(args_type), len(args)))
+        values = [self.name]
+        for (v, t) in zip(args, args_type):
+            values.append(t.to_msgpack(v))
+        return self._pipeline._send(lambda: RPCFuture(self.client.call_async(method, *values), ret_type))
+
+class _RawType(object):
+    def to_msgpack(self, m):
+        return m
+
+_async_client_classes = {}
+
+def get_async_client_class(client_class):
+    """
+    Returns the PipelinedClient subclass that provides the methods of the given
+    Jubatus client class (e.g. `jubatus.classifier.client.Classifier`).
+    """
+    if client_class not in _async_client_classes:
+        log.debug('generating pipelined client class for %s', client_class.__name__)
+        attrs = {'CLIENT_CLASS': client_class}
+        for (name, method) in inspect.getmembers(client_class, inspect.ismethod):
+            if name.startswith('_') or name in ('get_client', 'get_name', 'set_name'):
+                continue
+            attrs[name] = _delegate(name)
+        _async_client_classes[client_class] = type('Async' + client_class.__name__, (PipelinedClient,), attrs)
+    return _async_client_classes[client_class]
+
+def _delegate(name):
+    def method(self, *args):
+        return getattr(self._client, name)(*args)
+    method.__name__ = name
+    return method
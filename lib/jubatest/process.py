@@ -7,24 +7,30 @@ Provides local process management interface.
 import os
 import errno
 import time
+import threading
+import collections
 from subprocess import Popen, PIPE
 
 from .unit import JubaTestFixtureFailedError
 from .logger import log
 
 class LocalSubprocess(object):
-    def __init__(self, args, env=None):
+    def __init__(self, args, env=None, output_limit=None):
         """
         Prepares for process invocation.
+        When `output_limit` is given, stdout/stderr are read while the process
+        is running, and only the last `output_limit` bytes of each are kept.
         """
         self.args = args
         if env:
             self.env = env
         else:
             self.env = os.environ
+        self.output_limit = output_limit
         self.stdout = None
         self.stderr = None
         self._process = None
+        self._outputs = None
 
     def __del__(self):
         """
@@ -47,6 +53,8 @@ class LocalSubprocess(object):
             raise JubaTestFixtureFailedError('cannot start again using same instance')
         log.debug('starting process: %s', self.args)
         self._process = Popen(self.args, env=self.env, stdin=PIPE, stdout=PIPE, stderr=PIPE, preexec_fn=os.setpgrp, close_fds=True)
+        if self.output_limit is not None:
+            self._outputs = (_TailBuffer(self._process.stdout, self.output_limit), _TailBuffer(self._process.stderr, self.output_limit))
         log.debug('started process: %s', self.args)
 
     def wait(self, stdin=None):
@@ -58,7 +66,7 @@ class LocalSubprocess(object):
             raise JubaTestFixtureFailedError('this instance has not been started yet')
 
         log.debug('waiting for process to complete: %s', self.args)
-        (self.stdout, self.stderr) = self._process.communicate(stdin)
+        (self.stdout, self.stderr) = self._communicate(stdin)
         log.debug('process completed: %s', self.args)
         returncode = self._process.returncode
         self._process = None
@@ -84,7 +92,7 @@ class LocalSubprocess(object):
             # may be a race between poll and signal; just ignore
             log.debug('race between poll and signal detected')
         finally:
-            (self.stdout, self.stderr) = self._process.communicate()
+            (self.stdout, self.stderr) = self._communicate()
             self._process = None
 
     def is_running(self):
@@ -94,3 +102,71 @@ class LocalSubprocess(object):
         if self._process and self._process.poll() is None:
             return True
         return False
+
+    def _write_stdin(self, data):
+        """
+        Writes the data to the standard input of the running process.
+        """
+        if not self._process:
+            raise JubaTestFixtureFailedError('this instance has not been started yet')
+        self._process.stdin.write(data)
+        self._process.stdin.flush()
+
+    def _communicate(self, stdin=None):
+        """
+        Sends `stdin`, waits for the process and returns tuple of (stdout, stderr).
+        """
+        if self._outputs is None:
+            return self._process.communicate(stdin)
+        try:
+            if stdin:
+                self._process.stdin.write(stdin)
+            self._process.stdin.close()
+        except IOError as e:
+            if e.errno != errno.EPIPE: # process already exited
+                raise e
+        self._process.wait()
+        outputs = self._outputs
+        self._outputs = None
+        return tuple([output.get() for output in outputs])
+
+class _TailBuffer(object):
+    """
+    Reads the file in a background thread, keeping the last `limit` bytes.
+    """
+
+    def __init__(self, f, limit):
+        self.limit = limit
+        self.discarded = 0
+        self._file = f
+        self._chunks = collections.deque()
+        self._size = 0
+        self._thread = threading.Thread(target=self._run)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def get(self):
+        """
+        Waits for EOF and returns the data kept.
+        """
+        self._thread.join()
+        data = ''.join(self._chunks)
+        if self.limit < len(data):
+            self.discarded += len(data) - self.limit
+            data = data[len(data) - self.limit:]
+        return data
+
+    def _run(self):
+        try:
+            fd = self._file.fileno()
+            while True:
+                data = os.read(fd, 65536)
+                if not data:
+                    break
+                self._chunks.append(data)
+                self._size += len(data)
+                while self._chunks and self.limit <= self._size - len(self._chunks[0]):
+                    self._size -= len(self._chunks[0])
+                    self.discarded += len(self._chunks.popleft())
+        finally:
+            self._file.close()
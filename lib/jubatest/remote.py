@@ -2,6 +2,7 @@
 
 import time
 import os
+import pipes
 
 from .process import LocalSubprocess
 from .exceptions import JubaTestException
@@ -52,17 +53,26 @@ class AsyncRemoteProcess(LocalSubprocess):
     Provides remote (over-SSH) process invocation intetface.
     """
 
-    def __init__(self, host, args, envvars={}, timeout=None):
+    def __init__(self, host, args, envvars={}, timeout=None, output_limit=None, output_filters=None, spool_paths=None):
         """
         Prepares for process invocation.
         `host` can be an entry from ssh_config.
+        See LocalSubprocess for `output_limit`.
+        `output_filters` is a tuple of shell commands to filter stdout and
+        stderr on the remote host.
+        `spool_paths` is a tuple of files on the remote host to write stdout
+        and stderr to, instead of transferring them.
         """
         self.remote_host = host
         self.remote_args = args
         self.remote_envvars = envvars
 
+        if spool_paths:
+            args = args + _RemoteUtil.spool_redirects(*spool_paths)
+        elif output_filters:
+            args = args + _RemoteUtil.filter_redirects(*output_filters)
         ssh_args = _RemoteUtil.ssh_jobcontrol_cmdline(host, args, envvars, timeout)
-        super(AsyncRemoteProcess, self).__init__(ssh_args)
+        super(AsyncRemoteProcess, self).__init__(ssh_args, output_limit=output_limit)
 
     def __del__(self):
         """
@@ -87,6 +97,21 @@ class AsyncRemoteProcess(LocalSubprocess):
     def stop(self, signal='TERM'):
         super(AsyncRemoteProcess, self).wait(signal + '\n')
 
+    def send_signal(self, signal):
+        """
+        Sends the signal to the remote process without waiting for it;
+        only STOP and CONT can be sent before `stop`.
+        """
+        if signal not in ('STOP', 'CONT'):
+            raise RemoteProcessFailedError('only STOP or CONT can be sent to running process: %s' % signal)
+        self._write_stdin(signal + '\n')
+
+    def pause(self):
+        self.send_signal('STOP')
+
+    def resume(self):
+        self.send_signal('CONT')
+
 class _RemoteUtil(object):
     @classmethod
     def ssh_cmdline(cls, host, args, envvars):
@@ -96,6 +121,21 @@ class _RemoteUtil(object):
         ssh_args += args
         return ['ssh', '-q', host] + ssh_args
 
+    @classmethod
+    def filter_redirects(cls, stdout_filter, stderr_filter):
+        """
+        Redirects stdout/stderr through the filter commands using process
+        substitution (requires bash on the remote host).
+        """
+        return ['>', '>(' + stdout_filter + ')', '2>', '>(' + stderr_filter + ' >&2)']
+
+    @classmethod
+    def spool_redirects(cls, stdout_path, stderr_path):
+        """
+        Redirects stdout/stderr to the files.
+        """
+        return ['>', pipes.quote(stdout_path), '2>', pipes.quote(stderr_path)]
+
     @classmethod
     def ssh_jobcontrol_cmdline(cls, host, args, envvars, timeout=None):
         return cls.ssh_cmdline(host, args, envvars) + cls._ssh_jobcontrol_suffix(timeout)
@@ -111,7 +151,10 @@ class _RemoteUtil(object):
           - reload the log config and continue working (Jubatus 0.6.2 or later)
         ... both causing the following test cases to (possibly) fail.
         This suffix enables test cases to send any signal to the remote
-        processes.  We can give the signal name via the standard input.
+        processes.  We can give the signal name via the standard input;
+        STOP and CONT can be sent repeatedly before sending the final signal
+        (or an empty line to just wait for the process to exit).
+        Note that the timeout applies to each interval between signals.
         """
         if timeout:
             timeout_args = ['-t', str(int(timeout))]
@@ -120,10 +163,14 @@ class _RemoteUtil(object):
 
         return [
                  '&', '{',
+                       # read signal names line by line.
                        # when read failed (connection disconnect, timeout, etc.), always set KILL.
-                       'read'] + timeout_args + ['_SIG', '||', '{', '_SIG=KILL', ';', 'echo', 'JUBATEST: Process timed out, KILLing', ';', '}', ';'
-                       # if the read signal is not empty, send it to all the process whose Parent PID is the shell.
-                       '[', '-z', '${_SIG}', ']', '||', 'pkill', '-${_SIG}', '-P$$', ';',
+                       'while', 'read'] + timeout_args + ['_SIG', '||', '{', '_SIG=KILL', ';', 'echo', 'JUBATEST: Process timed out, KILLing', ';', '}', ';', 'do',
+                         # if the read signal is not empty, send it to all the process whose Parent PID is the shell.
+                         '[', '-z', '${_SIG}', ']', '||', 'pkill', '-${_SIG}', '-P$$', ';',
+                         # keep reading after STOP/CONT (pause/resume); otherwise stop reading.
+                         'case', '${_SIG}', 'in', 'STOP|CONT)', ';;', '*)', 'break', ';;', 'esac', ';',
+                       'done', ';',
                        # wait for the subprocesses to complete.
                        'wait', ';'
                  '}', '&>', '/dev/stderr',
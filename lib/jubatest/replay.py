@@ -0,0 +1,199 @@
+# -*- coding: utf-8 -*-
+
+"""
+Recording and replaying of RPC traffic.
+
+Traffic is recorded as an append-only stream of msgpack entries, each of
+which is an array of [send time (UNIX time), method, arguments (excluding
+the cluster name), latency (seconds), result, error message or nil].
+"""
+
+import time
+import threading
+
+import msgpack
+
+from .stats import Histogram
+from .pipeline import PipelinedClient, get_async_client_class
+from .instrument import MeteredFuture
+from .unit import JubaTestFixtureFailedError
+from .logger import log
+
+class TrafficRecorder(object):
+    """
+    Records RPC calls of the attached clients to the file.
+    Clients may be used from multiple threads.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.calls = 0
+        self._lock = threading.Lock()
+        self._packer = msgpack.Packer(default=lambda x: x.to_msgpack())
+        self._file = open(path, 'ab')
+
+    def attach(self, cli):
+        """
+        Records calls made by the Jubatus client (either synchronous or pipelined).
+        """
+        if isinstance(cli, PipelinedClient):
+            core = cli._client.jubatus_client
+        else:
+            core = cli.jubatus_client
+        core.client = _RecordingSession(core.client, self)
+        return cli
+
+    def record(self, begin, method, args, latency, result, error):
+        data = self._packer.pack([begin, method, list(args), latency, result, error])
+        with self._lock:
+            self._file.write(data)
+            self.calls += 1
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+class _RecordingSession(object):
+    """
+    Wraps msgpack-rpc client (session) to record the calls.
+    """
+
+    def __init__(self, session, recorder):
+        self._session = session
+        self._recorder = recorder
+
+    def call_async(self, method, *args):
+        begin = time.time()
+        def on_done(future):
+            latency = time.time() - begin
+            if future.error is not None:
+                self._recorder.record(begin, method, args[1:], latency, None, str(future.error))
+            else:
+                self._recorder.record(begin, method, args[1:], latency, future.result, None)
+        return MeteredFuture(self._session.call_async(method, *args), on_done)
+
+    def __getattr__(self, name):
+        return getattr(self._session, name)
+
+def read_traffic(path):
+    """
+    Iterates over recorded entries as tuples of
+    (send time, method, args, latency, result, error).
+    """
+    try:
+        with open(path, 'rb') as f:
+            for entry in msgpack.Unpacker(f):
+                yield tuple(entry)
+    except (IOError, ValueError, msgpack.UnpackException) as e:
+        raise JubaTestFixtureFailedError('failed to read traffic %s (%s)' % (path, e))
+
+class TrafficReplayer(object):
+    """
+    Re-issues the recorded calls to the RPC server (server or proxy).
+
+    `speed` is either 'original' (keep the recorded intervals between calls),
+    'max' (as fast as possible, keeping up to `max_in_flight` calls in flight),
+    or a number to scale the speed (e.g. 2 to replay twice as fast).
+    Calls are sent on schedule without waiting for their responses, but once
+    `max_in_flight` calls are outstanding, further sends block until a
+    response arrives; how far sends fell behind the schedule is recorded in
+    ReplayResult.send_lag, so that such coordinated omission is visible.
+    The latency is measured from the actual send time.
+    Results are compared with the recorded ones using `compare` (equality by
+    default); calls of methods in `ignore_methods` are not compared.
+    """
+
+    def __init__(self, path, compare=None, ignore_methods=()):
+        self.path = path
+        self.compare = compare or (lambda recorded, replayed: recorded == replayed)
+        self.ignore_methods = ignore_methods
+
+    def replay(self, target, speed='original', cluster_name=None, timeout_sec=None, max_in_flight=128):
+        """
+        Replays the traffic and returns ReplayResult.
+        """
+        if speed == 'original':
+            factor = 1.0
+        elif speed == 'max':
+            factor = None
+        else:
+            factor = float(speed)
+        if cluster_name is None:
+            cluster_name = target.cluster_name()
+        if timeout_sec is None:
+            timeout_sec = target.CLIENT_TIMEOUT
+        (host, port) = target.get_host_port()
+        cli = get_async_client_class(target.get_client_class())(host, port, cluster_name, timeout_sec, max_in_flight)
+        result = ReplayResult()
+        try:
+            log.debug('replaying traffic %s (speed: %s)', self.path, speed)
+            start = time.time()
+            first = None
+            for (begin, method, args, latency, recorded, error) in read_traffic(self.path):
+                if first is None:
+                    first = begin
+                if factor is not None:
+                    scheduled = start + (begin - first) / factor
+                    delay = scheduled - time.time()
+                    if 0 < delay:
+                        cli.poll(delay)
+                future = cli.call(method, *args)
+                if factor is not None:
+                    result.send_lag.record(max(0.0, future.send_time - scheduled))
+                future.add_done_callback(self._callback(result, method, latency, recorded, error))
+            cli.wait()
+            result.elapsed = time.time() - start
+        finally:
+            cli.close()
+        log.debug('replay completed: %d calls, %d mismatches, %d errors', result.calls, result.mismatches, result.errors)
+        return result
+
+    def _callback(self, result, method, latency, recorded, error):
+        def on_done(future):
+            result.calls += 1
+            result.original_latency.record(latency)
+            if future.error() is not None:
+                result.errors += 1
+                if error is None:
+                    result.mismatches += 1
+                return
+            result.latency.record(future.latency())
+            if method in self.ignore_methods:
+                return
+            if error is not None or not self.compare(recorded, future.result()):
+                result.mismatches += 1
+        return on_done
+
+class ReplayResult(object):
+    """
+    Result of the replay compared with the recording.
+    `send_lag` is the delay of sends behind the schedule (not recorded when
+    replayed at the max speed).
+    """
+
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.mismatches = 0
+        self.elapsed = 0.0
+        self.latency = Histogram()
+        self.original_latency = Histogram()
+        self.send_lag = Histogram()
+
+    def to_record(self, prefix='replay.'):
+        record = {
+            prefix + 'calls': self.calls,
+            prefix + 'errors': self.errors,
+            prefix + 'mismatches': self.mismatches,
+            prefix + 'elapsed': self.elapsed,
+        }
+        record.update(self.latency.summary(prefix + 'latency'))
+        record.update(self.original_latency.summary(prefix + 'original_latency'))
+        record.update(self.send_lag.summary(prefix + 'send_lag'))
+        return record
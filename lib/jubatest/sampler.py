@@ -0,0 +1,163 @@
+# -*- coding: utf-8 -*-
+
+"""
+Sampling of resource usage of remote processes.
+"""
+
+import csv
+import time
+import array
+import threading
+
+from .remote import RemoteProcessFailedError
+from .logger import log
+
+COLUMNS = ('time', 'cpu_seconds', 'rss_bytes', 'threads', 'fds')
+
+# Prints "<CLK_TCK> <PAGESIZE>", then "<pid> <number of fds> <contents of /proc/<pid>/stat>"
+# for the process (matched by the program name and the RPC port) and all of its descendants.
+_SAMPLE_SCRIPT = (
+    'echo "$(getconf CLK_TCK) $(getconf PAGESIZE)"; '
+    'p=$(pgrep -o -f -- \'^([^ ]*/)?{program} .*--rpc-port {port}( |$)\'); '
+    'c=$p; '
+    'while [ -n "$c" ]; do '
+    'c=$(pgrep -d, -P "$c"); p="$p $(echo $c | tr , \' \')"; '
+    'done; '
+    'for i in $p; do echo "$i $(ls /proc/$i/fd 2>/dev/null | wc -l) $(cat /proc/$i/stat 2>/dev/null)"; done'
+)
+
+def parse_proc_sample(output):
+    """
+    Parses the output of the sampling script.
+    Returns tuple of (cpu_seconds, rss_bytes, threads, fds) summed over the
+    processes, or None if no process is found.
+    """
+    lines = output.splitlines()
+    if len(lines) < 2:
+        return None
+    (clock_ticks, page_size) = [int(x) for x in lines[0].split()]
+    (ticks, pages, threads, fds) = (0, 0, 0, 0)
+    for line in lines[1:]:
+        (pid, nfds, stat) = (line.split(' ', 2) + ['', ''])[:3]
+        if ')' not in stat:
+            continue # process exited while sampling
+        fields = stat.rsplit(')', 1)[1].split()
+        # fields after comm: state (3), ..., utime (14), stime (15), ..., num_threads (20), ..., rss (24)
+        ticks += int(fields[11]) + int(fields[12])
+        threads += int(fields[17])
+        pages += int(fields[21])
+        fds += int(nfds)
+    if threads == 0:
+        return None
+    return (float(ticks) / clock_ticks, pages * page_size, threads, fds)
+
+class ResourceSeries(object):
+    """
+    Time series of resource usage samples, stored compactly in arrays.
+    """
+
+    def __init__(self):
+        self._columns = [array.array('d') for c in COLUMNS]
+
+    def append(self, timestamp, cpu_seconds, rss_bytes, threads, fds):
+        for (column, value) in zip(self._columns, (timestamp, cpu_seconds, rss_bytes, threads, fds)):
+            column.append(value)
+
+    def __len__(self):
+        return len(self._columns[0])
+
+    def column(self, name):
+        return self._columns[COLUMNS.index(name)]
+
+    def rows(self):
+        """
+        Iterates over samples as tuples of (time, cpu_seconds, rss_bytes, threads, fds).
+        """
+        return zip(*self._columns)
+
+    def cpu_usage(self):
+        """
+        Returns the average CPU usage (1.0 for one fully-used core) over the series.
+        """
+        (t, cpu) = (self.column('time'), self.column('cpu_seconds'))
+        if len(t) < 2 or t[-1] == t[0]:
+            return None
+        return (cpu[-1] - cpu[0]) / (t[-1] - t[0])
+
+    def export(self, path):
+        """
+        Writes the series to the CSV file.
+        """
+        with open(path, 'wb') as f:
+            writer = csv.writer(f)
+            writer.writerow(COLUMNS)
+            for row in self.rows():
+                writer.writerow(row)
+
+    def to_record(self, prefix='resource.'):
+        """
+        Returns the summary as dict, to be attached to the test case.
+        """
+        if len(self) == 0:
+            return {}
+        rss = self.column('rss_bytes')
+        record = {
+            prefix + 'samples': len(self),
+            prefix + 'rss_peak_bytes': int(max(rss)),
+            prefix + 'rss_mean_bytes': sum(rss) / len(rss),
+            prefix + 'rss_last_bytes': int(rss[-1]),
+            prefix + 'threads_peak': int(max(self.column('threads'))),
+            prefix + 'fds_peak': int(max(self.column('fds'))),
+        }
+        cpu_usage = self.cpu_usage()
+        if cpu_usage is not None:
+            record[prefix + 'cpu_usage_mean'] = cpu_usage
+        return record
+
+class ResourceSampler(object):
+    """
+    Periodically samples /proc of the remote process tree of the RPC server
+    (identified by the program name and the RPC port) through the node
+    (`run_process`), every `interval` seconds in a background thread.
+    """
+
+    def __init__(self, node, program, port, interval=1.0, series=None):
+        self.node = node
+        self.interval = interval
+        self.series = series if series is not None else ResourceSeries()
+        self._script = _SAMPLE_SCRIPT.format(program=program, port=port)
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run)
+        self._thread.daemon = True
+        self._thread.start()
+        return self
+
+    def stop(self):
+        if self._thread is None:
+            return
+        self._stopped.set()
+        self._thread.join()
+        self._thread = None
+
+    def sample(self):
+        """
+        Takes one sample; returns it as tuple, or None if the process is not found.
+        """
+        timestamp = time.time()
+        try:
+            sample = parse_proc_sample(self.node.run_process([self._script]))
+        except RemoteProcessFailedError as e:
+            log.debug('failed to sample resource usage on %s (%s)', self.node.get_host(), e)
+            return None
+        if sample is not None:
+            self.series.append(timestamp, *sample)
+        return sample
+
+    def _run(self):
+        while not self._stopped.is_set():
+            begin = time.time()
+            self.sample()
+            self._stopped.wait(max(0, self.interval - (time.time() - begin)))
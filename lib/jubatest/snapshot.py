@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+
+"""
+Local content-addressed cache of saved models.
+"""
+
+import os
+import json
+import hashlib
+import tempfile
+
+from .unit import JubaTestFixtureFailedError
+from .logger import log
+
+class SnapshotCache(object):
+    """
+    Stores model files by the digest of its contents, and maps snapshot
+    names to the digests so that a trained model can be reused later.
+    """
+
+    INDEX_FILE = 'index.json'
+
+    def __init__(self, directory=None):
+        if not directory:
+            directory = os.path.join(tempfile.gettempdir(), 'jubatest-snapshot')
+        self._directory = directory
+
+    def get_directory(self):
+        return self._directory
+
+    def put(self, name, service, data):
+        """
+        Stores the model data as snapshot `name`; returns the digest.
+        """
+        digest = hashlib.sha1(data).hexdigest()
+        path = self._model_path(digest)
+        self._prepare_directory()
+        if not os.path.exists(path):
+            log.debug('storing snapshot model %s (%d bytes)', digest, len(data))
+            with tempfile.NamedTemporaryFile(dir=self._directory, delete=False) as tmp_file:
+                tmp_file.write(data)
+            os.rename(tmp_file.name, path)
+        index = self._load_index()
+        index[name] = {'digest': digest, 'service': service}
+        self._save_index(index)
+        log.debug('registered snapshot %s: %s', name, digest)
+        return digest
+
+    def has(self, name):
+        """
+        Tests if the snapshot of given name is available.
+        """
+        entry = self._load_index().get(name)
+        return entry is not None and os.path.exists(self._model_path(entry['digest']))
+
+    def get(self, name):
+        """
+        Returns tuple of (service, digest, local path) of the snapshot.
+        """
+        if not self.has(name):
+            raise JubaTestFixtureFailedError('no such snapshot: %s' % name)
+        entry = self._load_index()[name]
+        return (entry['service'], entry['digest'], self._model_path(entry['digest']))
+
+    def _model_path(self, digest):
+        return os.path.join(self._directory, digest + '.jubatus')
+
+    def _prepare_directory(self):
+        if not os.path.isdir(self._directory):
+            os.makedirs(self._directory)
+
+    def _load_index(self):
+        try:
+            with open(os.path.join(self._directory, self.INDEX_FILE)) as f:
+                return json.load(f)
+        except IOError:
+            return {}
+
+    def _save_index(self, index):
+        with tempfile.NamedTemporaryFile(dir=self._directory, delete=False) as tmp_file:
+            json.dump(index, tmp_file)
+        os.rename(tmp_file.name, os.path.join(self._directory, self.INDEX_FILE))
@@ -0,0 +1,120 @@
+# -*- coding: utf-8 -*-
+
+"""
+Soak tests that drive a steady workload for a long time and detect growth
+of the server resources (e.g. memory leaks).
+"""
+
+import time
+
+from .load import LoadGenerator
+from .sampler import ResourceSampler
+from .status import StatusPoller
+from .stats import linear_fit
+from .unit import JubaTestCase
+from .logger import log
+
+HOUR = 3600.0
+
+class SoakResult(object):
+    """
+    Result of the soak run; growth rates are fitted by least squares to the
+    samples taken after `warmup_end` (UNIX time).
+    """
+
+    def __init__(self, load, resources, status, warmup_end):
+        self.load = load
+        self.resources = resources
+        self.status = status
+        self.warmup_end = warmup_end
+
+    def rss_growth(self):
+        """
+        Returns the RSS growth rate in bytes per hour after warmup, or None if
+        not enough samples are taken.
+        """
+        return self._growth(self.resources.column('time'), self.resources.column('rss_bytes'))
+
+    def status_growth(self):
+        """
+        Returns dict of growth rates (per hour) of numeric `get_status` values
+        after warmup, keyed by "<server ID>.<key>".
+        """
+        growth = {}
+        for server_id in self.status.servers():
+            for key in self.status.keys(server_id):
+                rate = self._growth(*self.status.get(server_id, key))
+                if rate is not None:
+                    growth[server_id + '.' + key] = rate
+        return growth
+
+    def to_record(self, prefix='soak.'):
+        """
+        Returns the summary as dict, to be attached to the test case.
+        """
+        record = self.load.to_record(prefix + 'load.')
+        record.update(self.resources.to_record(prefix + 'resource.'))
+        rss_growth = self.rss_growth()
+        if rss_growth is not None:
+            record[prefix + 'rss_growth_bytes_per_hour'] = rss_growth
+        for (key, rate) in self.status_growth().items():
+            record[prefix + 'status.' + key + '.growth_per_hour'] = rate
+        return record
+
+    def _growth(self, times, values):
+        points = [(t, v) for (t, v) in zip(times, values) if self.warmup_end <= t]
+        fit = linear_fit([t for (t, v) in points], [v for (t, v) in points])
+        if fit is None:
+            return None
+        return fit[0] * HOUR
+
+class JubaSoakCase(JubaTestCase):
+    """
+    Base class for soak tests.
+
+    `soak` drives the workload for `soak_duration` seconds (can be overridden
+    by the `JUBATEST_SOAK_DURATION` parameter), sampling the RSS and
+    `get_status` of the server every `sample_interval` seconds; only
+    aggregated latency and compact time series are kept during the run.
+    Use `env.output_limit` to bound the output captured from servers.
+    """
+
+    soak_duration = HOUR
+    warmup = 600 # sec
+    sample_interval = 10 # sec
+    max_rss_growth = 1024 * 1024 # bytes per hour after warmup
+
+    def soak(self, server, workload, duration=None, target=None, **kwds):
+        """
+        Drives the workload at `target` (defaults to `server`) and samples the
+        resources of `server`.  Keyword arguments are passed to LoadGenerator.
+        Returns SoakResult, which is also attached to the test record.
+        """
+        if duration is None:
+            duration = self.soak_duration
+        if server.output_limit is None:
+            log.warning('output of %s is not bounded during the soak run (see env.output_limit)', server.__class__.__name__)
+        begin = time.time()
+        resources = ResourceSampler(server.node, server.program(), server.port, self.sample_interval).start()
+        status = StatusPoller([server], self.sample_interval).start()
+        try:
+            log.info('soaking %s for %d seconds', server.__class__.__name__, duration)
+            load = LoadGenerator(target or server, workload, **kwds).run(duration=duration)
+        finally:
+            status.stop()
+            resources.stop()
+        result = SoakResult(load, resources.series, status.series, begin + self.warmup)
+        self.update_record(result.to_record())
+        return result
+
+    def assertNoMemoryGrowth(self, result, max_rss_growth=None, msg=None):
+        """
+        Fails if the RSS grows faster than `max_rss_growth` bytes per hour after warmup.
+        """
+        if max_rss_growth is None:
+            max_rss_growth = self.max_rss_growth
+        growth = result.rss_growth()
+        if growth is None:
+            self.fail(self._formatMessage(msg, 'not enough RSS samples after warmup'))
+        if max_rss_growth < growth:
+            self.fail(self._formatMessage(msg, 'RSS grows %d bytes/hour after warmup, exceeding %d bytes/hour' % (growth, max_rss_growth)))
@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+
+"""
+Measurement of the startup latency of RPC servers.
+"""
+
+import time
+
+from .unit import JubaTestFixtureFailedError
+from .logger import log
+
+class StartupTiming(object):
+    """
+    Startup latency of an RPC server, in seconds from the start request
+    (local clock):
+
+    - `ready`: the server accepts RPC calls
+    - `registered`: the server is listed as a cluster member by the proxy (None for standalone)
+
+    `listen_ms` is the time from the startup message until the server starts
+    listening, taken from the server log (node clock), available after
+    `parse_log` is called with the log of the stopped server.
+    """
+
+    def __init__(self):
+        self.ready = None
+        self.registered = None
+        self.listen_ms = None
+
+    def parse_log(self, logs):
+        """
+        Takes the startup breakdown from the LogFilter of the server.
+        """
+        startups = logs.startups()
+        if startups:
+            self.listen_ms = startups[-1].milliseconds
+        return self
+
+    def to_record(self, prefix='startup.'):
+        record = {}
+        for name in ['ready', 'registered']:
+            value = getattr(self, name)
+            if value is not None:
+                record['%s%s_ms' % (prefix, name)] = value * 1000
+        if self.listen_ms is not None:
+            record[prefix + 'listen_ms'] = self.listen_ms
+        return record
+
+def measure_startup(server, proxy=None, timeout=None, poll_interval=0.01):
+    """
+    Starts the server and returns StartupTiming.
+    When the proxy is given, waits until the server is registered as a
+    cluster member visible to the proxy.
+    """
+    if timeout is None:
+        timeout = server.STARTUP_TIMEOUT
+    timing = StartupTiming()
+    begin = time.time()
+    server.start(sync=False)
+    if server.wait_until_ready(timeout) is None:
+        server.stop()
+        raise JubaTestFixtureFailedError('failed to start server: stdout = %s, stderr = %s' % server.log_raw())
+    timing.ready = time.time() - begin
+    if proxy is not None:
+        server_id = server.get_id()
+        while server_id not in proxy.get_cluster_members(server):
+            if timeout < time.time() - begin:
+                raise JubaTestFixtureFailedError('server %s not registered to cluster %s' % (server_id, server.name))
+            time.sleep(poll_interval)
+        timing.registered = time.time() - begin
+    log.debug('server started: ready %s, registered %s', timing.ready, timing.registered)
+    return timing
@@ -0,0 +1,126 @@
+# -*- coding: utf-8 -*-
+
+"""
+Statistics helpers for measurements.
+"""
+
+class Histogram(object):
+    """
+    Log-linear bucketed histogram of latencies, in the manner of HdrHistogram.
+    Values are recorded in seconds and stored in microseconds; the relative
+    error of the reported values is bounded by 1 / 2 ** (SUB_BUCKET_BITS - 1).
+    Histograms are small, picklable and can be merged.
+    """
+
+    SUB_BUCKET_BITS = 7
+    UNIT = 1000000 # usec
+
+    def __init__(self):
+        self._counts = {}
+        self.count = 0
+        self.total = 0
+        self.min = None
+        self.max = None
+
+    def record(self, value, count=1):
+        """
+        Records the value (in seconds) for `count` times.
+        """
+        v = max(int(value * self.UNIT), 0)
+        index = self._index(v)
+        self._counts[index] = self._counts.get(index, 0) + count
+        self.count += count
+        self.total += v * count
+        if self.min is None or v < self.min:
+            self.min = v
+        if self.max is None or self.max < v:
+            self.max = v
+
+    def merge(self, other):
+        """
+        Adds all values recorded in the other histogram.
+        """
+        for (index, count) in other._counts.items():
+            self._counts[index] = self._counts.get(index, 0) + count
+        self.count += other.count
+        self.total += other.total
+        if other.min is not None and (self.min is None or other.min < self.min):
+            self.min = other.min
+        if other.max is not None and (self.max is None or self.max < other.max):
+            self.max = other.max
+        return self
+
+    def percentile(self, p):
+        """
+        Returns the value (in seconds) at the given percentile (0-100).
+        """
+        if self.count == 0:
+            return None
+        threshold = self.count * p / 100.0
+        seen = 0
+        for index in sorted(self._counts):
+            seen += self._counts[index]
+            if threshold <= seen:
+                return min(self._highest_value(index), self.max) / float(self.UNIT)
+        return self.max / float(self.UNIT)
+
+    def mean(self):
+        if self.count == 0:
+            return None
+        return self.total / float(self.count) / self.UNIT
+
+    def get_min(self):
+        if self.min is None:
+            return None
+        return self.min / float(self.UNIT)
+
+    def get_max(self):
+        if self.max is None:
+            return None
+        return self.max / float(self.UNIT)
+
+    def summary(self, prefix='latency', percentiles=(50, 90, 99, 99.9)):
+        """
+        Returns dict of statistics in milliseconds, suitable for test records.
+        """
+        if self.count == 0:
+            return {}
+        record = {}
+        for p in percentiles:
+            record['%s_p%s_ms' % (prefix, ('%g' % p).replace('.', '_'))] = self.percentile(p) * 1000
+        record[prefix + '_mean_ms'] = self.mean() * 1000
+        record[prefix + '_max_ms'] = self.get_max() * 1000
+        return record
+
+    @classmethod
+    def _index(cls, v):
+        bits = cls.SUB_BUCKET_BITS
+        if v < (1 << bits):
+            return v
+        shift = v.bit_length() - bits
+        return (shift << (bits - 1)) + (v >> shift)
+
+    @classmethod
+    def _highest_value(cls, index):
+        bits = cls.SUB_BUCKET_BITS
+        if index < (1 << bits):
+            return index
+        shift = (index >> (bits - 1)) - 1
+        return ((index - (shift << (bits - 1)) + 1) << shift) - 1
+
+def linear_fit(xs, ys):
+    """
+    Fits a line to the points by least squares.
+    Returns tuple of (slope, intercept), or None if less than 2 distinct x values are given.
+    """
+    n = len(xs)
+    if n < 2:
+        return None
+    mean_x = sum(xs) / float(n)
+    mean_y = sum(ys) / float(n)
+    sxx = sum([(x - mean_x) ** 2 for x in xs])
+    if sxx == 0:
+        return None
+    sxy = sum([(x - mean_x) * (y - mean_y) for (x, y) in zip(xs, ys)])
+    slope = sxy / sxx
+    return (slope, mean_y - slope * mean_x)
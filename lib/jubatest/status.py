@@ -0,0 +1,165 @@
+# -*- coding: utf-8 -*-
+
+"""
+Polling of `get_status` of servers and proxies as time series.
+"""
+
+import time
+import array
+import threading
+
+from .logger import log
+
+class StatusSeries(object):
+    """
+    Time series of numeric values in the status, per server (or proxy) ID and key.
+    Timestamps are UNIX time, the same clock as LoadResult.
+    The series can be read while StatusPoller appends to it.
+    """
+
+    def __init__(self):
+        self._series = {} # (server ID, key) -> (array of time, array of value)
+        self._lock = threading.Lock()
+
+    def append(self, timestamp, status):
+        """
+        Adds the status (dict of server ID to dict of key to value, as
+        returned by `get_status`) taken at the timestamp.  Non-numeric values
+        are ignored.
+        """
+        with self._lock:
+            for (server_id, server_status) in status.items():
+                for (key, value) in server_status.items():
+                    try:
+                        value = float(value)
+                    except ValueError:
+                        continue # not numeric
+                    if (server_id, key) not in self._series:
+                        self._series[(server_id, key)] = (array.array('d'), array.array('d'))
+                    (times, values) = self._series[(server_id, key)]
+                    times.append(timestamp)
+                    values.append(value)
+
+    def servers(self):
+        with self._lock:
+            return sorted(set([server_id for (server_id, key) in self._series]))
+
+    def keys(self, server_id=None):
+        with self._lock:
+            return sorted(set([key for (s, key) in self._series if server_id is None or s == server_id]))
+
+    def get(self, server_id, key):
+        """
+        Returns tuple of (times, values) for the key of the server (copies).
+        """
+        with self._lock:
+            (times, values) = self._series[(server_id, key)]
+            return (array.array('d', times), array.array('d', values))
+
+    def window(self, server_id, key, begin=None, end=None):
+        """
+        Returns list of (time, value) of the key sampled between `begin` and
+        `end`, e.g. LoadResult.begin and LoadResult.end.
+        """
+        with self._lock:
+            if (server_id, key) not in self._series:
+                return []
+            points = zip(*self._series[(server_id, key)])
+        return [(t, v) for (t, v) in points if (begin is None or begin <= t) and (end is None or t <= end)]
+
+    def delta(self, server_id, key, begin=None, end=None):
+        """
+        Returns the increase of the value between `begin` and `end`, or None
+        if less than 2 samples are available.
+        """
+        points = self.window(server_id, key, begin, end)
+        if len(points) < 2:
+            return None
+        return points[-1][1] - points[0][1]
+
+    def to_record(self, prefix='status.'):
+        """
+        Returns the last value and the increase of each key, to be attached to the test case.
+        """
+        record = {}
+        with self._lock:
+            for ((server_id, key), (times, values)) in self._series.items():
+                name = '%s%s.%s.' % (prefix, server_id, key)
+                record[name + 'last'] = values[-1]
+                record[name + 'delta'] = values[-1] - values[0]
+        return record
+
+class StatusPoller(object):
+    """
+    Polls the status of running RPC servers (`get_status` for servers,
+    `get_proxy_status` for proxies) every `interval` seconds in a background
+    thread.  `servers` is a list of RPC servers, or a function returning it
+    so that servers created later are also polled.
+    Status is taken using dedicated clients, which are neither instrumented
+    nor interposed.
+    """
+
+    def __init__(self, servers, interval=1.0, series=None):
+        self._servers = servers if callable(servers) else (lambda: servers)
+        self.interval = interval
+        self.series = series if series is not None else StatusSeries()
+        self._clients = {}
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run)
+        self._thread.daemon = True
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """
+        Stops the thread (if started) and closes the clients, including those
+        opened by `poll` called directly.
+        """
+        if self._thread is not None:
+            self._stopped.set()
+            self._thread.join()
+            self._thread = None
+        for cli in self._clients.values():
+            cli.get_client().close()
+        self._clients = {}
+
+    def poll(self):
+        """
+        Takes status of all running servers once.
+        """
+        for server in self._servers():
+            if not server.is_running():
+                continue
+            timestamp = time.time()
+            try:
+                cli = self._get_client(server)
+                status = getattr(cli, server.status_method)()
+            except Exception as e:
+                log.debug('failed to get status of %s (%s)', server.__class__.__name__, e)
+                self._close_client(server)
+                continue
+            self.series.append(timestamp, status)
+
+    def _run(self):
+        while not self._stopped.is_set():
+            begin = time.time()
+            self.poll()
+            self._stopped.wait(max(0, self.interval - (time.time() - begin)))
+
+    def _get_client(self, server):
+        (host, port) = server.get_host_port()
+        key = (id(server), host, port)
+        if key not in self._clients:
+            # proxies have no cluster name of their own; `get_proxy_status` takes none
+            cluster_name = '' if server.status_method == 'get_proxy_status' else server.cluster_name()
+            self._clients[key] = server.get_client_class()(host, port, cluster_name, server.CLIENT_TIMEOUT)
+        return self._clients[key]
+
+    def _close_client(self, server):
+        (host, port) = server.get_host_port()
+        cli = self._clients.pop((id(server), host, port), None)
+        if cli is not None:
+            cli.get_client().close()
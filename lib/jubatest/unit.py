@@ -4,8 +4,11 @@
 Unittest framework
 """
 
+import os
+import json
+import math
 import unittest
-from datetime import datetime
+import timeit
 import time
 
 from .logger import log
@@ -21,18 +24,205 @@ class JubaTestCase(unittest.TestCase):
         super(JubaTestCase, self).__init__(*args, **kwds)
 
     def assertRunsWithin(self, timeout, func, *args, **kwds):
-        time_begin = datetime.now()
+        time_begin = timeit.default_timer()
         result = func(*args, **kwds)
-        delta = (datetime.now() - time_begin).seconds
+        delta = timeit.default_timer() - time_begin
         self.assertGreaterEqual(timeout, delta, 'expected to run in %f seconds, but it took %f seconds' % (timeout, delta))
         return (result, timeout - delta)
 
+    def assertLatencySLO(self, result, slo, msg=None):
+        """
+        Fails if the latency of LoadResult or LoadCurve exceeds the SLO;
+        `slo` is a dict of {percentile: latency in seconds}.
+        """
+        violations = result.slo_violations(slo)
+        if violations:
+            self.fail(self._formatMessage(msg, 'latency SLO violated: ' + ', '.join(violations)))
+
+    def assertRecoversWithin(self, result, seconds, event=None, threshold=0.9, msg=None):
+        """
+        Fails if the throughput of ChaosResult does not recover within
+        `seconds` after the fault (FaultEvent or time; the first one by default).
+        """
+        recovery_time = result.recovery_time(event, threshold)
+        if recovery_time is None:
+            self.fail(self._formatMessage(msg, 'throughput did not recover to %g%% of the baseline' % (threshold * 100)))
+        if seconds < recovery_time:
+            self.fail(self._formatMessage(msg, 'throughput recovered in %f seconds, exceeding %f seconds' % (recovery_time, seconds)))
+
+    def assertModelsConsistent(self, servers, model_id, msg=None):
+        """
+        Fails if the models saved as `model_id` by the servers (e.g. after MIX)
+        differ, comparing checksums of the user data computed on the nodes.
+        Note that this is a byte-identity check of the packed models: storages
+        packed in hash map iteration order (which depends on the insertion
+        history of each server) may differ in bytes even if they hold the same
+        model.  Use this only for engines whose packed models are known to be
+        identical.
+        """
+        checksums = [(server.get_id(), server.get_saved_model_checksum(model_id).sha1) for server in servers]
+        if len(set([sha1 for (server_id, sha1) in checksums])) <= 1:
+            return
+        self.fail(self._formatMessage(msg, 'models are inconsistent: ' + ', '.join(['%s: %s' % c for c in checksums])))
+
     def attach_record(self, record):
         self._record = record
 
     def get_record(self):
         return self._record
 
+    def update_record(self, record):
+        """
+        Merges the dict into the record attached to this test.
+        """
+        merged = dict(self._record or {})
+        merged.update(record)
+        self.attach_record(merged)
+
+class JubaBenchmarkCase(JubaTestCase):
+    """
+    Test case for benchmarks.
+    `benchmark` runs the function `warmup` times, then measures it `iterations`
+    times.  Results are attached to the test record and can be compared against
+    the baseline stored in `baseline_file` (JSON); the baseline of the benchmark
+    is recorded when it is not in the file yet.  When `baseline_file` is not set
+    in the class, the one specified in the environment definition is used.
+    """
+
+    warmup = 1
+    iterations = 5
+    baseline_file = None
+    baseline_tolerance = 0.1
+
+    def benchmark(self, name, func, args=(), operations=1):
+        """
+        Benchmarks `func(*args)`, which processes `operations` operations per call.
+        `func` may also be a LoadGenerator, which is run with `args` (of
+        `LoadGenerator.run`); samples are then seconds per call taken from
+        LoadResult, which excludes the startup of worker processes, and failed
+        calls fail the test.
+        Returns BenchmarkResult.
+        """
+        from .load import LoadGenerator
+        if isinstance(func, LoadGenerator):
+            measure = self._load_sampler(name, func)
+        else:
+            measure = self._call_sampler(func)
+        log.debug('benchmark %s: %d warmup, %d iterations', name, self.warmup, self.iterations)
+        for i in range(self.warmup):
+            measure(args)
+        samples = [measure(args) for i in range(self.iterations)]
+        result = BenchmarkResult(name, samples, operations)
+        self.update_record(result.to_record())
+        return result
+
+    def _call_sampler(self, func):
+        def measure(args):
+            time_begin = timeit.default_timer()
+            func(*args)
+            return timeit.default_timer() - time_begin
+        return measure
+
+    def _load_sampler(self, name, generator):
+        def measure(args):
+            load = generator.run(*args)
+            if load.error_count() or not load.calls:
+                self.fail('%s: %d call(s) completed, %d call(s) failed: %s' % (name, load.calls, load.error_count(), load.errors))
+            return load.elapsed() / load.calls
+        return measure
+
+    def assertThroughputAtLeast(self, result, throughput, msg=None):
+        """
+        Fails if the median throughput (operations per second) is lower than expected.
+        """
+        actual = result.throughput()
+        if actual < throughput:
+            self.fail(self._formatMessage(msg, '%s: throughput %f ops/sec is lower than %f ops/sec' % (result.name, actual, throughput)))
+
+    def assertLatencyBelow(self, result, latency, percentile=50, msg=None):
+        """
+        Fails if the latency (seconds per call) at the percentile is not below the limit.
+        """
+        actual = result.percentile(percentile)
+        if latency <= actual:
+            self.fail(self._formatMessage(msg, '%s: p%g latency %f sec is not below %f sec' % (result.name, percentile, actual, latency)))
+
+    def assertNoRegression(self, result, tolerance=None, msg=None):
+        """
+        Fails if the median latency is slower than the baseline by more than
+        `tolerance` (ratio, e.g. 0.1 for 10%).
+        """
+        if tolerance is None:
+            tolerance = self.baseline_tolerance
+        if not self.baseline_file:
+            log.warning('no baseline file specified; skipping regression check for %s', result.name)
+            return
+        baselines = {}
+        if os.path.exists(self.baseline_file):
+            with open(self.baseline_file) as f:
+                baselines = json.load(f)
+        if result.name not in baselines:
+            log.info('recording baseline for %s: %f sec', result.name, result.median())
+            baselines[result.name] = {'median': result.median()}
+            with open(self.baseline_file, 'w') as f:
+                json.dump(baselines, f, indent=2, sort_keys=True)
+            return
+        baseline = baselines[result.name]['median']
+        self.update_record({result.name + '.baseline_ratio': result.median() / baseline})
+        if baseline * (1 + tolerance) < result.median():
+            self.fail(self._formatMessage(msg, '%s: median %f sec regressed from baseline %f sec (tolerance %g%%)' % (result.name, result.median(), baseline, tolerance * 100)))
+
+class BenchmarkResult(object):
+    """
+    Statistics of the benchmark samples (seconds per call).
+    """
+
+    def __init__(self, name, samples, operations=1):
+        self.name = name
+        self.samples = sorted(samples)
+        self.operations = operations
+
+    def median(self):
+        return self.percentile(50)
+
+    def mean(self):
+        return sum(self.samples) / len(self.samples)
+
+    def stddev(self):
+        if len(self.samples) < 2:
+            return 0.0
+        mean = self.mean()
+        return math.sqrt(sum([(x - mean) ** 2 for x in self.samples]) / (len(self.samples) - 1))
+
+    def percentile(self, p):
+        """
+        Returns the sample at the percentile (0-100), linearly interpolated.
+        """
+        pos = (len(self.samples) - 1) * p / 100.0
+        lower = int(math.floor(pos))
+        upper = min(lower + 1, len(self.samples) - 1)
+        return self.samples[lower] + (self.samples[upper] - self.samples[lower]) * (pos - lower)
+
+    def throughput(self):
+        """
+        Operations per second, based on the median.
+        """
+        median = self.median()
+        if median == 0:
+            return float('inf')
+        return self.operations / median
+
+    def to_record(self):
+        return {
+            self.name + '.median_ms': self.median() * 1000,
+            self.name + '.mean_ms': self.mean() * 1000,
+            self.name + '.stddev_ms': self.stddev() * 1000,
+            self.name + '.p90_ms': self.percentile(90) * 1000,
+            self.name + '.min_ms': self.samples[0] * 1000,
+            self.name + '.max_ms': self.samples[-1] * 1000,
+            self.name + '.throughput': self.throughput(),
+        }
+
 class JubaSkipTest(unittest.SkipTest):
     pass
 
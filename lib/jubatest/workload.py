@@ -0,0 +1,271 @@
+# -*- coding: utf-8 -*-
+
+"""
+Synthetic workloads for each engine.
+"""
+
+import random
+
+from .constants import *
+from .dataset import to_datum
+from .unit import JubaTestFixtureFailedError
+
+class SyntheticWorkload(object):
+    """
+    Deterministic workload that interleaves update and query calls of the
+    engine; `query_ratio` query calls are issued per update call (use 0 to
+    only build the model).
+    The same `seed` generates the same sequence of calls for each worker.
+    Datums are built in bulk as a pool of `pool_size` datums per worker and
+    reused cyclically, so that generating calls does not limit the load.
+    Implement `update` and `query` in subclasses; client types listed in
+    `type_names` are resolved once and available as `self.types[name]`.
+    """
+
+    service = None
+    type_names = []
+    max_created = 10000 # IDs returned by the server kept per worker
+
+    def __init__(self, seed=0, batch_size=10, features=100, features_per_datum=10, query_ratio=1.0, pool_size=4096):
+        self.seed = seed
+        self.batch_size = batch_size
+        self.features = features
+        self.features_per_datum = features_per_datum
+        self.query_ratio = query_ratio
+        self.pool_size = pool_size
+        self.types = dict([(name, _get_type(self.service, name)) for name in self.type_names])
+
+    def calls(self, worker, workers):
+        """
+        Yields (method, args) tuples for the worker infinitely (see
+        LoadGenerator for calls with a result callback).
+        """
+        state = _State(self, worker)
+        credit = 0.0
+        while True:
+            for call in self.update(state):
+                yield call
+            credit += self.query_ratio
+            while 1 <= credit:
+                credit -= 1
+                yield self.query(state)
+
+    def methods(self):
+        """
+        Returns the list of methods called repeatedly in the workload.
+        """
+        state = _State(self, 0)
+        self.update(state) # skip calls made only at the beginning
+        methods = []
+        for call in self.update(state) + [self.query(state)]:
+            method = call[0]
+            if method not in methods:
+                methods.append(method)
+        return methods
+
+    def update(self, state):
+        """
+        Returns list of (method, args) to update the model.
+        """
+        raise NotImplementedError
+
+    def query(self, state):
+        """
+        Returns (method, args) to query the model.
+        """
+        raise NotImplementedError
+
+class _State(object):
+    """
+    Per-worker state of the workload.
+    `created` is a uniform sample (reservoir) of at most `max_created` IDs
+    returned by the server (e.g. graph nodes), added by `add_created` from
+    connection threads.
+    """
+
+    def __init__(self, workload, worker):
+        self.workload = workload
+        self.worker = worker
+        self.random = random.Random('%s-%d' % (workload.seed, worker))
+        self.count = 0
+        self.created = []
+        self._created_count = 0
+        self._created_random = random.Random('%s-%d-created' % (workload.seed, worker))
+        self._pool = None
+        self._cursor = 0
+
+    def next_id(self):
+        self.count += 1
+        return '%d-%d' % (self.worker, self.count)
+
+    def add_created(self, created_id):
+        self._created_count += 1
+        if len(self.created) < self.workload.max_created:
+            self.created.append(created_id)
+        else:
+            index = self._created_random.randrange(self._created_count)
+            if index < len(self.created):
+                self.created[index] = created_id
+
+    def datum(self):
+        return self.datums(1)[0]
+
+    def datums(self, n):
+        if self._pool is None:
+            self._pool = self._build_pool()
+        pool = self._pool
+        begin = self._cursor
+        self._cursor = (begin + n) % len(pool)
+        if begin + n <= len(pool):
+            return pool[begin:begin + n]
+        return (pool * (n // len(pool) + 2))[begin:begin + n]
+
+    def _build_pool(self):
+        w = self.workload
+        rnd = self.random
+        keys = ['f%d' % i for i in range(w.features)]
+        randrange = rnd.randrange
+        value = rnd.random
+        return [to_datum([(keys[randrange(w.features)], value()) for j in range(w.features_per_datum)]) for i in range(w.pool_size)]
+
+def _get_type(service, name):
+    return getattr(__import__('jubatus.%s.types' % service, fromlist=['jubatus']), name)
+
+class ClassifierWorkload(SyntheticWorkload):
+    service = CLASSIFIER
+    type_names = ['LabeledDatum']
+    labels = 10
+
+    def update(self, state):
+        LabeledDatum = self.types['LabeledDatum']
+        randrange = state.random.randrange
+        return [('train', ([LabeledDatum('label%d' % randrange(self.labels), d) for d in state.datums(self.batch_size)],))]
+
+    def query(self, state):
+        return ('classify', (state.datums(self.batch_size),))
+
+class RegressionWorkload(SyntheticWorkload):
+    service = REGRESSION
+    type_names = ['ScoredDatum']
+
+    def update(self, state):
+        ScoredDatum = self.types['ScoredDatum']
+        value = state.random.random
+        return [('train', ([ScoredDatum(value(), d) for d in state.datums(self.batch_size)],))]
+
+    def query(self, state):
+        return ('estimate', (state.datums(self.batch_size),))
+
+class RecommenderWorkload(SyntheticWorkload):
+    def update(self, state):
+        return [('update_row', (state.next_id(), state.datum()))]
+
+    def query(self, state):
+        return ('similar_row_from_datum', (state.datum(), 10))
+
+class NearestNeighborWorkload(SyntheticWorkload):
+    def update(self, state):
+        return [('set_row', (state.next_id(), state.datum()))]
+
+    def query(self, state):
+        return ('neighbor_row_from_datum', (state.datum(), 10))
+
+class AnomalyWorkload(SyntheticWorkload):
+    def update(self, state):
+        return [('add', (state.datum(),))]
+
+    def query(self, state):
+        return ('calc_score', (state.datum(),))
+
+class ClusteringWorkload(SyntheticWorkload):
+    service = CLUSTERING
+    type_names = ['IndexedPoint']
+
+    def update(self, state):
+        IndexedPoint = self.types['IndexedPoint']
+        return [('push', ([IndexedPoint(state.next_id(), d) for d in state.datums(self.batch_size)],))]
+
+    def query(self, state):
+        return ('get_nearest_center', (state.datum(),))
+
+class StatWorkload(SyntheticWorkload):
+    keys = 10
+
+    def update(self, state):
+        rnd = state.random
+        return [('push', ('key%d' % rnd.randrange(self.keys), rnd.random()))]
+
+    def query(self, state):
+        return ('sum', ('key%d' % state.random.randrange(self.keys),))
+
+class BurstWorkload(SyntheticWorkload):
+    """
+    Keywords are registered at the beginning of each worker; documents are
+    sent with positions increasing as the worker proceeds.
+    """
+
+    service = BURST
+    type_names = ['Document', 'KeywordWithParams']
+    keywords = 10
+
+    def update(self, state):
+        Document = self.types['Document']
+        rnd = state.random
+        calls = []
+        if state.count == 0:
+            KeywordWithParams = self.types['KeywordWithParams']
+            calls += [('add_keyword', (KeywordWithParams('word%d' % i, 2.0, 1.0),)) for i in range(self.keywords)]
+        state.count += 1
+        calls.append(('add_documents', ([Document(float(state.count), 'word%d' % rnd.randrange(self.keywords)) for i in range(self.batch_size)],)))
+        return calls
+
+    def query(self, state):
+        return ('get_result', ('word%d' % state.random.randrange(self.keywords),))
+
+class GraphWorkload(SyntheticWorkload):
+    """
+    Creates nodes and edges between them.  As node IDs are assigned by the
+    server, edges and queries only refer to IDs returned by `create_node`
+    calls of the worker (a sample of `max_created` IDs), so the sequence of
+    calls depends on the responses.
+    Until the first node is created, queries are replaced by `create_node`.
+    """
+
+    service = GRAPH
+    type_names = ['Edge']
+
+    def update(self, state):
+        calls = [('create_node', (), state.add_created)]
+        if state.created:
+            choice = state.random.choice
+            (src, dst) = (choice(state.created), choice(state.created))
+            calls.append(('create_edge', (src, self.types['Edge']({}, src, dst))))
+        return calls
+
+    def query(self, state):
+        if not state.created:
+            return ('create_node', (), state.add_created)
+        return ('get_node', (state.random.choice(state.created),))
+
+    def methods(self):
+        return ['create_node', 'create_edge', 'get_node']
+
+WORKLOADS = {
+    CLASSIFIER: ClassifierWorkload,
+    REGRESSION: RegressionWorkload,
+    RECOMMENDER: RecommenderWorkload,
+    NEAREST_NEIGHBOR: NearestNeighborWorkload,
+    ANOMALY: AnomalyWorkload,
+    CLUSTERING: ClusteringWorkload,
+    STAT: StatWorkload,
+    BURST: BurstWorkload,
+    GRAPH: GraphWorkload,
+}
+
+def get_workload(engine, **kwds):
+    """
+    Returns the synthetic workload for the engine.
+    """
+    if engine in WORKLOADS:
+        return WORKLOADS[engine](**kwds)
+    raise JubaTestFixtureFailedError('no such engine: %s' % engine)
@@ -0,0 +1,52 @@
+#!/usr/bin/env python
+
+from jubatest import *
+from jubatest.load import LoadGenerator
+from jubatest.chaos import FaultSchedule, run_chaos
+from jubatest.workload import get_workload
+
+class FailoverBenchmark(JubaTestCase):
+    """
+    Injects faults into one of the servers behind a proxy while the load is
+    running, and measures the error rate, latency spike and the time for the
+    cluster to recover the throughput.
+    """
+
+    ENGINES = [CLASSIFIER]
+    SERVERS = 3
+    PROCESSES = 2
+    CONNECTIONS = 4
+    FAULT_AT = 10 # sec
+    DOWNTIME = 5 # sec
+    DURATION = 40 # sec
+
+    @classmethod
+    def setUpCluster(cls, env):
+        cls.env = env
+
+    @classmethod
+    def generateTests(cls, env):
+        for engine in cls.ENGINES:
+            for (fault, recover) in [('kill', 'start'), ('stop', 'start'), ('pause', 'resume')]:
+                yield cls.failover_test, engine, fault, recover
+
+    def failover_test(self, service, fault, recover):
+        node_count = self.env.get_node_count()
+        cluster = self.env.cluster(service, default_config(service))
+        servers = [self.env.server(self.env.get_node(i % node_count), cluster) for i in range(self.SERVERS)]
+        proxy = self.env.proxy(self.env.get_node(0), service)
+        try:
+            cluster.start()
+            proxy.start()
+            proxy.wait_for_servers(*servers)
+            schedule = FaultSchedule()
+            schedule.add(self.FAULT_AT, fault, servers[-1])
+            schedule.add(self.FAULT_AT + self.DOWNTIME, recover, servers[-1])
+            generator = LoadGenerator(proxy, get_workload(service), self.PROCESSES, self.CONNECTIONS, cluster.name)
+            result = run_chaos(generator, schedule, self.DURATION)
+        finally:
+            for rpc_server in [proxy] + servers:
+                if rpc_server.is_running():
+                    rpc_server.stop()
+        self.update_record(result.to_record('%s.%s.' % (service, fault)))
+        log.info('%s: %s: error rate %f, recovered in %s seconds', service, fault, result.error_rate(), result.recovery_time())
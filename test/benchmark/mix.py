@@ -0,0 +1,61 @@
+#!/usr/bin/env python
+
+from jubatest import *
+from jubatest.load import LoadGenerator, ScalingCurve
+from jubatest.workload import get_workload
+
+class MixBenchmark(JubaTestCase):
+    """
+    Measures the MIX cost as a function of model size, number of servers and
+    engine configuration.  Automatic MIX is suppressed during the model
+    building; MIX time (wall time of `do_mix` and the duration logged by the
+    MIX master) and bytes are recorded for each combination.
+    """
+
+    ENGINES = [CLASSIFIER]
+    MODEL_SIZES = [1000, 10000] # number of update calls to build the model
+    MIX_SUPPRESS_OPTIONS = [('--interval_sec', 1000000), ('--interval_count', 1000000000)]
+
+    @classmethod
+    def setUpCluster(cls, env):
+        cls.env = env
+        cls.max_servers = int(env.get_param('JUBATEST_SCALING_MAX_SERVERS') or env.get_node_count())
+
+    @classmethod
+    def generateTests(cls, env):
+        engines = env.get_param('JUBATEST_MIX_ENGINES')
+        if engines:
+            engines = engines.split(',')
+        else:
+            engines = cls.ENGINES
+        for engine in engines:
+            for config_name in sorted(get_configs(engine).keys()):
+                yield cls.mix_test, engine, config_name
+
+    def mix_test(self, service, config_name):
+        config = get_configs(service)[config_name]
+        for servers in ScalingCurve.steps(max(2, self.max_servers), 2):
+            for size in self.MODEL_SIZES:
+                self._run(service, config, '%s.%s.servers_%d.size_%d.' % (service, config_name, servers, size), servers, size)
+
+    def _run(self, service, config, prefix, count, size):
+        node_count = self.env.get_node_count()
+        cluster = self.env.cluster(service, config)
+        servers = [self.env.server(self.env.get_node(i % node_count), cluster, self.MIX_SUPPRESS_OPTIONS) for i in range(count)]
+        try:
+            cluster.start()
+            for (i, server) in enumerate(servers):
+                result = LoadGenerator(server, get_workload(service, seed=i, query_ratio=0)).run(max_calls=size // count)
+                self.assertEqual(0, result.error_count(), '%s: %d call(s) failed: %s' % (prefix, result.error_count(), result.errors))
+            mix_time = servers[0].do_mix()
+        finally:
+            for server in servers:
+                if server.is_running():
+                    server.stop()
+        rounds = sum([server.mix_rounds() for server in servers], [])
+        record = {prefix + 'mix_time': mix_time}
+        if rounds:
+            record[prefix + 'mix_logged_time'] = max([r.seconds for r in rounds])
+            record[prefix + 'mix_bytes'] = max([r.bytes for r in rounds])
+        log.info('MIX with %d servers, model size %d: %f seconds, %s bytes', count, size, mix_time, record.get(prefix + 'mix_bytes'))
+        self.update_record(record)
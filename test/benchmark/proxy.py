@@ -0,0 +1,93 @@
+#!/usr/bin/env python
+
+from jubatest import *
+from jubatest.load import LoadGenerator
+from jubatest.workload import get_workload
+
+class MethodWorkload(object):
+    """
+    Calls of one method picked from the workload.
+    `get_status` is not in the workloads; it is used as a method that the
+    proxy broadcasts to all servers.
+    Calls of other methods with a result callback (e.g. `create_node` of the
+    graph workload) are kept until the first call of the method, as it may
+    depend on their results.
+    """
+
+    def __init__(self, workload, method):
+        self.workload = workload
+        self.method = method
+
+    def calls(self, worker, workers):
+        if self.method == 'get_status':
+            while True:
+                yield ('get_status', ())
+        started = False
+        for call in self.workload.calls(worker, workers):
+            if call[0] == self.method:
+                started = True
+                yield call
+            elif not started and 2 < len(call):
+                yield call
+
+class ProxyOverheadBenchmark(JubaTestCase):
+    """
+    Runs the identical workload against a server directly and through a proxy
+    for each RPC method, and reports the latency added by the proxy hop (with
+    a single connection) and the throughput ceiling (with concurrent
+    connections) of both paths.
+    """
+
+    WARMUP_CALLS = 1000
+    CEILING_PROCESSES = 2
+    CEILING_CONNECTIONS = 8
+
+    @classmethod
+    def setUpCluster(cls, env):
+        cls.env = env
+        cls.duration = float(env.get_param('JUBATEST_BENCHMARK_DURATION') or 10)
+
+    @classmethod
+    def generateTests(cls, env):
+        for engine in ALL_ENGINES:
+            yield cls.proxy_test, engine.lower()
+
+    def proxy_test(self, service):
+        node0 = self.env.get_node(0)
+        cluster = self.env.cluster(service, default_config(service))
+        server = self.env.server(node0, cluster)
+        proxy = self.env.proxy(node0, service)
+        try:
+            server.start()
+            proxy.start()
+            proxy.wait_for_servers(server)
+            workload = get_workload(service)
+            LoadGenerator(server, workload).run(max_calls=self.WARMUP_CALLS)
+            for method in workload.methods() + ['get_status']:
+                self._compare(server, proxy, cluster.name, MethodWorkload(workload, method), '%s.%s.' % (service, method))
+        finally:
+            for rpc_server in [proxy, server]:
+                if rpc_server.is_running():
+                    rpc_server.stop()
+
+    def _compare(self, server, proxy, cluster_name, workload, prefix):
+        record = {}
+        results = {}
+        for (path, target) in [('direct', server), ('proxy', proxy)]:
+            latency = LoadGenerator(target, workload, cluster_name=cluster_name).run(self.duration)
+            ceiling = LoadGenerator(target, workload, self.CEILING_PROCESSES, self.CEILING_CONNECTIONS, cluster_name).run(self.duration)
+            for result in (latency, ceiling):
+                self.assertEqual(0, result.error_count(), '%s%s: %d call(s) failed: %s' % (prefix, path, result.error_count(), result.errors))
+            record.update(latency.to_record('%s%s.' % (prefix, path)))
+            record['%s%s.ceiling_calls_per_sec' % (prefix, path)] = ceiling.call_rate()
+            results[path] = (latency, ceiling)
+        for p in (50, 99):
+            (proxy_latency, direct_latency) = (results['proxy'][0].latency.percentile(p), results['direct'][0].latency.percentile(p))
+            if proxy_latency is None or direct_latency is None:
+                continue # no calls completed
+            record['%sadded_latency_p%d_ms' % (prefix, p)] = (proxy_latency - direct_latency) * 1000
+        direct_ceiling = results['direct'][1].call_rate()
+        if direct_ceiling:
+            record[prefix + 'ceiling_ratio'] = results['proxy'][1].call_rate() / direct_ceiling
+        log.info('%s: added latency p50 %s ms, ceiling ratio %s', prefix, record.get(prefix + 'added_latency_p50_ms'), record.get(prefix + 'ceiling_ratio'))
+        self.update_record(record)
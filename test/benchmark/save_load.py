@@ -0,0 +1,80 @@
+#!/usr/bin/env python
+
+from jubatest import *
+from jubatest.load import LoadGenerator
+from jubatest.workload import get_workload
+
+class SaveLoadBenchmark(JubaTestCase):
+    """
+    Measures the time of `save` and `load` across model sizes, verifying the
+    saved models by checksums computed on the nodes (models are not
+    downloaded), and reports whether models of all servers are byte-identical
+    after MIX for engines with linear mixers.
+
+    Byte identity is reported rather than asserted, as storages packed in
+    hash map iteration order may differ in bytes between servers holding the
+    same model; use `assertModelsConsistent` once it is confirmed on a real
+    cluster that the packed models of the engine are identical.
+    """
+
+    CONSISTENT_ENGINES = [CLASSIFIER, REGRESSION] # models are expected to be identical after MIX
+    MODEL_SIZES = [1000, 10000, 100000] # number of update calls to build the model
+    MODEL_ID = 'save_load_benchmark'
+    SERVERS = 3
+    PROCESSES = 2
+    CONNECTIONS = 4
+    TIMEOUT = 600 # sec
+
+    @classmethod
+    def setUpCluster(cls, env):
+        cls.env = env
+
+    @classmethod
+    def generateTests(cls, env):
+        for engine in ALL_ENGINES:
+            yield cls.save_load_test, engine.lower()
+        for engine in cls.CONSISTENT_ENGINES:
+            yield cls.consistency_test, engine
+
+    def save_load_test(self, service):
+        server = self.env.server_standalone(self.env.get_node(0), service, default_config(service))
+        with server:
+            generated = 0
+            for calls in self.MODEL_SIZES:
+                LoadGenerator(server, get_workload(service, query_ratio=0), self.PROCESSES, self.CONNECTIONS).run(max_calls=calls - generated)
+                generated = calls
+                save_time = server.save_model(self.MODEL_ID, self.TIMEOUT)
+                saved = server.get_saved_model_checksum(self.MODEL_ID)
+                load_time = server.load_model(self.MODEL_ID, self.TIMEOUT)
+                prefix = '%s.%d.' % (service, calls)
+                self.update_record({
+                    prefix + 'model_bytes': saved.size,
+                    prefix + 'save_ms': save_time * 1000,
+                    prefix + 'load_ms': load_time * 1000,
+                    prefix + 'save_mb_per_sec': saved.size / save_time / 1024 / 1024,
+                    prefix + 'load_mb_per_sec': saved.size / load_time / 1024 / 1024,
+                })
+                log.info('%s: %d bytes model: save %f ms, load %f ms', service, saved.size, save_time * 1000, load_time * 1000)
+
+    def consistency_test(self, service):
+        node_count = self.env.get_node_count()
+        cluster = self.env.cluster(service, default_config(service))
+        servers = [self.env.server(self.env.get_node(i % node_count), cluster) for i in range(self.SERVERS)]
+        proxy = self.env.proxy(self.env.get_node(0), service)
+        try:
+            cluster.start()
+            proxy.start()
+            proxy.wait_for_servers(*servers)
+            LoadGenerator(proxy, get_workload(service, query_ratio=0), self.PROCESSES, self.CONNECTIONS, cluster.name).run(max_calls=self.MODEL_SIZES[0])
+            servers[0].do_mix()
+            for server in servers:
+                server.save_model(self.MODEL_ID, self.TIMEOUT)
+            checksums = [server.get_saved_model_checksum(self.MODEL_ID).sha1 for server in servers]
+            identical = len(set(checksums)) == 1
+            self.update_record({'%s.mix.byte_identical' % service: int(identical)})
+            if not identical:
+                log.warning('%s: saved models differ in bytes after MIX: %s', service, ', '.join(checksums))
+        finally:
+            for rpc_server in [proxy] + servers:
+                if rpc_server.is_running():
+                    rpc_server.stop()
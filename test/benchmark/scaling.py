@@ -0,0 +1,50 @@
+#!/usr/bin/env python
+
+from jubatest import *
+from jubatest.load import LoadGenerator, ScalingCurve
+from jubatest.workload import get_workload
+
+class HorizontalScalingBenchmark(JubaTestCase):
+    """
+    Measures throughput and latency through a proxy with 1, 2, 4, ... and N servers
+    distributed over the nodes, and reports the scaling curve and parallel
+    efficiency for each engine.
+    """
+
+    PROCESSES = 2
+    CONNECTIONS = 4
+
+    @classmethod
+    def setUpCluster(cls, env):
+        cls.env = env
+        cls.max_servers = int(env.get_param('JUBATEST_SCALING_MAX_SERVERS') or env.get_node_count())
+        cls.duration = float(env.get_param('JUBATEST_BENCHMARK_DURATION') or 10)
+
+    @classmethod
+    def generateTests(cls, env):
+        for engine in ALL_ENGINES:
+            yield cls.scaling_test, engine.lower()
+
+    def scaling_test(self, service):
+        curve = ScalingCurve()
+        for servers in ScalingCurve.steps(self.max_servers):
+            curve.add(servers, self._run(service, servers))
+        self.update_record(curve.to_record('%s.' % service))
+        for (servers, result) in curve.points:
+            log.info('%s: %d server(s): %f records/sec, efficiency %f', service, servers, result.throughput(), curve.efficiency(servers))
+
+    def _run(self, service, count):
+        node_count = self.env.get_node_count()
+        cluster = self.env.cluster(service, default_config(service))
+        servers = [self.env.server(self.env.get_node(i % node_count), cluster) for i in range(count)]
+        proxy = self.env.proxy(self.env.get_node(0), service)
+        try:
+            cluster.start()
+            proxy.start()
+            proxy.wait_for_servers(*servers)
+            generator = LoadGenerator(proxy, get_workload(service), self.PROCESSES, self.CONNECTIONS, cluster.name)
+            return generator.run(self.duration)
+        finally:
+            for rpc_server in [proxy] + servers:
+                if rpc_server.is_running():
+                    rpc_server.stop()
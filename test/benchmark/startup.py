@@ -0,0 +1,79 @@
+#!/usr/bin/env python
+
+from jubatest import *
+from jubatest.load import LoadGenerator
+from jubatest.startup import measure_startup
+from jubatest.workload import get_workload
+
+class StartupBenchmark(JubaTestCase):
+    """
+    Measures the cold-start latency of servers for each engine and
+    configuration: listen (from the server log), readiness,
+    and for distributed servers the registration seen by the proxy.
+    Also measures the `load` time of saved models of increasing size.
+    """
+
+    MODEL_SIZES = [0, 1000, 10000, 100000] # number of update calls to build the model
+    MODEL_ID = 'startup_benchmark'
+    PROCESSES = 2
+    CONNECTIONS = 4
+    TIMEOUT = 600 # sec; for save/load of large models
+
+    @classmethod
+    def setUpCluster(cls, env):
+        cls.env = env
+
+    @classmethod
+    def generateTests(cls, env):
+        for engine in ALL_ENGINES:
+            service = engine.lower()
+            for config_name in sorted(get_configs(service).keys()):
+                yield cls.standalone_startup_test, service, config_name
+                yield cls.distributed_startup_test, service, config_name
+            yield cls.model_load_test, service
+
+    def standalone_startup_test(self, service, config_name):
+        server = self.env.server_standalone(self.env.get_node(0), service, get_configs(service)[config_name])
+        try:
+            timing = measure_startup(server)
+        finally:
+            if server.is_running():
+                server.stop()
+        self._record_startup(timing.parse_log(server.log()), '%s.%s.standalone.' % (service, config_name))
+
+    def distributed_startup_test(self, service, config_name):
+        cluster = self.env.cluster(service, get_configs(service)[config_name])
+        server = self.env.server(self.env.get_node(0), cluster)
+        proxy = self.env.proxy(self.env.get_node(0), service)
+        try:
+            proxy.start()
+            timing = measure_startup(server, proxy, timeout=30)
+        finally:
+            for rpc_server in [server, proxy]:
+                if rpc_server.is_running():
+                    rpc_server.stop()
+        self._record_startup(timing.parse_log(server.log()), '%s.%s.distributed.' % (service, config_name))
+
+    def model_load_test(self, service):
+        server = self.env.server_standalone(self.env.get_node(0), service, default_config(service))
+        with server:
+            generated = 0
+            for calls in self.MODEL_SIZES:
+                if generated < calls:
+                    LoadGenerator(server, get_workload(service, query_ratio=0), self.PROCESSES, self.CONNECTIONS).run(max_calls=calls - generated)
+                    generated = calls
+                server.save_model(self.MODEL_ID, self.TIMEOUT)
+                size = server.get_saved_model_size(self.MODEL_ID)
+                elapsed = server.load_model(self.MODEL_ID, self.TIMEOUT)
+                prefix = '%s.load.%d.' % (service, calls)
+                self.update_record({
+                    prefix + 'model_bytes': size,
+                    prefix + 'load_ms': elapsed * 1000,
+                })
+                log.info('%s: loaded %d bytes model in %f ms', service, size, elapsed * 1000)
+        for load in server.log().model_loads():
+            log.info('%s: %s loaded in %f ms (server log)', service, load.path, load.milliseconds)
+
+    def _record_startup(self, timing, prefix):
+        self.update_record(timing.to_record(prefix))
+        log.info('%sready in %f ms (listen %s ms)', prefix, timing.ready * 1000, timing.listen_ms)
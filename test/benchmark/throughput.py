@@ -0,0 +1,34 @@
+#!/usr/bin/env python
+
+from jubatest import *
+from jubatest.load import LoadGenerator
+from jubatest.workload import get_workload
+
+class ThroughputBenchmark(JubaBenchmarkCase):
+    """
+    Measures the throughput of the standard synthetic workload of each engine
+    on a standalone server, with update-only and mixed update/query workloads.
+    """
+
+    CALLS = 10000
+    PROCESSES = 2
+    CONNECTIONS = 4
+
+    @classmethod
+    def setUpCluster(cls, env):
+        cls.env = env
+
+    @classmethod
+    def generateTests(cls, env):
+        for engine in ALL_ENGINES:
+            yield cls.throughput_test, engine.lower()
+
+    def throughput_test(self, service):
+        server = self.env.server_standalone(self.env.get_node(0), service, default_config(service))
+        with server:
+            for (name, query_ratio) in [('update', 0), ('mixed', 1)]:
+                generator = LoadGenerator(server, get_workload(service, query_ratio=query_ratio), self.PROCESSES, self.CONNECTIONS)
+                result = self.benchmark('%s.%s' % (service, name), generator, (None, self.CALLS))
+                log.info('%s: %f calls/sec', result.name, result.throughput())
+                self.assertNoRegression(result)
+
@@ -51,6 +51,23 @@ class FrameworkTest(JubaTestCase):
         logs = server1.log().level(LogLevel.INFO).message('start listening at port').get()
         self.assertEqual(1, len(logs))
 
+    def test_snapshot(self):
+        # node
+        node0 = self.env.get_node(0)
+
+        # train a server and take a snapshot
+        server1 = self.env.server_standalone(node0, CLASSIFIER, default_config(CLASSIFIER))
+        with server1 as cli:
+            d = server1.types.Datum({'foo': 'bar'})
+            self.assertEqual(1, cli.train([('label', d)]))
+            server1.snapshot('jubatest-framework-snapshot')
+        self.assertTrue(self.env.has_snapshot('jubatest-framework-snapshot'))
+
+        # restore the snapshot to another server
+        server2 = self.env.server_standalone(node0, CLASSIFIER, default_config(CLASSIFIER), from_snapshot='jubatest-framework-snapshot')
+        with server2 as cli:
+            self.assertEqual(['label'], cli.get_labels())
+
     def test_distributed(self):
         # node
         node0 = self.env.get_node(0)
@@ -0,0 +1,34 @@
+#!/usr/bin/env python
+
+from jubatest import *
+from jubatest.workload import get_workload
+
+class UnlearnerSoakTest(JubaSoakCase):
+    """
+    Drives the update-only workload for a long time at standalone servers
+    configured with unlearners, which are expected to keep the model (and thus
+    the memory usage) bounded.  Fails if the RSS keeps growing after warmup.
+    """
+
+    PROCESSES = 2
+    CONNECTIONS = 4
+
+    @classmethod
+    def setUpCluster(cls, env):
+        cls.env = env
+
+    @classmethod
+    def generateTests(cls, env):
+        for engine in ALL_ENGINES:
+            service = engine.lower()
+            for config_name in sorted(get_configs(service).keys()):
+                if 'unlearn' in config_name:
+                    yield cls.soak_test, service, config_name
+
+    def soak_test(self, service, config_name):
+        server = self.env.server_standalone(self.env.get_node(0), service, get_configs(service)[config_name])
+        with server:
+            # IDs of rows keep increasing, so that unlearners have to remove old rows
+            result = self.soak(server, get_workload(service, query_ratio=0), processes=self.PROCESSES, connections=self.CONNECTIONS)
+            log.info('%s.%s: RSS growth %s bytes/hour after warmup', service, config_name, result.rss_growth())
+            self.assertNoMemoryGrowth(result)
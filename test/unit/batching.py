@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+
+import time
+
+import jubatus
+import msgpackrpc
+
+from jubatest import *
+from jubatest.batching import BatchingWriter
+from jubatest.pipeline import get_async_client_class
+from jubatest.unit import JubaTestFixtureFailedError
+
+from load import LocalRPCServer
+
+class BatchHandler(object):
+    """
+    Records the size of batches; takes `delay_per_record` seconds per record.
+    """
+
+    def __init__(self, delay_per_record=0):
+        self.batches = []
+        self.delay_per_record = delay_per_record
+
+    def train(self, name, data):
+        self.batches.append(len(data))
+        time.sleep(self.delay_per_record * len(data))
+        return len(data)
+
+    def classify(self, name, data):
+        raise Exception('classify is not supported')
+
+class BatchingWriterTest(JubaTestCase):
+    def setUp(self):
+        self.handler = BatchHandler()
+        self.server = LocalRPCServer(self.handler)
+        self.datum = jubatus.common.Datum({'foo': 'bar'})
+
+    def tearDown(self):
+        self.server.stop()
+
+    def _async_client(self):
+        cli_class = get_async_client_class(jubatus.classifier.client.Classifier)
+        return cli_class('127.0.0.1', self.server.port, 'test', 5)
+
+    def test_flush_by_size(self):
+        writer = BatchingWriter(self._async_client(), batch_size=10, adaptive=False)
+        writer.extend([('label', self.datum)] * 25)
+        writer.close()
+        self.assertEqual([10, 10, 5], self.handler.batches)
+        self.assertEqual(3, writer.flushes)
+        self.assertEqual(25, writer.to_record()['batching.records'])
+
+    def test_flush_by_time(self):
+        writer = BatchingWriter(self._async_client(), batch_size=100, flush_interval=0.1, adaptive=False)
+        writer.add(('label', self.datum))
+        time.sleep(0.2)
+        self.assertEqual([], self.handler.batches) # checked only on add
+        writer.add(('label', self.datum))
+        writer.flush()
+        self.assertEqual([2], self.handler.batches)
+        writer.close()
+
+    def test_sync_client(self):
+        cli = jubatus.classifier.client.Classifier('127.0.0.1', self.server.port, 'test', 5)
+        writer = BatchingWriter(cli, batch_size=2, adaptive=False)
+        writer.extend([('label', self.datum)] * 3)
+        self.assertEqual([2], self.handler.batches)
+        writer.close()
+        self.assertEqual([2, 1], self.handler.batches)
+
+    def test_error(self):
+        writer = BatchingWriter(self._async_client(), 'classify', batch_size=1, adaptive=False)
+        writer.add(self.datum)
+        self.assertRaises(JubaTestFixtureFailedError, writer.flush)
+        writer.close()
+
+    def test_sync_client_error(self):
+        cli = jubatus.classifier.client.Classifier('127.0.0.1', self.server.port, 'test', 5)
+        writer = BatchingWriter(cli, 'classify', batch_size=1, adaptive=False)
+        self.assertRaises(JubaTestFixtureFailedError, writer.add, self.datum)
+        writer.close()
+
+    def test_adaptive(self):
+        writer = BatchingWriter(self._async_client(), batch_size=4, max_batch_size=64, adapt_window=2)
+        writer.extend([('label', self.datum)] * 1000)
+        writer.close()
+        sizes = writer.chosen_batch_sizes()
+        self.assertTrue(3 <= len(sizes))
+        self.assertEqual([4, 6], sizes[:2])
+        self.assertTrue(all([1 <= s <= 64 for s in sizes]))
+        self.assertTrue('batching.best_batch_size' in writer.to_record())
+
+    def test_adaptive_latency_bound(self):
+        self.handler.delay_per_record = 0.001
+        writer = BatchingWriter(self._async_client(), batch_size=40, max_in_flight=1, latency_bound=0.02, adapt_window=1)
+        writer.extend([('label', self.datum)] * 200)
+        writer.close()
+        self.assertTrue(writer.batch_size < 40)
+        self.assertEqual(27, writer.chosen_batch_sizes()[1])
@@ -0,0 +1,112 @@
+# -*- coding: utf-8 -*-
+
+import time
+
+from jubatest import *
+from jubatest.chaos import FaultSchedule, FaultEvent, ChaosResult, run_chaos
+from jubatest.load import LoadGenerator, LoadResult
+from jubatest.workload import ClassifierWorkload
+from jubatest.unit import JubaTestFixtureFailedError
+
+from load import LocalRPCServer, ClassifierHandler
+
+class FailingHandler(ClassifierHandler):
+    failing = False
+
+    def train(self, name, data):
+        if self.failing:
+            raise Exception('server is down')
+        return len(data)
+
+class ServerStub(object):
+    """
+    Pretends to be an RPC server; faults make the handler fail.
+    """
+
+    def __init__(self, handler=None):
+        self.handler = handler
+        self.actions = []
+
+    def kill(self):
+        self.actions.append('kill')
+        self.handler.failing = True
+
+    def start(self):
+        self.actions.append('start')
+        self.handler.failing = False
+
+    def pause(self):
+        raise JubaTestFixtureFailedError('cannot pause')
+
+class FaultScheduleTest(JubaTestCase):
+    def test_schedule(self):
+        server = ServerStub(FailingHandler())
+        schedule = FaultSchedule().add(0.2, 'start', server).add(0.1, 'kill', server).add(0.15, 'pause', server)
+        schedule.start()
+        time.sleep(0.5)
+        schedule.stop()
+        self.assertEqual(['kill', 'start'], server.actions)
+        self.assertEqual(['kill', 'pause', 'start'], [e.action for e in schedule.events])
+        self.assertIsNone(schedule.events[0].error)
+        self.assertIsNotNone(schedule.events[1].error)
+        self.assertTrue(schedule.events[0].time < schedule.events[2].time)
+
+    def test_cancel(self):
+        server = ServerStub(FailingHandler())
+        schedule = FaultSchedule().add(10, 'kill', server).start()
+        self.assertRunsWithin(1, schedule.stop)
+        self.assertEqual([], schedule.events)
+
+    def test_unknown_action(self):
+        self.assertRaises(JubaTestFixtureFailedError, FaultSchedule().add, 1, 'explode', None)
+
+class ChaosResultTest(JubaTestCase):
+    def _result(self):
+        load = LoadResult(1.0)
+        for t in range(100, 120):
+            if t < 110 or 115 <= t:
+                for i in range(10):
+                    load.record_call(t + 0.05 * i, t + 0.05 * i + 0.01, 1)
+            elif t < 112:
+                load.record_error(t, t + 0.5, ValueError())
+                load.record_call(t, t + 0.9, 1)
+        return ChaosResult(load, [FaultEvent(110.5, 'kill', None, None)])
+
+    def test_recovery(self):
+        result = self._result()
+        (throughput, latency) = result.baseline(110.5)
+        self.assertEqual(10.0, throughput) # excluding the first interval
+        self.assertEqual(90, latency.count)
+        self.assertEqual(4.5, result.recovery_time())
+        self.assertIsNone(result.recovery_time(threshold=2.0))
+        self.assertAlmostEqual(0.9, result.peak_latency(), delta=0.01)
+        self.assertEqual(2, result.errors_after())
+        self.assertIsNone(result.recovery_time(100.0)) # no baseline
+
+        record = result.to_record('c.')
+        self.assertEqual(4.5, record['c.fault0.kill.recovery_sec'])
+        self.assertEqual(2, record['c.fault0.kill.errors'])
+        self.assertIn('c.fault0.kill.baseline_latency_p99_ms', record)
+        self.assertIn('c.load.calls', record)
+
+    def test_no_fault(self):
+        self.assertRaises(JubaTestFixtureFailedError, ChaosResult(LoadResult(1.0), []).recovery_time)
+
+class RunChaosTest(JubaTestCase):
+    def setUp(self):
+        self.handler = FailingHandler()
+        self.server = LocalRPCServer(self.handler)
+
+    def tearDown(self):
+        self.server.stop()
+
+    def test_run_chaos(self):
+        stub = ServerStub(self.handler)
+        schedule = FaultSchedule().add(1.0, 'kill', stub).add(1.5, 'start', stub)
+        generator = LoadGenerator(self.server, ClassifierWorkload(query_ratio=0))
+        result = run_chaos(generator, schedule, 4, 0.25)
+        self.assertEqual(['kill', 'start'], stub.actions)
+        self.assertTrue(0 < result.errors_after())
+        self.assertTrue(0 < result.error_rate() < 1)
+        self.assertIsNotNone(result.recovery_time(threshold=0.5))
+        self.assertTrue(8 <= len(result.load.timeline_points()))
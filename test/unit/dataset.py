@@ -0,0 +1,151 @@
+# -*- coding: utf-8 -*-
+
+import os
+import time
+import tempfile
+
+import jubatus
+
+from jubatest import *
+from jubatest.dataset import parse_svmlight_line, parse_csv_row, read_svmlight, read_csv, read_svmlight_batches, read_batches, to_datum
+from jubatest.dataset import read_dataset, read_dataset_batches, read_datum_batches, prepare_dataset, CACHE_SUFFIX
+from jubatest.unit import JubaTestFixtureFailedError
+
+class SvmlightTest(JubaTestCase):
+    def setUp(self):
+        self.tmp = tempfile.NamedTemporaryFile()
+        self.tmp.write(sample_svmlight)
+        self.tmp.flush()
+
+    def tearDown(self):
+        self.tmp.close()
+        if os.path.exists(self.tmp.name + CACHE_SUFFIX):
+            os.remove(self.tmp.name + CACHE_SUFFIX)
+
+    def test_parse_line(self):
+        self.assertEqual(('+1', [('3', 1.0), ('10', 0.5)]), parse_svmlight_line('+1 3:1 10:0.5\n'))
+        self.assertEqual(('-1', []), parse_svmlight_line('-1 # comment'))
+        self.assertIsNone(parse_svmlight_line('\n'))
+
+    def test_parse_line_fail(self):
+        self.assertRaises(ValueError, parse_svmlight_line, '+1 3')
+
+    def test_read_svmlight(self):
+        records = list(read_svmlight(self.tmp.name))
+        self.assertEqual(5, len(records))
+        self.assertEqual('-1', records[1][0])
+
+    def test_read_svmlight_fail(self):
+        self.assertRaises(JubaTestFixtureFailedError, list, read_svmlight('/no-such-file'))
+
+    def test_read_svmlight_batches(self):
+        batches = list(read_svmlight_batches(self.tmp.name, 2))
+        self.assertEqual([2, 2, 1], map(len, batches))
+
+    def test_read_svmlight_batches_workers(self):
+        batches0 = list(read_svmlight_batches(self.tmp.name, 2, 0, 2))
+        batches1 = list(read_svmlight_batches(self.tmp.name, 2, 1, 2))
+        self.assertEqual([2, 1], map(len, batches0))
+        self.assertEqual([2], map(len, batches1))
+
+    def test_read_svmlight_empty(self):
+        with tempfile.NamedTemporaryFile() as f:
+            self.assertEqual([], list(read_svmlight(f.name)))
+
+    def test_read_dataset_cache(self):
+        records = list(read_svmlight(self.tmp.name))
+        self.assertEqual(records, list(read_dataset(self.tmp.name, cache=False)))
+        self.assertFalse(os.path.exists(self.tmp.name + CACHE_SUFFIX))
+        self.assertEqual(records, list(read_dataset(self.tmp.name)))
+        cache_path = prepare_dataset(self.tmp.name)
+        self.assertEqual(self.tmp.name + CACHE_SUFFIX, cache_path)
+        mtime = os.stat(cache_path).st_mtime
+
+        # served from the cache
+        self.assertEqual(records, list(read_dataset(self.tmp.name)))
+        self.assertEqual(mtime, os.stat(cache_path).st_mtime)
+
+        # cache is invalidated when the dataset changes
+        self.tmp.write('-1 5:2\n')
+        self.tmp.flush()
+        self.assertEqual(records + [('-1', [('5', 2.0)])], list(read_dataset(self.tmp.name)))
+
+    def test_read_dataset_batches_workers(self):
+        for cache in (True, False):
+            batches0 = list(read_dataset_batches(self.tmp.name, 2, 0, 2, cache=cache))
+            batches1 = list(read_dataset_batches(self.tmp.name, 2, 1, 2, cache=cache))
+            self.assertEqual([2, 1], map(len, batches0))
+            self.assertEqual([2], map(len, batches1))
+            self.assertEqual(('+1', [('2', 1.0)]), batches0[1][0])
+
+    def test_read_datum_batches(self):
+        batches = list(read_datum_batches(self.tmp.name, 3, label=int))
+        self.assertEqual([3, 2], map(len, batches))
+        (label, d) = batches[0][0]
+        self.assertEqual(1, label)
+        self.assertIsInstance(d, jubatus.common.Datum)
+        self.assertEqual([['3', 1.0], ['10', 0.5]], d.num_values)
+
+    def test_read_dataset_fail(self):
+        self.assertRaises(JubaTestFixtureFailedError, list, read_dataset('/no-such-file'))
+        self.assertRaises(JubaTestFixtureFailedError, list, read_dataset(self.tmp.name, format='unknown'))
+
+    def test_read_batches(self):
+        self.assertEqual([[1, 2], [3]], list(read_batches([1, 2, 3], 2)))
+
+    def test_to_datum(self):
+        d = to_datum([('3', 1.0), ('name', 'foo')])
+        self.assertIsInstance(d, jubatus.common.Datum)
+        self.assertEqual([['3', 1.0]], d.num_values)
+        self.assertEqual([['name', 'foo']], d.string_values)
+
+class CSVTest(JubaTestCase):
+    def setUp(self):
+        self.tmp = tempfile.NamedTemporaryFile(suffix='.csv')
+        self.tmp.write(sample_csv)
+        self.tmp.flush()
+
+    def tearDown(self):
+        self.tmp.close()
+        if os.path.exists(self.tmp.name + CACHE_SUFFIX):
+            os.remove(self.tmp.name + CACHE_SUFFIX)
+
+    def test_parse_row(self):
+        self.assertEqual(('a', [('x', 1.0), ('y', 'foo')]), parse_csv_row(['label', 'x', 'y'], ['a', '1', 'foo']))
+        self.assertEqual(('a', [('x', 1.0)]), parse_csv_row(['x', 'label'], ['1', 'a'], 1))
+        self.assertIsNone(parse_csv_row(['x'], []))
+        self.assertRaises(ValueError, parse_csv_row, ['x', 'y'], ['1'])
+
+    def test_read_csv(self):
+        records = list(read_csv(self.tmp.name))
+        self.assertEqual(3, len(records))
+        self.assertEqual(('setosa', [('length', 5.1), ('color', 'white, blue')]), records[0])
+
+    def test_read_dataset(self):
+        self.assertEqual(list(read_csv(self.tmp.name)), list(read_dataset(self.tmp.name)))
+        (label, d) = list(read_datum_batches(self.tmp.name, 10))[0][2]
+        self.assertEqual('virginica', label)
+        self.assertEqual([['length', 6.3]], d.num_values)
+        self.assertEqual([['color', 'red']], d.string_values)
+
+    def test_read_csv_fail(self):
+        self.tmp.write('x,1\n')
+        self.tmp.flush()
+        self.assertRaises(JubaTestFixtureFailedError, list, read_csv(self.tmp.name))
+
+sample_svmlight = """\
++1 3:1 10:0.5
+-1 4:1
+# comment line
++1 3:0.2 7:1
+
+-1 1:1
++1 2:1
+"""
+
+sample_csv = """\
+label,length,color
+setosa,5.1,"white, blue"
+versicolor,7.0,black
+virginica,6.3,red
+"""
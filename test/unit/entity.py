@@ -2,12 +2,26 @@
 
 import jubatus
 import os
+import pipes
+import shutil
+import socket
+import sys
 import tempfile
+import time
+from datetime import datetime, timedelta
 
 from jubatest import *
 from jubatest.entity import JubaTestEnvironment, JubaNode, JubaRPCServer
 from jubatest.unit import JubaSkipTest, JubaTestFixtureFailedError
 from jubatest.exceptions import JubaTestAssertionError
+from jubatest.sampler import ResourceSeries
+from jubatest.process import LocalSubprocess
+from jubatest.remote import _RemoteUtil
+from jubatest.log import RemoteLogFilter
+from jubatest.snapshot import SnapshotCache
+
+from load import LocalRPCServer, ClassifierHandler
+from sampler import LocalNode
 
 class JubaTestEnvironmentTest(JubaTestCase):
     def setUp(self):
@@ -24,6 +38,99 @@ class JubaTestEnvironmentTest(JubaTestCase):
         self.assertEqual('myhost1', self.env.get_node(0).get_host())
         self.assertEqual('myhost2', self.env.get_node(1).get_host())
         self.assertRaises(JubaSkipTest, self.env.get_node, 2)
+        self.assertEqual(2, self.env.get_node_count())
+
+    def test_instrument_clients(self):
+        self.env._instrument_clients = True
+        node = JubaNode('127.0.0.1', [12345], None, '/tmp', [])
+        server = JubaRPCServer(node, CLASSIFIER, [])
+        self.env._register_rpc_server(server)
+        server.get_client_stats().record('train', 0.01, 10, 1)
+
+        test = JubaTestCaseStub()
+        self.env.finalize_test_case(test)
+        self.assertEqual(1, test.get_record()['rpc.JubaRPCServer_None.train.count'])
+        self.assertEqual([], server.get_client_stats().methods())
+
+    def test_interpose_clients(self):
+        self.env._interpose_clients = True
+        local = LocalRPCServer(ClassifierHandler())
+        try:
+            node = JubaNode('127.0.0.1', [12345], None, '/tmp', [])
+            server = JubaRPCServer(node, CLASSIFIER, [])
+            self.env._register_rpc_server(server)
+            server.port = local.port
+            cli = server.get_client(cluster_name='test')
+            self.assertNotEqual(local.port, cli.get_client().address.port)
+            cli.train([])
+
+            test = JubaTestCaseStub()
+            self.env.finalize_test_case(test)
+            self.assertEqual(1, test.get_record()['wire.JubaRPCServer_None.train.count'])
+            self.assertEqual([], server.get_wire_stats().methods())
+
+            # clients remain usable in the next test
+            cli.train([])
+            cli.get_client().close()
+            self.assertEqual(['train'], server.get_wire_stats().methods())
+
+            self.env.finalize_test_class(JubaTestCaseStub)
+            self.assertIsNone(server._interposer)
+        finally:
+            local.stop()
+
+    def test_spool_logs(self):
+        self.env._spool_logs = True
+        self.env._spool_attach_lines = 1
+        workdir = tempfile.mkdtemp()
+        sock = socket.socket()
+        sock.bind(('127.0.0.1', 0))
+        node = LocalServerNode('127.0.0.1', [sock.getsockname()[1]], None, workdir, [])
+        sock.close()
+        server = LocalServer(node)
+        self.env._register_rpc_server(server)
+        try:
+            server.start()
+            while server.log_size()[0] == 0:
+                time.sleep(0.01)
+            server.stop()
+
+            test = JubaTestCaseStub()
+            test.attachLogs = True
+            self.env.finalize_test_case(test)
+            self.assertTrue('debug' in test.logs[0][3])
+            self.assertTrue('start listening' not in test.logs[0][3])
+        finally:
+            for path in os.listdir(workdir):
+                os.remove(os.path.join(workdir, path))
+            os.rmdir(workdir)
+
+    def test_resource_series(self):
+        node = JubaNode('127.0.0.1', [12345], None, '/tmp', [])
+        server = JubaRPCServer(node, CLASSIFIER, [])
+        self.env._register_rpc_server(server)
+        self.assertRaises(JubaTestAssertionError, server.sample_resources)
+        server._resource_series = ResourceSeries()
+        server.get_resource_series().append(0.0, 1.0, 1000, 4, 10)
+
+        test = JubaTestCaseStub()
+        self.env.finalize_test_case(test)
+        self.assertEqual(1000, test.get_record()['resource.JubaRPCServer_None.rss_peak_bytes'])
+        self.assertIsNone(server.get_resource_series())
+
+    def test_poll_status(self):
+        series = self.env.poll_status(0.01)
+        self.assertIs(series, self.env.poll_status())
+        series.append(0.0, {'127.0.0.1_9199': {'update_count': '1'}})
+        test = JubaTestCaseStub()
+        self.env.finalize_test_case(test)
+        self.assertEqual(1.0, test.get_record()['status.127.0.0.1_9199.update_count.last'])
+        self.assertIsNot(series, self.env.poll_status())
+        self.env.finalize_test_case(JubaTestCaseStub())
+
+class JubaTestCaseStub(JubaTestCase):
+    def runTest(self):
+        pass
 
 class JubaNodeTest(JubaTestCase):
     def test_pool_1(self):
@@ -114,6 +221,14 @@ class JubaNodeTest(JubaTestCase):
             n.get_file(tmp1.name, tmp2.name)
             self.assertEqual('bar', tmp2.read())
 
+    def test_download_file(self):
+        n = JubaNode('localhost', range(10000,10003), None, '/tmp', [])
+        with tempfile.NamedTemporaryFile() as tmp1, tempfile.NamedTemporaryFile() as tmp2:
+            tmp1.write('bar')
+            tmp1.flush()
+            n.download_file(tmp1.name, tmp2.name)
+            self.assertEqual('bar', tmp2.read())
+
     def test_get_file_temp(self):
         n = JubaNode('localhost', range(10000,10003), None, '/tmp', [])
         contents_remote = n.get_file('/etc/hosts')
@@ -148,6 +263,9 @@ class JubaRPCServerTest(JubaTestCase):
     def test_get_client_fail(self):
         self.assertRaises(JubaTestAssertionError, self.instance.get_client, 'foo')
 
+    def test_get_async_client_fail(self):
+        self.assertRaises(JubaTestAssertionError, self.instance.get_async_client, 'foo')
+
     def test_get_client_class(self):
         server = JubaRPCServer(self.node, CLASSIFIER, [])
         self.assertEqual(server.get_client_class(), jubatus.classifier.client.Classifier)
@@ -158,8 +276,28 @@ class JubaRPCServerTest(JubaTestCase):
     def test_get_client_type(self):
         self.assertIsInstance(self.instance.get_client_type('Datum')(), jubatus.common.Datum)
 
+    def test_get_client_type_cached(self):
+        server = JubaRPCServer(self.node, CLASSIFIER, [])
+        self.assertTrue(server.get_client_type('datum') is self.instance.get_client_type('datum'))
+        self.assertTrue(server.get_client_type('LabeledDatum') is jubatus.classifier.types.LabeledDatum)
+        self.assertRaises(JubaTestFixtureFailedError, server.get_client_type, 'NoSuchType')
+
     def test_types(self):
         self.assertIsInstance(self.instance.types.Datum(), jubatus.common.Datum)
+        self.assertTrue(self.instance.types is self.instance.types)
+
+    def test_build_datums(self):
+        datums = self.instance.build_datums([{'x': 1.0, 'name': 'foo'}, [('y', 2)]])
+        self.assertEqual(2, len(datums))
+        self.assertEqual([['x', 1.0]], datums[0].num_values)
+        self.assertEqual([['name', 'foo']], datums[0].string_values)
+        self.assertEqual([['y', 2]], datums[1].num_values)
+
+        datums = self.instance.build_datums(columns={'x': [1.0, 2.0], 'name': ['a', 'b']})
+        self.assertEqual(2, len(datums))
+        self.assertEqual([['x', 2.0]], datums[1].num_values)
+        self.assertEqual([['name', 'b']], datums[1].string_values)
+        self.assertRaises(ValueError, self.instance.build_datums, columns={'x': [1.0], 'y': []})
 
     def test_get_host_port(self):
         (host, port) = self.instance.get_host_port()
@@ -180,3 +318,226 @@ class JubaRPCServerStub(JubaRPCServer):
 
     def program(self):
         return 'echo'
+
+SERVER_SCRIPT = """
+import sys
+import datetime
+import msgpackrpc
+now = datetime.datetime.now()
+print('%s,%03d 1 INFO  [test.py:1] start listening at port %s' % (now.strftime('%Y-%m-%d %H:%M:%S'), now.microsecond / 1000, sys.argv[2]))
+print('%s,%03d 1 DEBUG [test.py:2] debug' % (now.strftime('%Y-%m-%d %H:%M:%S'), now.microsecond / 1000))
+sys.stdout.flush()
+class Handler(object):
+    def __dummy_method__(self):
+        return None
+    def load(self, name, model_id):
+        return model_id == 'saved'
+server = msgpackrpc.Server(Handler())
+server.listen(msgpackrpc.Address('127.0.0.1', int(sys.argv[2])))
+server.start()
+"""
+
+class LocalServerProcess(LocalSubprocess):
+    def stop(self, signal='TERM'):
+        super(LocalServerProcess, self).stop(signal == 'KILL')
+
+class LocalServerNode(JubaNode):
+    def get_process(self, args, output_limit=None, output_filters=None, spool_paths=None):
+        if spool_paths:
+            args = ['bash', '-c', ' '.join(['exec'] + [pipes.quote(arg) for arg in args] + _RemoteUtil.spool_redirects(*spool_paths))]
+        elif output_filters:
+            args = ['bash', '-c', ' '.join(['exec'] + [pipes.quote(arg) for arg in args] + _RemoteUtil.filter_redirects(*output_filters))]
+        return LocalServerProcess(args, output_limit=output_limit)
+
+    def put_local_file(self, from_path, to_path=None):
+        if not to_path:
+            to_path = tempfile.mkstemp(dir=self.get_workdir())[1]
+        shutil.copyfile(from_path, to_path)
+        return to_path
+
+    def get_file(self, from_path, to_path=None):
+        with open(from_path) as f:
+            return f.read()
+
+    def delete_file(self, path):
+        os.remove(path)
+
+    def run_process(self, args):
+        return LocalNode().run_process(args)
+
+class LocalServer(JubaRPCServer):
+    def __init__(self, node):
+        super(LocalServer, self).__init__(node, CLASSIFIER, [('-c', SERVER_SCRIPT)])
+
+    def cluster_name(self):
+        return 'test'
+
+    def program(self):
+        return sys.executable
+
+class JubaTestEnvironmentSnapshotTest(JubaTestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.env = JubaTestEnvironment()
+        self.env._snapshot_cache = SnapshotCache(self.tmpdir + '/cache')
+        self.env._snapshot_cache.put('snap', CLASSIFIER, 'model')
+        self.node = LocalServerNode('127.0.0.1', [], None, self.tmpdir, [])
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_server_snapshot_cache(self):
+        server = self.env.server_standalone(self.node, CLASSIFIER, {}, from_snapshot='snap')
+        self.assertTrue(server._snapshot_cache is self.env._snapshot_cache)
+
+    def test_snapshot_uploaded_once(self):
+        options = self.env._snapshot_options(self.node, CLASSIFIER, 'snap')
+        path = options[0][1]
+        self.assertEqual('model', self.node.get_file(path))
+        os.utime(path, (0, 0))
+        self.assertEqual(options, self.env._snapshot_options(self.node, CLASSIFIER, 'snap'))
+        self.assertEqual(0, os.stat(path).st_mtime)
+
+    def test_snapshot_uploaded_again(self):
+        options = self.env._snapshot_options(self.node, CLASSIFIER, 'snap')
+        self.node.delete_file(options[0][1])
+        self.assertEqual(options, self.env._snapshot_options(self.node, CLASSIFIER, 'snap'))
+        self.assertEqual('model', self.node.get_file(options[0][1]))
+
+    def test_snapshot_service_mismatch(self):
+        self.assertRaises(JubaTestFixtureFailedError, self.env._snapshot_options, self.node, RECOMMENDER, 'snap')
+
+class JubaRPCServerRestartTest(JubaTestCase):
+    def setUp(self):
+        ports = []
+        for i in range(2):
+            sock = socket.socket()
+            sock.bind(('127.0.0.1', 0))
+            ports.append(sock.getsockname()[1])
+            sock.close()
+        self.node = LocalServerNode('127.0.0.1', ports, None, '/tmp', [])
+        self.server = LocalServer(self.node)
+        self.server.start()
+
+    def tearDown(self):
+        if self.server.is_running():
+            self.server.stop()
+
+    def test_restart(self):
+        port = self.server.port
+        downtime = self.server.restart()
+        self.assertTrue(self.server.is_running())
+        self.assertEqual(port, self.server.port)
+        self.assertTrue(0 < downtime < self.server.STARTUP_TIMEOUT)
+        self.assertTrue(self.server.is_ready())
+        self.assertEqual(1, len(self.node._free_ports))
+
+    def test_restart_kill(self):
+        port = self.server.port
+        self.server.restart('KILL')
+        self.assertEqual(port, self.server.port)
+        self.assertTrue(self.server.is_ready())
+
+    def test_restart_new_port(self):
+        port = self.server.port
+        self.server.restart(keep_port=False)
+        self.assertNotEqual(port, self.server.port)
+        self.assertEqual([port], self.node._free_ports)
+        self.assertTrue(self.server.is_ready())
+
+    def test_restart_load_model(self):
+        self.server.restart(load_model='saved')
+        self.assertRaises(JubaTestFixtureFailedError, self.server.restart, load_model='missing')
+
+    def test_restart_not_running(self):
+        self.server.stop()
+        self.assertRaises(JubaTestFixtureFailedError, self.server.restart)
+
+    def test_wait_until_ready(self):
+        self.assertTrue(0 <= self.server.wait_until_ready())
+
+    def test_restart_full_logs(self):
+        self.server.stop()
+        self.server.remote_log_filter = RemoteLogFilter('INFO')
+        self.server.start()
+        self.server.restart()
+        self.server.stop()
+        paths = [path for paths in self.server._full_log_paths for path in paths]
+        self.assertEqual(4, len(set(paths)))
+        for i in range(100):
+            full_log = self.server.log_raw_full()[0]
+            if full_log.count('debug') == 2:
+                break
+            time.sleep(0.01)
+        self.assertEqual(2, full_log.count('debug')) # not truncated by the restart
+        self.server._delete_full_logs()
+        self.assertEqual([], [path for path in paths if os.path.exists(path)])
+
+class JubaRPCServerSpoolTest(JubaTestCase):
+    def setUp(self):
+        sock = socket.socket()
+        sock.bind(('127.0.0.1', 0))
+        self.node = LocalServerNode('127.0.0.1', [sock.getsockname()[1]], None, tempfile.mkdtemp(), [])
+        sock.close()
+        self.server = LocalServer(self.node)
+        self.server.spool_logs = True
+        self.begin = datetime.now() - timedelta(seconds=1)
+        self.server.start()
+        for i in range(100):
+            if self.server.log_size()[0]:
+                break
+            time.sleep(0.01)
+
+    def tearDown(self):
+        if self.server.is_running():
+            self.server.stop()
+        for path in os.listdir(self.node.get_workdir()):
+            os.remove(os.path.join(self.node.get_workdir(), path))
+        os.rmdir(self.node.get_workdir())
+
+    def test_spool(self):
+        self.assertTrue(self.server.is_spooled())
+        (stdout_path, stderr_path) = self.server.log_spool_paths()
+        self.assertTrue(os.path.exists(stdout_path))
+        self.assertTrue(stdout_path.startswith(self.node.get_workdir()))
+        self.server.stop()
+        self.assertEqual('', self.server._backend.stdout)
+        self.assertEqual(1, len(self.server.log().message('start listening').get()))
+        self.assertTrue(os.path.exists(stdout_path)) # kept for post-mortem
+
+    def test_log_tail(self):
+        logs = self.server.log_tail(1).get()
+        self.assertEqual(1, len(logs))
+        self.assertEqual('debug', logs[0].message)
+        self.assertEqual(2, len(self.server.log_tail().get()))
+
+    def test_log_window(self):
+        self.assertEqual(2, len(self.server.log_window(self.begin, datetime.now()).get()))
+        self.assertEqual(0, len(self.server.log_window(self.begin - timedelta(hours=1), self.begin).get()))
+
+    def test_log_range(self):
+        (stdout, stderr) = self.server.log_range(24, 6)
+        self.assertEqual('1 INFO', stdout)
+        self.assertEqual('', stderr)
+        self.assertEqual(self.server.log_size()[0], len(self.server.log_range(0)[0]))
+
+    def test_log_filter(self):
+        self.server.remote_log_filter = RemoteLogFilter('INFO')
+        self.assertEqual(1, len(self.server.log_tail().get()))
+        self.assertEqual(1, len(self.server.log().get()))
+
+    def test_read_log_window(self):
+        with tempfile.NamedTemporaryFile() as f:
+            f.write('2014-08-11 15:07:15,900 5951 ERROR [a.cpp:1] error 1\ncontinued\n'
+                    '2013-08-11 15:07:16,659:28460(0x7f02e99b7740):ZOO_INFO@log_env@712: zk\n'
+                    '2014-08-11 15:07:17,000 5951 INFO  [a.cpp:1] info\ncontinued\n')
+            f.flush()
+            output = self.node.read_log_window(f.name, datetime(2014, 8, 11, 15, 7, 15, 900000), datetime(2014, 8, 11, 15, 7, 16, 999999))
+        self.assertEqual('2014-08-11 15:07:15,900 5951 ERROR [a.cpp:1] error 1\ncontinued\n', output)
+
+    def test_not_spooled(self):
+        self.server.stop()
+        self.server.spool_logs = False
+        self.server.start()
+        self.assertFalse(self.server.is_spooled())
+        self.assertRaises(JubaTestAssertionError, self.server.log_tail)
@@ -0,0 +1,120 @@
+# -*- coding: utf-8 -*-
+
+import threading
+
+import jubatus
+import msgpackrpc
+
+from jubatest import *
+from jubatest.instrument import RPCStats, instrument_client
+from jubatest.pipeline import get_async_client_class
+
+from load import LocalRPCServer, ClassifierHandler
+
+class InstrumentClientTest(JubaTestCase):
+    def setUp(self):
+        self.server = LocalRPCServer(ClassifierHandler())
+        self.stats = RPCStats()
+
+    def tearDown(self):
+        self.server.stop()
+
+    def test_sync_client(self):
+        self.stats.count_bytes = True
+        cli = jubatus.classifier.client.Classifier('127.0.0.1', self.server.port, '', 5)
+        instrument_client(cli, self.stats)
+        d = jubatus.common.Datum({'foo': 'bar'})
+        for i in range(3):
+            self.assertEqual(2, cli.train([('label', d), ('label', d)]))
+        self.assertRaises(msgpackrpc.error.RPCError, cli.classify, [d])
+        cli.get_client().close()
+
+        self.assertEqual(['classify', 'train'], self.stats.methods())
+        train = self.stats.get('train')
+        self.assertEqual(3, train.count)
+        self.assertEqual(0, train.errors)
+        self.assertEqual(3, train.latency.count)
+        self.assertTrue(0 < train.request_bytes)
+        self.assertEqual(3, train.response_bytes) # positive fixint
+        self.assertEqual(1, self.stats.get('classify').errors)
+
+    def test_async_client(self):
+        cli_class = get_async_client_class(jubatus.classifier.client.Classifier)
+        cli = instrument_client(cli_class('127.0.0.1', self.server.port, '', 5), self.stats)
+        d = jubatus.common.Datum({'foo': 'bar'})
+        futures = [cli.train([('label', d)]) for i in range(5)]
+        cli.wait()
+        self.assertEqual([1] * 5, [f.get() for f in futures])
+        self.assertTrue(all([f.done() for f in futures]))
+        self.assertEqual(5, self.stats.get('train').count)
+        cli.close()
+
+    def test_count_bytes_disabled(self):
+        cli = jubatus.classifier.client.Classifier('127.0.0.1', self.server.port, '', 5)
+        instrument_client(cli, self.stats)
+        cli.train([])
+        cli.get_client().close()
+        self.assertEqual(0, self.stats.get('train').request_bytes)
+        self.assertEqual(0, self.stats.get('train').response_bytes)
+        self.assertNotIn('rpc.train.request_bytes', self.stats.to_record('rpc.'))
+        self.assertIn('rpc.train.latency_p99_ms', self.stats.to_record('rpc.'))
+
+    def test_instrument_twice(self):
+        cli = jubatus.classifier.client.Classifier('127.0.0.1', self.server.port, '', 5)
+        instrument_client(instrument_client(cli, self.stats), self.stats)
+        cli.train([])
+        cli.get_client().close()
+        self.assertEqual(1, self.stats.get('train').count)
+
+class RPCStatsTest(JubaTestCase):
+    def test_to_record(self):
+        stats = RPCStats()
+        stats.record('train', 0.010, 100, 1)
+        stats.record('train', 0.020, 100, 1, True)
+        record = stats.to_record('rpc.')
+        self.assertEqual(2, record['rpc.train.count'])
+        self.assertEqual(1, record['rpc.train.errors'])
+        self.assertEqual(200, record['rpc.train.request_bytes'])
+        self.assertAlmostEqual(10.0, record['rpc.train.latency_p99_ms'], delta=0.1)
+        self.assertIn('rpc.train.latency_max_ms', record)
+
+    def test_merge_reset(self):
+        stats1 = RPCStats()
+        stats1.record('train', 0.010, 100, 1)
+        stats2 = RPCStats()
+        stats2.record('train', 0.010, 100, 1)
+        stats2.record('classify', 0.010, 100, 1)
+        stats1.merge(stats2)
+        self.assertEqual(2, stats1.get('train').count)
+        self.assertEqual(['classify', 'train'], stats1.methods())
+        stats1.reset()
+        self.assertEqual([], stats1.methods())
+
+    def test_record_threads(self):
+        stats = RPCStats()
+        def record():
+            for i in range(1000):
+                stats.record('train', 0.001, 1, 1)
+        threads = [threading.Thread(target=record) for i in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(4000, stats.get('train').count)
+        self.assertEqual(4000, stats.get('train').latency.count)
+
+    def test_read_while_recording(self):
+        stats = RPCStats()
+        def record():
+            for i in range(2000):
+                stats.record('method%d' % i, 0.001, 1, 1)
+        thread = threading.Thread(target=record)
+        thread.start()
+        try:
+            while thread.is_alive():
+                stats.methods()
+                stats.to_record()
+                RPCStats().merge(stats)
+        finally:
+            thread.join()
+        self.assertEqual(2000, len(stats.methods()))
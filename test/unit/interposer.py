@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+
+import jubatus
+import msgpackrpc
+
+from jubatest import *
+from jubatest.interposer import Interposer, WireStats
+from jubatest.pipeline import get_async_client_class
+
+from load import LocalRPCServer, ClassifierHandler
+
+class InterposerTest(JubaTestCase):
+    def setUp(self):
+        self.server = LocalRPCServer(ClassifierHandler())
+        self.interposer = Interposer('127.0.0.1', self.server.port).start()
+
+    def tearDown(self):
+        self.interposer.stop()
+        self.server.stop()
+
+    def test_sync_client(self):
+        (host, port) = self.interposer.get_host_port()
+        cli = jubatus.classifier.client.Classifier(host, port, '', 5)
+        d = jubatus.common.Datum({'foo': 'bar'})
+        for i in range(3):
+            self.assertEqual(2, cli.train([('label', d), ('label', d)]))
+        self.assertRaises(msgpackrpc.error.RPCError, cli.classify, [d])
+        cli.get_client().close()
+
+        stats = self.interposer.stats
+        self.assertEqual(['classify', 'train'], stats.methods())
+        train = stats.get('train')
+        self.assertEqual(3, train.count)
+        self.assertEqual(3, train.latency.count)
+        self.assertTrue(0 < train.request_bytes)
+        self.assertEqual(3 * 5, train.response_bytes) # [1, msgid, nil, 2]
+        self.assertEqual(1, stats.get('classify').errors)
+        self.assertEqual(1, stats.concurrency_max)
+
+    def test_async_client(self):
+        (host, port) = self.interposer.get_host_port()
+        cli_class = get_async_client_class(jubatus.classifier.client.Classifier)
+        cli = cli_class(host, port, '', 5)
+        d = jubatus.common.Datum({'foo': 'bar'})
+        futures = [cli.train([('label', d)] * 100) for i in range(20)]
+        cli.wait()
+        self.assertEqual([100] * 20, [f.get() for f in futures])
+        cli.close()
+
+        stats = self.interposer.stats
+        self.assertEqual(20, stats.get('train').count)
+        self.assertEqual(20, stats.requests)
+        self.assertTrue(1 <= stats.concurrency_mean() <= stats.concurrency_max <= 20)
+        record = stats.to_record()
+        self.assertEqual(20, record['wire.train.count'])
+        self.assertIn('wire.concurrency_max', record)
+
+    def test_stop(self):
+        (host, port) = self.interposer.get_host_port()
+        cli = jubatus.classifier.client.Classifier(host, port, '', 1)
+        cli.train([])
+        self.interposer.stop()
+        self.assertFalse(self.interposer.is_running())
+        self.assertRaises(Exception, cli.train, [])
+        cli.get_client().close()
+
+class WireStatsTest(JubaTestCase):
+    def test_reset(self):
+        stats = WireStats()
+        stats.record('train', 0.01, 10, 1)
+        stats.record_concurrency(3)
+        stats.record_concurrency(1)
+        self.assertEqual(2.0, stats.concurrency_mean())
+        self.assertEqual(3, stats.concurrency_max)
+        stats.reset()
+        self.assertEqual([], stats.methods())
+        self.assertEqual(0.0, stats.concurrency_mean())
+        self.assertEqual({}, stats.to_record())
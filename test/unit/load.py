@@ -0,0 +1,227 @@
+# -*- coding: utf-8 -*-
+
+import os
+import socket
+import tempfile
+import threading
+
+import jubatus
+import msgpackrpc
+
+from jubatest import *
+from jubatest.dataset import CACHE_SUFFIX
+from jubatest.load import DatasetWorkload, LoadGenerator, LoadResult, LoadCurve, ScalingCurve, count_records
+from jubatest.unit import JubaTestFixtureFailedError
+
+class ClassifierHandler(object):
+    def train(self, name, data):
+        return len(data)
+
+    def classify(self, name, data):
+        raise Exception('classify is not supported')
+
+class LocalRPCServer(object):
+    """
+    msgpack-rpc server running in a background thread, pretending to be a Jubatus server.
+    """
+
+    CLIENT_TIMEOUT = 5
+
+    def __init__(self, handler, service=CLASSIFIER):
+        self.service = service
+        sock = socket.socket()
+        sock.bind(('127.0.0.1', 0))
+        self.port = sock.getsockname()[1]
+        sock.close()
+        self._loop = msgpackrpc.Loop()
+        self._server = msgpackrpc.Server(handler, loop=self._loop)
+        self._server.listen(msgpackrpc.Address('127.0.0.1', self.port))
+        self.ioloop = self._loop._ioloop
+        self._thread = threading.Thread(target=self._server.start)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        self._loop._ioloop.add_callback(self._server.stop)
+        self._thread.join()
+        self._server.close()
+
+    def get_host_port(self):
+        return ('127.0.0.1', self.port)
+
+    def get_client_class(self):
+        return jubatus.classifier.client.Classifier
+
+    def cluster_name(self):
+        return ''
+
+class FeedbackWorkload(object):
+    """
+    Workload whose second call depends on the result of the first one.
+    """
+
+    def calls(self, worker, workers):
+        LabeledDatum = jubatus.classifier.types.LabeledDatum
+        results = []
+        yield ('train', ([LabeledDatum('a', jubatus.common.Datum())] * 3,), results.append)
+        while True:
+            yield ('train', ([LabeledDatum('a', jubatus.common.Datum())] * (sum(results) + 1),))
+
+class LoadGeneratorTest(JubaTestCase):
+    def setUp(self):
+        self.server = LocalRPCServer(ClassifierHandler())
+        self.dataset = tempfile.NamedTemporaryFile()
+        for i in range(100):
+            self.dataset.write('%d 1:%d 2:0.5\n' % (i % 2, i))
+        self.dataset.flush()
+
+    def tearDown(self):
+        self.dataset.close()
+        self.server.stop()
+        if os.path.exists(self.dataset.name + CACHE_SUFFIX):
+            os.remove(self.dataset.name + CACHE_SUFFIX)
+
+    def test_run(self):
+        workload = DatasetWorkload(self.dataset.name, batch_size=10)
+        result = LoadGenerator(self.server, workload, processes=2, connections=2).run()
+        self.assertEqual(10, result.calls)
+        self.assertEqual(100, result.records)
+        self.assertEqual(0, result.error_count())
+        self.assertEqual(10, result.latency.count)
+        self.assertTrue(0 < result.throughput())
+
+    def test_run_max_calls(self):
+        workload = DatasetWorkload(self.dataset.name, batch_size=10, repeat=True)
+        result = LoadGenerator(self.server, workload, processes=2).run(max_calls=25)
+        self.assertEqual(25, result.calls)
+
+    def test_run_duration(self):
+        workload = DatasetWorkload(self.dataset.name, batch_size=10, repeat=True)
+        result = LoadGenerator(self.server, workload).run(duration=1)
+        self.assertTrue(0 < result.calls)
+        self.assertTrue(result.elapsed() < 2)
+
+    def test_run_errors(self):
+        workload = DatasetWorkload(self.dataset.name, method='classify', batch_size=50)
+        result = LoadGenerator(self.server, workload).run()
+        self.assertEqual(0, result.calls)
+        self.assertEqual(2, result.error_count())
+
+    def test_run_result_callback(self):
+        result = LoadGenerator(self.server, FeedbackWorkload()).run(max_calls=2)
+        self.assertEqual(0, result.error_count())
+        self.assertEqual(3 + 4, result.records)
+
+    def test_run_fail(self):
+        self.assertRaises(JubaTestFixtureFailedError, DatasetWorkload, '/no-such-file')
+        workload = DatasetWorkload('/no-such-file', cache=False)
+        self.assertRaises(JubaTestFixtureFailedError, LoadGenerator(self.server, workload).run)
+
+    def test_record(self):
+        workload = DatasetWorkload(self.dataset.name, batch_size=10)
+        result = LoadGenerator(self.server, workload).run()
+        self.update_record(result.to_record('train.'))
+        record = self.get_record()
+        self.assertEqual(100, record['train.records'])
+        self.assertIn('train.latency_p99_ms', record)
+
+    def test_run_pipeline(self):
+        workload = DatasetWorkload(self.dataset.name, batch_size=5)
+        result = LoadGenerator(self.server, workload, processes=2, pipeline=4).run()
+        self.assertEqual(20, result.calls)
+        self.assertEqual(100, result.records)
+        self.assertEqual(20, result.latency.count)
+
+    def test_run_pipeline_errors(self):
+        workload = DatasetWorkload(self.dataset.name, method='classify', batch_size=50)
+        result = LoadGenerator(self.server, workload, pipeline=4).run()
+        self.assertEqual(2, result.error_count())
+
+    def test_run_open_loop(self):
+        workload = DatasetWorkload(self.dataset.name, batch_size=1, repeat=True)
+        curve = LoadGenerator(self.server, workload, processes=2, connections=2).run_open_loop([20, 40], 1)
+        self.assertEqual([20, 40], [rate for (rate, result) in curve.points])
+        self.assertAlmostEqual(20, curve.points[0][1].calls, delta=2)
+        self.assertAlmostEqual(40, curve.points[1][1].calls, delta=2)
+        self.assertEqual([], curve.slo_violations({99: 1.0}))
+        self.assertLatencySLO(curve, {99: 1.0})
+        self.assertIn('rate_40.latency_p99_ms', curve.to_record())
+
+    def test_run_open_loop_slo(self):
+        workload = DatasetWorkload(self.dataset.name, batch_size=1, repeat=True)
+        curve = LoadGenerator(self.server, workload).run_open_loop([10, 20], 0.5, slo={50: 0.0})
+        self.assertEqual(1, len(curve.points))
+        self.assertRaises(AssertionError, self.assertLatencySLO, curve, {50: 0.0})
+
+class LoadResultTest(JubaTestCase):
+    def test_merge(self):
+        r1 = LoadResult()
+        r1.record_call(1.0, 1.5, 10)
+        r2 = LoadResult()
+        r2.record_call(2.0, 3.0, 10)
+        r2.record_error(2.0, 2.5, ValueError())
+        r1.merge(r2)
+        self.assertEqual(2, r1.calls)
+        self.assertEqual(1, r1.error_count())
+        self.assertEqual(2.0, r1.elapsed())
+        self.assertEqual(10.0, r1.throughput())
+
+    def test_timeline(self):
+        r1 = LoadResult(1.0)
+        r1.record_call(10.0, 10.5, 10)
+        r1.record_call(10.5, 11.5, 10)
+        r2 = LoadResult(1.0)
+        r2.record_error(12.0, 13.2, ValueError())
+        r2.record_call(10.0, 10.2, 5)
+        r1.merge(r2)
+        points = r1.timeline_points()
+        self.assertEqual([10.0, 11.0, 12.0, 13.0], [p[0] for p in points])
+        self.assertEqual([(2, 15, 0), (1, 10, 0), (0, 0, 0), (0, 0, 1)], [p[1:4] for p in points])
+        self.assertEqual(2, points[0][4].count)
+        self.assertEqual([], LoadResult().timeline_points())
+
+    def test_slo_violations(self):
+        r = LoadResult()
+        for i in range(100):
+            r.record_call(0.0, 0.010, 1)
+        r.record_call(0.0, 1.0, 1)
+        self.assertEqual([], r.slo_violations({50: 0.020, 99: 0.020}))
+        self.assertEqual(1, len(r.slo_violations({50: 0.020, 99.9: 0.020})))
+
+    def test_curve(self):
+        curve = LoadCurve()
+        r1 = LoadResult()
+        r1.record_call(0.0, 0.010, 1)
+        r2 = LoadResult()
+        r2.record_call(0.0, 0.100, 1)
+        curve.add(100, r1)
+        curve.add(200, r2)
+        self.assertEqual(100, curve.sustainable_rate({99: 0.050}))
+        self.assertEqual(None, curve.sustainable_rate({99: 0.001}))
+        self.assertEqual(1, len(curve.slo_violations({99: 0.050})))
+
+    def test_scaling_curve(self):
+        curve = ScalingCurve()
+        for (servers, calls) in [(4, 300), (1, 100), (2, 200)]:
+            r = LoadResult()
+            for i in range(calls):
+                r.record_call(0.0, 1.0, 1)
+            curve.add(servers, r)
+        self.assertEqual([1, 2, 4], [n for (n, r) in curve.points])
+        self.assertAlmostEqual(1.0, curve.efficiency(2))
+        self.assertAlmostEqual(0.75, curve.efficiency(4))
+        self.assertAlmostEqual(3.0, curve.speedup(4))
+        self.assertAlmostEqual(0.75, curve.to_record('scaling.')['scaling.servers_4.efficiency'])
+        self.assertRaises(KeyError, curve.efficiency, 3)
+
+    def test_scaling_steps(self):
+        self.assertEqual([1], ScalingCurve.steps(1))
+        self.assertEqual([1, 2, 4], ScalingCurve.steps(4))
+        self.assertEqual([1, 2, 4, 6], ScalingCurve.steps(6))
+        self.assertEqual([2, 4, 6], ScalingCurve.steps(6, 2))
+        self.assertEqual([2], ScalingCurve.steps(2, 2))
+
+    def test_count_records(self):
+        self.assertEqual(3, count_records(([1, 2, 3],)))
+        self.assertEqual(1, count_records(('id', 'datum')))
+        self.assertEqual(1, count_records(()))
@@ -3,7 +3,8 @@
 from datetime import datetime, timedelta
 
 from jubatest import *
-from jubatest.log import Log, LogLevel, LogFilter
+from jubatest.log import Log, LogLevel, LogFilter, RemoteLogFilter, milliseconds
+from jubatest.process import LocalSubprocess
 from jubatest.exceptions import JubaTestAssertionError
 
 class LogTest(JubaTestCase):
@@ -120,8 +121,97 @@ class LogFilterTest(JubaTestCase):
     def test_get(self):
         self.assertEqual(3, len(self.filter.get()))
 
+    def test_mix_rounds(self):
+        logs = Log.parse_logs('localhost', mix_log)
+        rounds = LogFilter(logs).mix_rounds()
+        self.assertEqual(2, len(rounds))
+        self.assertEqual(3, rounds[0].servers)
+        self.assertAlmostEqual(0.052931, rounds[0].seconds)
+        self.assertEqual(12345, rounds[0].bytes)
+        self.assertEqual(datetime(2014, 8, 11, 15, 8, 15, 924000), rounds[0].time)
+        self.assertEqual('localhost', rounds[1].node)
+        self.assertEqual(0, len(self.filter.mix_rounds()))
+
+    def test_startups(self):
+        logs = Log.parse_logs('localhost', startup_log)
+        startups = LogFilter(logs).startups()
+        self.assertEqual(2, len(startups))
+        self.assertEqual('jubaclassifier', startups[0].program)
+        self.assertEqual(datetime(2014, 8, 11, 15, 7, 15, 900000), startups[0].time)
+        self.assertEqual(datetime(2014, 8, 11, 15, 7, 16, 25000), startups[0].listen_time)
+        self.assertAlmostEqual(125.0, startups[0].milliseconds)
+        self.assertEqual(None, startups[1].milliseconds)
+        self.assertEqual(0, len(self.filter.startups()))
+
+    def test_model_loads(self):
+        logs = Log.parse_logs('localhost', startup_log)
+        loads = LogFilter(logs).model_loads()
+        self.assertEqual(1, len(loads))
+        self.assertEqual('/tmp/127.0.0.1_9199_classifier_m1.jubatus', loads[0].path)
+        self.assertAlmostEqual(1010.0, loads[0].milliseconds)
+
+    def test_milliseconds(self):
+        self.assertAlmostEqual(86400500.0, milliseconds(datetime(2014, 1, 1), datetime(2014, 1, 2, 0, 0, 0, 500000)))
+
+class RemoteLogFilterTest(JubaTestCase):
+    def _filter(self, f, logs):
+        p = LocalSubprocess(['bash', '-c', f.shell_command()])
+        p.start()
+        p.wait(logs)
+        return p.stdout
+
+    def test_level(self):
+        output = self._filter(RemoteLogFilter(LogLevel.WARN), verbose_log)
+        self.assertEqual(['warn 1', 'warn 2', 'error 1', 'continued', 'zk error'], [l.split('] ')[-1].split(': ')[-1] for l in output.splitlines()])
+
+    def test_include_exclude(self):
+        output = self._filter(RemoteLogFilter(include='(info|warn) [0-9]', exclude='warn 2'), verbose_log)
+        self.assertEqual(6, len(output.splitlines())) # info 1, info 2, warn 1, error 1 (continued), zk error
+        self.assertTrue('warn 2' not in output)
+        self.assertTrue('error 1\ncontinued' in output)
+
+    def test_sample(self):
+        output = self._filter(RemoteLogFilter(sample=2), verbose_log)
+        self.assertEqual(['info 1', 'debug 1', 'warn 1', 'error 1', 'continued', 'zk info', 'zk error'], [l.split('] ')[-1].split(': ')[-1] for l in output.splitlines()])
+
+    def test_no_filter(self):
+        self.assertEqual(verbose_log, self._filter(RemoteLogFilter(), verbose_log))
+
+    def test_parse_filtered(self):
+        logs = Log.parse_logs('localhost', self._filter(RemoteLogFilter(LogLevel.ERROR), verbose_log))
+        self.assertEqual(2, len(logs))
+        self.assertEqual('error 1\ncontinued', logs[0].message)
+
 sample_log = """\
 2013-05-16 13:58:52,778:28460(0x7f02e4b03700):ZOO_INFO@check_events@1750: session establishment complete on server [127.0.0.1:2181], sessionId=0x13d8bcf02a2003b, negotiated timeout=10000
 2014-08-11 15:07:15,924 5951 INFO  [server_util.cpp:93] load config from zookeeper: localhost:2181
 2014-08-11 15:07:15,925 5951 ERROR [server_util.cpp:81] exception when loading config file: Dynamic exception type: jubatus::core::common::exception::runtime_error::what: config does not exist: /jubatus/config/classifier/test
 """
+
+mix_log = """\
+2014-08-11 15:08:15,924 5951 INFO  [linear_mixer.cpp:431] mixed with 3 servers in 0.052931 secs, 12345 bytes (serialized data)
+2014-08-11 15:08:16,001 5951 INFO  [server_util.cpp:93] some other message
+2014-08-11 15:09:15,924 5951 INFO  [linear_mixer.cpp:431] mixed with 3 servers in 0.1 secs, 23456 bytes (serialized data)
+"""
+
+startup_log = """\
+2014-08-11 15:07:15,900 5951 INFO  [server_util.cpp:217] starting jubaclassifier 0.6.0 RPC server at 127.0.0.1:9199
+2014-08-11 15:07:15,910 5951 INFO  [server_util.cpp:93] load config from local file: /tmp/config.json
+2014-08-11 15:07:16,025 5951 INFO  [server_helper.hpp:221] start listening at port 9199
+2014-08-11 15:07:17,000 5952 INFO  [server_base.cpp:163] starting load from /tmp/127.0.0.1_9199_classifier_m1.jubatus
+2014-08-11 15:07:18,010 5952 INFO  [server_base.cpp:205] loaded from /tmp/127.0.0.1_9199_classifier_m1.jubatus
+2014-08-11 15:07:18,020 5952 INFO  [server_base.cpp:163] starting load from /tmp/127.0.0.1_9199_classifier_m2.jubatus
+2014-08-11 15:08:15,900 6001 INFO  [server_util.cpp:217] starting jubaclassifier 0.6.0 RPC server at 127.0.0.1:9199
+"""
+
+verbose_log = """\
+2014-08-11 15:07:15,900 5951 INFO  [server_util.cpp:93] info 1
+2014-08-11 15:07:15,901 5951 INFO  [server_util.cpp:93] info 2
+2014-08-11 15:07:15,902 5951 DEBUG [server_util.cpp:93] debug 1
+2014-08-11 15:07:15,903 5951 WARN  [server_util.cpp:93] warn 1
+2014-08-11 15:07:15,904 5951 WARN  [server_util.cpp:93] warn 2
+2014-08-11 15:07:15,905 5951 ERROR [server_util.cpp:93] error 1
+continued
+2013-05-16 13:58:52,659:28460(0x7f02e99b7740):ZOO_INFO@log_env@712: zk info
+2013-05-16 13:58:52,659:28460(0x7f02e99b7740):ZOO_ERROR@log_env@712: zk error
+"""
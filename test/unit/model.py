@@ -0,0 +1,155 @@
+# -*- coding: utf-8 -*-
+
+import os
+import sys
+import hashlib
+import struct
+import tempfile
+import subprocess
+
+import msgpack
+
+from jubatest import *
+from jubatest.model import ModelHeader, ModelReader, HEADER_SIZE, compare_models, parse_checksum, remote_checksum
+from jubatest.unit import JubaTestFixtureFailedError
+from jubatest.exceptions import JubaTestAssertionError
+
+from sampler import LocalNode
+
+# prints the peak RSS (KB) after computing section digests of the model (or only opening it)
+RSS_SCRIPT = '''
+import sys, resource
+from jubatest.model import ModelReader
+reader = ModelReader(sys.argv[1])
+if sys.argv[2] == 'digests':
+    reader.section_digests()
+print(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)
+'''
+
+def build_model(server_id, user_data):
+    system = msgpack.packb([1, 1400000000, 'classifier', server_id, '{}'])
+    user = msgpack.packb([1, user_data])
+    header = struct.pack('>8sQIIIIQQ', 'jubatus\0', 1, 0, 6, 0, 0, len(system), len(user))
+    return header + system + user
+
+class ModelHeaderTest(JubaTestCase):
+    def test_parse(self):
+        data = build_model('127.0.0.1_9199', {'w': [1, 2, 3]})
+        header = ModelHeader.parse(data)
+        self.assertEqual(1, header.format_version)
+        self.assertEqual((0, 6, 0), header.jubatus_version)
+        self.assertEqual(len(data), header.file_size())
+        self.assertEqual(data[header.user_data_offset():], msgpack.packb([1, {'w': [1, 2, 3]}]))
+
+    def test_parse_fail(self):
+        self.assertRaises(JubaTestAssertionError, ModelHeader.parse, 'jubatus\0')
+        self.assertRaises(JubaTestAssertionError, ModelHeader.parse, 'x' * HEADER_SIZE)
+
+class ChecksumTest(JubaTestCase):
+    def setUp(self):
+        self.node = LocalNode()
+
+    def _write(self, data):
+        f = tempfile.NamedTemporaryFile()
+        f.write(data)
+        f.flush()
+        return f
+
+    def test_remote_checksum(self):
+        data = build_model('127.0.0.1_9199', {'w': [1, 2, 3]})
+        with self._write(data) as f:
+            checksum = remote_checksum(self.node, f.name)
+        header = ModelHeader.parse(data)
+        self.assertEqual(len(data), checksum.size)
+        self.assertEqual(header.user_data_size, checksum.header.user_data_size)
+        self.assertEqual(hashlib.sha1(data[header.user_data_offset():]).hexdigest(), checksum.sha1)
+
+    def test_remote_checksum_ignores_system_data(self):
+        with self._write(build_model('127.0.0.1_9199', {'w': [1]})) as f1:
+            with self._write(build_model('127.0.0.1_9200', {'w': [1]})) as f2:
+                with self._write(build_model('127.0.0.1_9200', {'w': [2]})) as f3:
+                    (c1, c2, c3) = [remote_checksum(self.node, f.name) for f in (f1, f2, f3)]
+        self.assertEqual(c1.sha1, c2.sha1)
+        self.assertNotEqual(c2.sha1, c3.sha1)
+
+    def test_remote_checksum_fail(self):
+        self.assertRaises(JubaTestFixtureFailedError, remote_checksum, self.node, '/nonexistent/model.jubatus')
+
+    def test_parse_checksum_size_mismatch(self):
+        header = build_model('127.0.0.1_9199', {})[:HEADER_SIZE].encode('hex')
+        self.assertRaises(JubaTestAssertionError, parse_checksum, '%s\n1\nda39a3ee5e6b4b0d3255bfef95601890afd80709  -\n' % header)
+        self.assertRaises(JubaTestAssertionError, parse_checksum, '')
+
+class ModelReaderTest(JubaTestCase):
+    def setUp(self):
+        self.sections = [{'weights': dict([('f%d' % i, [i, 0.5]) for i in range(1000)])}, ['converter', 1], 'x' * 5000]
+        self.model = self._write(build_model('127.0.0.1_9199', self.sections))
+
+    def tearDown(self):
+        self.model.close()
+
+    def _write(self, data):
+        f = tempfile.NamedTemporaryFile()
+        f.write(data)
+        f.flush()
+        return f
+
+    def test_metadata(self):
+        with ModelReader(self.model.name) as reader:
+            metadata = reader.metadata()
+            self.assertEqual('classifier', reader.engine())
+            self.assertEqual('127.0.0.1_9199', reader.server_id())
+            self.assertEqual({}, reader.config())
+            self.assertEqual(1, reader.user_data_version())
+        self.assertEqual('0.6.0', metadata['jubatus_version'])
+        self.assertEqual(1400000000, metadata['timestamp'])
+
+    def test_sections(self):
+        with ModelReader(self.model.name) as reader:
+            reader.READ_SIZE = 1024 # refill the buffer in the middle of sections
+            self.assertEqual(self.sections, list(reader.sections()))
+            digests = reader.section_digests()
+        self.assertEqual(3, len(digests))
+        for ((size, sha1), section) in zip(digests, self.sections):
+            data = msgpack.packb(section)
+            self.assertEqual((len(data), hashlib.sha1(data).hexdigest()), (size, sha1))
+
+    def test_compare_models(self):
+        sections = list(self.sections)
+        sections[1] = ['converter', 2]
+        with self._write(build_model('127.0.0.1_9200', self.sections)) as same:
+            self.assertEqual([], compare_models(self.model.name, same.name))
+        with self._write(build_model('127.0.0.1_9200', sections)) as other:
+            self.assertEqual([1], compare_models(self.model.name, other.name))
+        with self._write(build_model('127.0.0.1_9200', sections[:2])) as other:
+            self.assertRaises(JubaTestAssertionError, compare_models, self.model.name, other.name)
+
+    def test_invalid(self):
+        with self._write('jubatus\0') as f:
+            self.assertRaises(JubaTestAssertionError, ModelReader, f.name)
+        with self._write(build_model('127.0.0.1_9199', {})[:-1]) as f:
+            self.assertRaises(JubaTestAssertionError, ModelReader, f.name)
+        with self._write(build_model('127.0.0.1_9199', {})) as f:
+            with ModelReader(f.name) as reader:
+                self.assertRaises(JubaTestAssertionError, list, reader.sections())
+
+    def test_large_section_memory(self):
+        section_size = 64 * 1024 * 1024
+        chunk = 'x' * (1024 * 1024)
+        system = msgpack.packb([1, 1400000000, 'recommender', '127.0.0.1_9199', '{}'])
+        prefix = '\x92\x01\x92' + '\xdb' + struct.pack('>I', section_size) # [1, [str32, ...
+        suffix = msgpack.packb(['converter', 1])
+        user_size = len(prefix) + section_size + len(suffix)
+        digest = hashlib.sha1(prefix[3:])
+        with tempfile.NamedTemporaryFile() as f:
+            f.write(struct.pack('>8sQIIIIQQ', 'jubatus\0', 1, 0, 6, 0, 0, len(system), user_size) + system + prefix)
+            for i in range(section_size // len(chunk)):
+                f.write(chunk)
+                digest.update(chunk)
+            f.write(suffix)
+            f.flush()
+            with ModelReader(f.name) as reader:
+                self.assertEqual([(section_size + 5, digest.hexdigest()), (len(suffix), hashlib.sha1(suffix).hexdigest())], reader.section_digests())
+            env = dict(os.environ, PYTHONPATH=os.pathsep.join(sys.path))
+            (baseline, peak) = [int(subprocess.check_output([sys.executable, '-c', RSS_SCRIPT, f.name, mode], env=env)) for mode in ('open', 'digests')]
+        self.assertTrue(peak - baseline < 16 * 1024, 'peak RSS grew by %d KB' % (peak - baseline))
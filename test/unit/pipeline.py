@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+
+import jubatus
+import msgpackrpc
+
+from jubatest import *
+from jubatest.pipeline import PipelinedClient, get_async_client_class
+
+from load import LocalRPCServer
+
+class DelayedHandler(object):
+    """
+    Responds to `train` after (10 - batch size) * 10 msec, so that larger
+    batches sent later are responded earlier.
+    """
+
+    def train(self, name, data):
+        result = msgpackrpc.server.AsyncResult()
+        self.ioloop.add_timeout(self.ioloop.time() + (10 - len(data)) * 0.01, lambda: result.set_result(len(data)))
+        return result
+
+    def classify(self, name, data):
+        raise Exception('classify is not supported')
+
+    def get_labels(self, name):
+        return [name]
+
+class PipelinedClientTest(JubaTestCase):
+    def setUp(self):
+        self.handler = DelayedHandler()
+        self.server = LocalRPCServer(self.handler)
+        self.handler.ioloop = self.server.ioloop
+        cli_class = get_async_client_class(jubatus.classifier.client.Classifier)
+        self.cli = cli_class('127.0.0.1', self.server.port, 'test', 5)
+
+    def tearDown(self):
+        self.cli.close()
+        self.server.stop()
+
+    def test_class(self):
+        cli_class = get_async_client_class(jubatus.classifier.client.Classifier)
+        self.assertTrue(issubclass(cli_class, PipelinedClient))
+        self.assertIs(cli_class, get_async_client_class(jubatus.classifier.client.Classifier))
+        for method in ['train', 'classify', 'get_labels', 'save', 'get_status']:
+            self.assertTrue(hasattr(cli_class, method), method)
+
+    def test_pipelined(self):
+        d = jubatus.common.Datum({'foo': 'bar'})
+        futures = [self.cli.train([('label', d)] * n) for n in range(1, 6)]
+        self.assertEqual(5, self.cli.in_flight())
+        self.cli.wait()
+        self.assertEqual(0, self.cli.in_flight())
+        self.assertEqual([1, 2, 3, 4, 5], [f.get() for f in futures])
+        # responses arrived out of order
+        done_order = sorted(futures, key=lambda f: f.done_time)
+        self.assertEqual(futures[::-1], done_order)
+
+    def test_max_in_flight(self):
+        cli_class = get_async_client_class(jubatus.classifier.client.Classifier)
+        cli = cli_class('127.0.0.1', self.server.port, 'test', 5, 2)
+        d = jubatus.common.Datum({'foo': 'bar'})
+        futures = [cli.train([('label', d)]) for n in range(5)]
+        self.assertTrue(cli.in_flight() <= 2)
+        cli.wait()
+        self.assertEqual([1] * 5, [f.get() for f in futures])
+        cli.close()
+
+    def test_max_in_flight_out_of_order(self):
+        cli_class = get_async_client_class(jubatus.classifier.client.Classifier)
+        cli = cli_class('127.0.0.1', self.server.port, 'test', 5, 2)
+        d = jubatus.common.Datum({'foo': 'bar'})
+        slow = cli.train([('label', d)]) # responded after 90 msec
+        fast = cli.train([('label', d)] * 9) # responded after 10 msec
+        cli.poll(0.03)
+        self.assertTrue(fast.done())
+        self.assertEqual(1, cli.in_flight())
+        cli.train([('label', d)] * 9) # does not wait for the slow one
+        self.assertFalse(slow.done())
+        cli.wait()
+        cli.close()
+
+    def test_typed_result(self):
+        self.assertEqual(['test'], self.cli.get_labels().get())
+
+    def test_raw_call(self):
+        self.assertEqual(['test'], self.cli.call('get_labels').get())
+
+    def test_error(self):
+        d = jubatus.common.Datum({'foo': 'bar'})
+        future = self.cli.classify([d])
+        future.wait()
+        self.assertIsNotNone(future.error())
+        self.assertRaises(msgpackrpc.error.RPCError, future.get)
+
+    def test_callback(self):
+        done = []
+        future = self.cli.get_labels()
+        future.add_done_callback(lambda f: done.append((f, f.result())))
+        self.cli.poll(0.5)
+        self.assertEqual([(future, ['test'])], done)
+        self.assertTrue(0 <= future.latency())
@@ -49,3 +49,18 @@ class LocalSubprocessTest(JubaTestCase):
         p.stop(True)
         time.sleep(0.5)
         self.assertFalse(p.is_running())
+
+    def test_output_limit(self):
+        p = LocalSubprocess(['sh', '-c', 'yes 2>/dev/null | head -c 1000000; printf end >&2'], output_limit=100)
+        p.start()
+        p.wait()
+        self.assertEqual(100, len(p.stdout))
+        self.assertEqual('y\n' * 50, p.stdout)
+        self.assertEqual('end', p.stderr)
+
+    def test_output_limit_stop(self):
+        p = LocalSubprocess(['yes'], output_limit=10)
+        p.start()
+        time.sleep(0.2)
+        p.stop()
+        self.assertEqual(10, len(p.stdout))
@@ -1,11 +1,14 @@
 # -*- coding: utf-8 -*-
 
 import time
+import pipes
 import tempfile
 
 from jubatest import *
 
-from jubatest.remote import SyncRemoteProcess, AsyncRemoteProcess, RemoteProcessFailedError
+from jubatest.remote import SyncRemoteProcess, AsyncRemoteProcess, RemoteProcessFailedError, _RemoteUtil
+from jubatest.process import LocalSubprocess
+from jubatest.log import RemoteLogFilter
 
 class SyncRemoteProcessTest(JubaTestCase):
     def test_run(self):
@@ -83,3 +86,42 @@ class AsyncRemoteProcessTest(JubaTestCase):
         p.start()
         time.sleep(5)
         self.assertFalse(p.is_running())
+
+    def test_send_signal_fail(self):
+        p = AsyncRemoteProcess('localhost', ['sleep', '120'], [])
+        self.assertRaises(RemoteProcessFailedError, p.send_signal, 'TERM')
+
+class RemoteUtilTest(JubaTestCase):
+    def _state(self, p):
+        # state of the child process of the shell, as the remote shell does
+        output = LocalSubprocess(['ps', '-o', 'stat=', '--ppid', str(p._process.pid)])
+        output.start()
+        output.wait()
+        return output.stdout.strip()[0]
+
+    def test_jobcontrol_pause_resume(self):
+        # run the job-controlled command line locally, without SSH
+        p = LocalSubprocess(['bash', '-c', ' '.join(['sleep', '120'] + _RemoteUtil._ssh_jobcontrol_suffix())])
+        p.start()
+        time.sleep(0.3)
+        self.assertEqual('S', self._state(p))
+        p._write_stdin('STOP\n')
+        time.sleep(0.3)
+        self.assertEqual('T', self._state(p))
+        p._write_stdin('CONT\n')
+        time.sleep(0.3)
+        self.assertEqual('S', self._state(p))
+        self.assertRunsWithin(5, p.wait, 'TERM\n')
+
+    def test_jobcontrol_filter(self):
+        script = 'echo "2014-08-11 15:07:15,900 5951 INFO  [a.cpp:1] info"; echo "2014-08-11 15:07:15,901 5951 ERROR [a.cpp:1] error"; echo zk >&2; exec sleep 120'
+        with tempfile.NamedTemporaryFile() as out, tempfile.NamedTemporaryFile() as err:
+            f = RemoteLogFilter('WARN')
+            redirects = _RemoteUtil.filter_redirects(f.shell_command(out.name), f.shell_command(err.name))
+            p = LocalSubprocess(['bash', '-c', ' '.join(['sh', '-c', pipes.quote(script)] + redirects + _RemoteUtil._ssh_jobcontrol_suffix())])
+            p.start()
+            time.sleep(0.3)
+            self.assertRunsWithin(5, p.wait, 'TERM\n')
+            self.assertEqual('2014-08-11 15:07:15,901 5951 ERROR [a.cpp:1] error\n', p.stdout)
+            self.assertEqual('zk\n', p.stderr)
+            self.assertEqual(2, len(out.read().splitlines()))
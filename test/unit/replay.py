@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+
+import os
+import time
+import tempfile
+
+import jubatus
+
+from jubatest import *
+from jubatest.replay import TrafficRecorder, TrafficReplayer, read_traffic
+from jubatest.unit import JubaTestFixtureFailedError
+
+from load import LocalRPCServer
+
+class EchoHandler(object):
+    def __init__(self, offset=0):
+        self.offset = offset
+
+    def train(self, name, data):
+        return len(data) + self.offset
+
+    def classify(self, name, data):
+        raise Exception('classify is not supported')
+
+    def get_labels(self, name):
+        return [name]
+
+class TrafficReplayTest(JubaTestCase):
+    def setUp(self):
+        self.server = LocalRPCServer(EchoHandler())
+        (fd, self.path) = tempfile.mkstemp()
+        os.close(fd)
+        self.datum = jubatus.common.Datum({'foo': 'bar'})
+
+    def tearDown(self):
+        self.server.stop()
+        os.remove(self.path)
+
+    def _record_traffic(self, interval=0):
+        with TrafficRecorder(self.path) as recorder:
+            cli = recorder.attach(jubatus.classifier.client.Classifier('127.0.0.1', self.server.port, 'test', 5))
+            cli.train([('label', self.datum)])
+            time.sleep(interval)
+            cli.train([('label', self.datum)] * 2)
+            self.assertRaises(Exception, cli.classify, [self.datum])
+            cli.get_client().close()
+        self.assertEqual(3, recorder.calls)
+
+    def test_record(self):
+        self._record_traffic()
+        entries = list(read_traffic(self.path))
+        self.assertEqual(3, len(entries))
+        (begin, method, args, latency, result, error) = entries[1]
+        self.assertEqual('train', method)
+        self.assertEqual(2, len(args[0]))
+        self.assertEqual(2, result)
+        self.assertEqual(None, error)
+        self.assertTrue(0 <= latency)
+        self.assertTrue(entries[2][5] is not None)
+
+    def test_replay(self):
+        self._record_traffic()
+        result = TrafficReplayer(self.path).replay(self.server, 'max')
+        self.assertEqual(3, result.calls)
+        self.assertEqual(1, result.errors)
+        self.assertEqual(0, result.mismatches)
+        self.assertEqual(2, result.latency.count)
+        self.assertEqual(3, result.to_record()['replay.calls'])
+
+    def test_replay_mismatch(self):
+        self._record_traffic()
+        other = LocalRPCServer(EchoHandler(1))
+        try:
+            self.assertEqual(2, TrafficReplayer(self.path).replay(other, 'max').mismatches)
+            self.assertEqual(0, TrafficReplayer(self.path, ignore_methods=['train']).replay(other, 'max').mismatches)
+        finally:
+            other.stop()
+
+    def test_replay_speed(self):
+        self._record_traffic(0.4)
+        self.assertTrue(0.4 <= TrafficReplayer(self.path).replay(self.server).elapsed)
+        elapsed = TrafficReplayer(self.path).replay(self.server, 2).elapsed
+        self.assertTrue(0.2 <= elapsed < 0.4, elapsed)
+
+    def test_replay_send_lag(self):
+        self._record_traffic()
+        result = TrafficReplayer(self.path).replay(self.server)
+        self.assertEqual(3, result.send_lag.count)
+        self.assertIn('replay.send_lag_p99_ms', result.to_record())
+        self.assertEqual(0, TrafficReplayer(self.path).replay(self.server, 'max').send_lag.count)
+
+    def test_read_fail(self):
+        self.assertRaises(JubaTestFixtureFailedError, list, read_traffic('/no-such-file'))
@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*-
+
+import os
+import subprocess
+import tempfile
+import time
+
+from jubatest import *
+from jubatest.sampler import ResourceSampler, ResourceSeries, parse_proc_sample
+from jubatest.remote import RemoteProcessFailedError
+
+STAT = '{pid} (juba classifier) S 1 {pid} {pid} 0 -1 4202496 100 0 0 0 {utime} {stime} 0 0 20 0 {threads} 0 100 1000000 {rss} 0'
+
+class LocalNode(object):
+    """
+    Runs the processes locally, in the same way as the remote shell does.
+    """
+
+    def get_host(self):
+        return 'localhost'
+
+    def run_process(self, args):
+        p = subprocess.Popen(['sh', '-c', ' '.join(args)], stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        (stdout, stderr) = p.communicate()
+        if p.returncode != 0:
+            raise RemoteProcessFailedError(stderr)
+        return stdout
+
+class ParseProcSampleTest(JubaTestCase):
+    def test_parse(self):
+        output = '\n'.join([
+            '100 4096',
+            '123 12 ' + STAT.format(pid=123, utime=150, stime=50, threads=4, rss=1000),
+            '124 3 ' + STAT.format(pid=124, utime=100, stime=0, threads=1, rss=24),
+            '125 0 ',
+        ])
+        self.assertEqual((3.0, 1024 * 4096, 5, 15), parse_proc_sample(output))
+
+    def test_no_process(self):
+        self.assertIsNone(parse_proc_sample('100 4096\n'))
+        self.assertIsNone(parse_proc_sample('100 4096\n 0 \n'))
+
+class ResourceSeriesTest(JubaTestCase):
+    def test_to_record(self):
+        series = ResourceSeries()
+        series.append(10.0, 1.0, 1000, 4, 10)
+        series.append(12.0, 2.0, 3000, 6, 12)
+        self.assertEqual(2, len(series))
+        self.assertEqual(0.5, series.cpu_usage())
+        record = series.to_record('r.')
+        self.assertEqual(3000, record['r.rss_peak_bytes'])
+        self.assertEqual(2000, record['r.rss_mean_bytes'])
+        self.assertEqual(6, record['r.threads_peak'])
+        self.assertEqual(12, record['r.fds_peak'])
+        self.assertEqual(0.5, record['r.cpu_usage_mean'])
+        self.assertEqual({}, ResourceSeries().to_record())
+
+    def test_export(self):
+        series = ResourceSeries()
+        series.append(10.0, 1.0, 1000, 4, 10)
+        with tempfile.NamedTemporaryFile() as f:
+            series.export(f.name)
+            self.assertEqual(['time,cpu_seconds,rss_bytes,threads,fds', '10.0,1.0,1000.0,4.0,10.0'], f.read().splitlines())
+
+class ResourceSamplerTest(JubaTestCase):
+    def setUp(self):
+        port = 10000 + os.getpid() % 50000
+        self.process = subprocess.Popen(['/bin/sh', '-c', 'sleep 30; :', '--rpc-port', str(port)])
+        self.sampler = ResourceSampler(LocalNode(), 'sh', port, 0.01)
+
+    def tearDown(self):
+        self.sampler.stop()
+        if self.process.poll() is None:
+            self.process.kill()
+            self.process.wait()
+
+    def test_sample(self):
+        (cpu_seconds, rss_bytes, threads, fds) = self.sampler.sample()
+        self.assertTrue(0 < rss_bytes)
+        self.assertEqual(2, threads) # shell and sleep
+        self.assertTrue(0 < fds)
+
+    def test_background(self):
+        self.sampler.start()
+        time.sleep(0.5)
+        self.sampler.stop()
+        count = len(self.sampler.series)
+        self.assertTrue(2 <= count)
+        time.sleep(0.05)
+        self.assertEqual(count, len(self.sampler.series))
+
+    def test_process_not_found(self):
+        self.process.kill()
+        self.process.wait()
+        self.assertIsNone(self.sampler.sample())
+        self.assertEqual(0, len(self.sampler.series))
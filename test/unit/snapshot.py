@@ -0,0 +1,49 @@
+# -*- coding: utf-8 -*-
+
+import os
+import shutil
+import tempfile
+
+from jubatest import *
+from jubatest.snapshot import SnapshotCache
+from jubatest.unit import JubaTestFixtureFailedError
+
+class SnapshotCacheTest(JubaTestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.cache = SnapshotCache(os.path.join(self.directory, 'cache'))
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_put_get(self):
+        digest = self.cache.put('trained', CLASSIFIER, 'model-data')
+        (service, digest2, path) = self.cache.get('trained')
+        self.assertEqual(CLASSIFIER, service)
+        self.assertEqual(digest, digest2)
+        with open(path) as f:
+            self.assertEqual('model-data', f.read())
+
+    def test_content_addressed(self):
+        digest1 = self.cache.put('model1', CLASSIFIER, 'same-data')
+        digest2 = self.cache.put('model2', CLASSIFIER, 'same-data')
+        self.assertEqual(digest1, digest2)
+        self.assertEqual(digest1, self.cache.get('model1')[1])
+
+    def test_overwrite(self):
+        self.cache.put('trained', CLASSIFIER, 'old-data')
+        digest = self.cache.put('trained', CLASSIFIER, 'new-data')
+        self.assertEqual(digest, self.cache.get('trained')[1])
+
+    def test_persistent(self):
+        self.cache.put('trained', CLASSIFIER, 'model-data')
+        cache2 = SnapshotCache(self.cache.get_directory())
+        self.assertTrue(cache2.has('trained'))
+
+    def test_has(self):
+        self.assertFalse(self.cache.has('trained'))
+        self.cache.put('trained', CLASSIFIER, 'model-data')
+        self.assertTrue(self.cache.has('trained'))
+
+    def test_get_fail(self):
+        self.assertRaises(JubaTestFixtureFailedError, self.cache.get, 'no-such-snapshot')
@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+
+import subprocess
+
+import jubatus
+
+from jubatest import *
+from jubatest.soak import SoakResult
+from jubatest.status import StatusSeries
+from jubatest.load import LoadResult
+from jubatest.sampler import ResourceSeries
+from jubatest.workload import ClassifierWorkload
+
+from load import LocalRPCServer, ClassifierHandler
+from sampler import LocalNode
+
+class StatusHandler(ClassifierHandler):
+    def __init__(self):
+        self.rows = 0
+
+    def train(self, name, data):
+        self.rows += len(data)
+        return len(data)
+
+    def get_status(self, name):
+        return {'127.0.0.1_0': {'num_rows': str(self.rows), 'version': '1.0.0'}}
+
+class SoakServer(LocalRPCServer):
+    """
+    Local RPC server with a process that can be sampled as the server process.
+    """
+
+    output_limit = 1024
+    status_method = 'get_status'
+
+    def __init__(self):
+        super(SoakServer, self).__init__(StatusHandler())
+        self.node = LocalNode()
+        self._process = subprocess.Popen(['/bin/sh', '-c', 'sleep 30; :', '--rpc-port', str(self.port)])
+
+    def stop(self):
+        self._process.kill()
+        self._process.wait()
+        super(SoakServer, self).stop()
+
+    def program(self):
+        return 'sh'
+
+    def is_running(self):
+        return True
+
+    def get_client(self):
+        return jubatus.classifier.client.Classifier('127.0.0.1', self.port, '', 5)
+
+class SoakResultTest(JubaTestCase):
+    def test_growth(self):
+        resources = ResourceSeries()
+        status = StatusSeries()
+        for t in range(10):
+            # RSS grows only after warmup (t >= 4): 1000 bytes/sec
+            resources.append(t, 0.0, 10000 + max(0, t - 4) * 1000, 1, 1)
+            status.append(t, {'a': {'num_rows': str(t * 2)}})
+        result = SoakResult(LoadResult(), resources, status, 4)
+        self.assertAlmostEqual(1000 * 3600, result.rss_growth())
+        self.assertAlmostEqual(2 * 3600, result.status_growth()['a.num_rows'])
+        record = result.to_record('s.')
+        self.assertAlmostEqual(1000 * 3600, record['s.rss_growth_bytes_per_hour'])
+        self.assertIn('s.status.a.num_rows.growth_per_hour', record)
+        self.assertIn('s.resource.rss_peak_bytes', record)
+
+    def test_not_enough_samples(self):
+        resources = ResourceSeries()
+        resources.append(1.0, 0.0, 1000, 1, 1)
+        result = SoakResult(LoadResult(), resources, StatusSeries(), 0)
+        self.assertIsNone(result.rss_growth())
+
+class JubaSoakCaseTest(JubaSoakCase):
+    warmup = 0
+    sample_interval = 0.1
+
+    def setUp(self):
+        self.server = SoakServer()
+
+    def tearDown(self):
+        self.server.stop()
+
+    def test_soak(self):
+        result = self.soak(self.server, ClassifierWorkload(query_ratio=0), 1.5)
+        self.assertTrue(0 < result.load.calls)
+        self.assertTrue(2 <= len(result.resources))
+        self.assertIn('num_rows', result.status.keys('127.0.0.1_0'))
+        self.assertTrue(0 < result.status_growth()['127.0.0.1_0.num_rows'])
+        self.assertIn('soak.rss_growth_bytes_per_hour', self.get_record())
+        self.assertNoMemoryGrowth(result, 1024 * 1024 * 1024)
+
+    def test_assertNoMemoryGrowth(self):
+        resources = ResourceSeries()
+        resources.append(0.0, 0.0, 1000, 1, 1)
+        result = SoakResult(LoadResult(), resources, StatusSeries(), 0)
+        self.assertRaises(AssertionError, self.assertNoMemoryGrowth, result)
+        resources.append(3600.0, 0.0, 1000 + 2 * self.max_rss_growth, 1, 1)
+        self.assertRaises(AssertionError, self.assertNoMemoryGrowth, result)
+        self.assertNoMemoryGrowth(result, 3 * self.max_rss_growth)
@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+
+import socket
+
+from jubatest import *
+from jubatest.log import Log, LogFilter
+from jubatest.startup import StartupTiming, measure_startup
+from jubatest.unit import JubaTestFixtureFailedError
+
+from entity import LocalServerNode, LocalServer
+
+class ClusterServer(LocalServer):
+    name = 'test'
+
+    def get_id(self):
+        return '127.0.0.1_%d' % self.port
+
+class StubProxy(object):
+    def __init__(self, polls):
+        self.polls = polls
+
+    def get_cluster_members(self, cluster):
+        self.polls -= 1
+        if 0 < self.polls:
+            return []
+        return [cluster.get_id()]
+
+class StartupTimingTest(JubaTestCase):
+    def test_parse_log(self):
+        timing = StartupTiming().parse_log(LogFilter(Log.parse_logs('localhost', startup_log)))
+        self.assertAlmostEqual(125.0, timing.listen_ms)
+        timing = StartupTiming().parse_log(LogFilter([]))
+        self.assertEqual(None, timing.listen_ms)
+
+    def test_to_record(self):
+        timing = StartupTiming()
+        timing.ready = 0.2
+        timing.listen_ms = 150.0
+        record = timing.to_record('classifier.')
+        self.assertEqual(['classifier.listen_ms', 'classifier.ready_ms'], sorted(record.keys()))
+        self.assertAlmostEqual(200.0, record['classifier.ready_ms'])
+
+class MeasureStartupTest(JubaTestCase):
+    def setUp(self):
+        sock = socket.socket()
+        sock.bind(('127.0.0.1', 0))
+        self.node = LocalServerNode('127.0.0.1', [sock.getsockname()[1]], None, '/tmp', [])
+        sock.close()
+        self.server = ClusterServer(self.node)
+
+    def tearDown(self):
+        if self.server.is_running():
+            self.server.stop()
+
+    def test_standalone(self):
+        timing = measure_startup(self.server)
+        self.assertTrue(self.server.is_running())
+        self.assertTrue(0 <= timing.ready)
+        self.assertEqual(None, timing.registered)
+
+    def test_registered(self):
+        timing = measure_startup(self.server, StubProxy(3))
+        self.assertTrue(timing.ready <= timing.registered)
+
+    def test_not_registered(self):
+        self.assertRaises(JubaTestFixtureFailedError, measure_startup, self.server, StubProxy(1000), 0.5)
+
+startup_log = """\
+2014-08-11 15:07:15,900 5951 INFO  [server_util.cpp:217] starting jubaclassifier 0.6.0 RPC server at 127.0.0.1:9199
+2014-08-11 15:07:16,025 5951 INFO  [server_helper.hpp:221] start listening at port 9199
+"""
@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+
+import pickle
+
+from jubatest import *
+from jubatest.stats import Histogram, linear_fit
+
+class HistogramTest(JubaTestCase):
+    def test_empty(self):
+        h = Histogram()
+        self.assertEqual(0, h.count)
+        self.assertIsNone(h.percentile(50))
+        self.assertIsNone(h.mean())
+        self.assertEqual({}, h.summary())
+
+    def test_percentile(self):
+        h = Histogram()
+        for i in range(1, 1001):
+            h.record(i / 1000.0) # 1ms .. 1000ms
+        self.assertEqual(1000, h.count)
+        self.assertAlmostEqual(0.5, h.percentile(50), delta=0.5 * 0.02)
+        self.assertAlmostEqual(0.99, h.percentile(99), delta=0.99 * 0.02)
+        self.assertAlmostEqual(1.0, h.percentile(100), delta=1.0 * 0.02)
+        self.assertAlmostEqual(0.5005, h.mean(), places=4)
+        self.assertEqual(0.001, h.get_min())
+        self.assertEqual(1.0, h.get_max())
+
+    def test_small_values_exact(self):
+        h = Histogram()
+        h.record(0.000010)
+        h.record(0.000020)
+        self.assertEqual(0.000010, h.percentile(50))
+        self.assertEqual(0.000020, h.percentile(100))
+
+    def test_index_monotonic(self):
+        values = range(0, 100000, 7)
+        indexes = map(Histogram._index, values)
+        self.assertEqual(sorted(indexes), indexes)
+        for v in values:
+            self.assertTrue(v <= Histogram._highest_value(Histogram._index(v)))
+
+    def test_merge(self):
+        h1 = Histogram()
+        h2 = Histogram()
+        h1.record(0.001, 10)
+        h2.record(0.002, 10)
+        h1.merge(h2)
+        self.assertEqual(20, h1.count)
+        self.assertEqual(0.001, h1.get_min())
+        self.assertEqual(0.002, h1.get_max())
+
+    def test_summary(self):
+        h = Histogram()
+        h.record(0.01)
+        record = h.summary('rpc')
+        self.assertAlmostEqual(10.0, record['rpc_p99_9_ms'], delta=0.1)
+        self.assertAlmostEqual(10.0, record['rpc_max_ms'], delta=0.1)
+
+    def test_pickle(self):
+        h = Histogram()
+        h.record(0.01)
+        self.assertEqual(1, pickle.loads(pickle.dumps(h)).count)
+
+class LinearFitTest(JubaTestCase):
+    def test_fit(self):
+        (slope, intercept) = linear_fit([0, 1, 2, 3], [1, 3, 5, 7])
+        self.assertAlmostEqual(2.0, slope)
+        self.assertAlmostEqual(1.0, intercept)
+
+    def test_degenerate(self):
+        self.assertIsNone(linear_fit([], []))
+        self.assertIsNone(linear_fit([1], [1]))
+        self.assertIsNone(linear_fit([1, 1], [1, 2]))
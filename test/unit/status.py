@@ -0,0 +1,105 @@
+# -*- coding: utf-8 -*-
+
+import time
+import threading
+
+from jubatest import *
+from jubatest.status import StatusSeries, StatusPoller
+from jubatest.exceptions import JubaTestAssertionError
+
+from soak import SoakServer
+
+class ProxyServer(SoakServer):
+    """
+    Proxy-like server, which has no cluster name.
+    """
+
+    status_method = 'get_proxy_status'
+
+    def __init__(self):
+        super(ProxyServer, self).__init__()
+        self._server._dispatcher.get_proxy_status = lambda name: {'127.0.0.1_0': {'request_count': '3'}}
+
+    def cluster_name(self):
+        raise JubaTestAssertionError('Cannot assume cluster name for proxies!')
+
+class StatusSeriesTest(JubaTestCase):
+    def test_append(self):
+        series = StatusSeries()
+        series.append(1.0, {'a': {'num_rows': '10', 'version': '1.0.0'}, 'b': {'num_rows': '5'}})
+        series.append(2.0, {'a': {'num_rows': '20', 'version': '1.0.0'}})
+        self.assertEqual(['a', 'b'], series.servers())
+        self.assertEqual(['num_rows'], series.keys())
+        (times, values) = series.get('a', 'num_rows')
+        self.assertEqual([1.0, 2.0], list(times))
+        self.assertEqual([10.0, 20.0], list(values))
+
+    def test_window_delta(self):
+        series = StatusSeries()
+        for t in range(5):
+            series.append(float(t), {'a': {'update_count': str(t * 10)}})
+        self.assertEqual([(1.0, 10.0), (2.0, 20.0)], series.window('a', 'update_count', 1.0, 2.5))
+        self.assertEqual([], series.window('a', 'no_such_key'))
+        self.assertEqual(20.0, series.delta('a', 'update_count', 1.0, 3.0))
+        self.assertIsNone(series.delta('a', 'update_count', 4.0))
+
+    def test_to_record(self):
+        series = StatusSeries()
+        series.append(1.0, {'a': {'update_count': '10'}})
+        series.append(2.0, {'a': {'update_count': '30'}})
+        record = series.to_record('s.')
+        self.assertEqual(30.0, record['s.a.update_count.last'])
+        self.assertEqual(20.0, record['s.a.update_count.delta'])
+
+    def test_concurrent_read(self):
+        series = StatusSeries()
+        def append():
+            for i in range(2000):
+                series.append(float(i), {'s%d' % (i % 50): {'k%d' % i: '1'}})
+        thread = threading.Thread(target=append)
+        thread.start()
+        try:
+            while thread.is_alive():
+                series.servers()
+                series.keys()
+                series.to_record()
+        finally:
+            thread.join()
+        self.assertEqual(2000, len(series.to_record()) // 2)
+
+class StatusPollerTest(JubaTestCase):
+    def setUp(self):
+        self.server = SoakServer()
+
+    def tearDown(self):
+        self.server.stop()
+
+    def test_poll(self):
+        servers = []
+        poller = StatusPoller(lambda: servers, 0.05).start()
+        time.sleep(0.1)
+        self.assertEqual([], poller.series.servers())
+        servers.append(self.server)
+        time.sleep(0.3)
+        poller.stop()
+        (times, values) = poller.series.get('127.0.0.1_0', 'num_rows')
+        self.assertTrue(2 <= len(times))
+        self.assertEqual([], poller.series.keys('no_such_server'))
+
+    def test_poll_failure(self):
+        poller = StatusPoller([self.server])
+        self.server.status_method = 'no_such_method'
+        poller.poll()
+        self.assertEqual([], poller.series.servers())
+        poller.stop()
+
+    def test_poll_proxy(self):
+        proxy = ProxyServer()
+        try:
+            poller = StatusPoller([proxy])
+            poller.poll()
+            poller.stop()
+            self.assertEqual({}, poller._clients) # closed without starting the thread
+        finally:
+            proxy.stop()
+        self.assertEqual([3.0], list(poller.series.get('127.0.0.1_0', 'request_count')[1]))
@@ -1,10 +1,27 @@
 # -*- coding: utf-8 -*-
 
+import os
+import tempfile
 import time
 import unittest
 
 from jubatest import *
-from jubatest.unit import get_suite
+from jubatest.unit import get_suite, BenchmarkResult
+from jubatest.load import LoadGenerator
+
+from load import LocalRPCServer, ClassifierHandler
+
+class MethodWorkloadStub(object):
+    """
+    Workload calling the method with an empty batch.
+    """
+
+    def __init__(self, method):
+        self.method = method
+
+    def calls(self, worker, workers):
+        while True:
+            yield (self.method, ([],))
 
 class JubaTestCaseTest(JubaTestCase):
     class TestCaseStub(JubaTestCase):
@@ -15,11 +32,97 @@ class JubaTestCaseTest(JubaTestCase):
         t = self.TestCaseStub()
         t.assertRunsWithin(2, time.sleep, 1)
 
+    def test_assertRunsWithin_subsecond(self):
+        t = self.TestCaseStub()
+        self.assertRaises(AssertionError, t.assertRunsWithin, 0.1, time.sleep, 0.3)
+
     def test_record(self):
         t = self.TestCaseStub()
         t.attach_record("mydata")
         self.assertEquals("mydata", t.get_record())
 
+    def test_assertRecoversWithin(self):
+        class ResultStub(object):
+            def __init__(self, recovery_time):
+                self._recovery_time = recovery_time
+            def recovery_time(self, event, threshold):
+                return self._recovery_time
+        self.assertRecoversWithin(ResultStub(3.0), 5)
+        self.assertRaises(AssertionError, self.assertRecoversWithin, ResultStub(6.0), 5)
+        self.assertRaises(AssertionError, self.assertRecoversWithin, ResultStub(None), 5)
+
+    def test_assertModelsConsistent(self):
+        class ChecksumStub(object):
+            def __init__(self, sha1):
+                self.sha1 = sha1
+        class ServerStub(object):
+            def __init__(self, server_id, sha1):
+                self.server_id = server_id
+                self.sha1 = sha1
+            def get_id(self):
+                return self.server_id
+            def get_saved_model_checksum(self, model_id):
+                return ChecksumStub(self.sha1)
+        self.assertModelsConsistent([ServerStub('s1', 'abc'), ServerStub('s2', 'abc')], 'm')
+        self.assertModelsConsistent([], 'm')
+        self.assertRaises(AssertionError, self.assertModelsConsistent, [ServerStub('s1', 'abc'), ServerStub('s2', 'def')], 'm')
+
+class JubaBenchmarkCaseTest(JubaTestCase):
+    class BenchmarkStub(JubaBenchmarkCase):
+        warmup = 2
+        iterations = 3
+        def runTest(self):
+            pass
+
+    def test_benchmark(self):
+        calls = []
+        t = self.BenchmarkStub()
+        result = t.benchmark('sleep', lambda x: calls.append(x) or time.sleep(0.01), (1,), operations=10)
+        self.assertEqual(5, len(calls))
+        self.assertEqual(3, len(result.samples))
+        self.assertTrue(0.01 <= result.median())
+        self.assertTrue(result.throughput() <= 1000)
+        self.assertTrue('sleep.median_ms' in t.get_record())
+        t.assertLatencyBelow(result, 1.0, 90)
+        self.assertRaises(AssertionError, t.assertLatencyBelow, result, 0.001)
+        t.assertThroughputAtLeast(result, 1)
+        self.assertRaises(AssertionError, t.assertThroughputAtLeast, result, 100000)
+
+    def test_benchmark_load(self):
+        server = LocalRPCServer(ClassifierHandler())
+        try:
+            t = self.BenchmarkStub()
+            result = t.benchmark('train', LoadGenerator(server, MethodWorkloadStub('train')), (None, 20))
+            self.assertEqual(3, len(result.samples))
+            self.assertTrue(0 < result.median() < 1) # seconds per call
+            self.assertRaises(AssertionError, t.benchmark, 'classify', LoadGenerator(server, MethodWorkloadStub('classify')), (None, 20))
+        finally:
+            server.stop()
+
+    def test_result(self):
+        result = BenchmarkResult('test', [4.0, 1.0, 3.0, 2.0], 2)
+        self.assertAlmostEqual(2.5, result.median())
+        self.assertAlmostEqual(2.5, result.mean())
+        self.assertAlmostEqual(1.0, result.percentile(0))
+        self.assertAlmostEqual(4.0, result.percentile(100))
+        self.assertAlmostEqual(0.8, result.throughput())
+        self.assertAlmostEqual(1.2910, result.stddev(), 4)
+
+    def test_no_regression(self):
+        (fd, path) = tempfile.mkstemp()
+        os.close(fd)
+        os.remove(path)
+        try:
+            t = self.BenchmarkStub()
+            t.baseline_file = path
+            t.assertNoRegression(BenchmarkResult('test', [1.0]))  # records baseline
+            self.assertTrue(os.path.exists(path))
+            t.assertNoRegression(BenchmarkResult('test', [1.05]))
+            self.assertRaises(AssertionError, t.assertNoRegression, BenchmarkResult('test', [1.2]))
+            t.assertNoRegression(BenchmarkResult('test', [1.2]), 0.5)
+        finally:
+            os.remove(path)
+
 class JubaTestLoaderTest(JubaTestCase):
     @classmethod
     def generateTests(cls, env):
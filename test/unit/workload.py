@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+
+import itertools
+
+from jubatest import *
+from jubatest.workload import get_workload, ClassifierWorkload, StatWorkload, GraphWorkload, _State
+from jubatest.unit import JubaTestFixtureFailedError
+
+class SyntheticWorkloadTest(JubaTestCase):
+    def _take(self, workload, n, worker=0):
+        return list(itertools.islice(workload.calls(worker, 2), n))
+
+    def test_deterministic(self):
+        calls1 = self._take(StatWorkload(seed=1), 10)
+        calls2 = self._take(StatWorkload(seed=1), 10)
+        calls3 = self._take(StatWorkload(seed=2), 10)
+        self.assertEqual(calls1, calls2)
+        self.assertNotEqual(calls1, calls3)
+        self.assertNotEqual(calls1, self._take(StatWorkload(seed=1), 10, 1))
+
+    def test_classifier(self):
+        workload = ClassifierWorkload(batch_size=5, features=20, features_per_datum=3, pool_size=7)
+        calls = self._take(workload, 4)
+        self.assertEqual(['train', 'classify', 'train', 'classify'], [c[0] for c in calls])
+        self.assertEqual(5, len(calls[0][1][0]))
+        self.assertEqual(3, len(calls[0][1][0][0].data.num_values))
+        self.assertEqual(5, len(calls[1][1][0]))
+        # pool is reused cyclically
+        self.assertTrue(calls[0][1][0][0].data is calls[1][1][0][2])
+        self.assertEqual(['train', 'classify'], workload.methods())
+
+    def test_query_ratio(self):
+        calls = self._take(StatWorkload(query_ratio=0.5), 9)
+        self.assertEqual(['push', 'push', 'sum'] * 3, [c[0] for c in calls])
+        calls = self._take(StatWorkload(query_ratio=2), 6)
+        self.assertEqual(['push', 'sum', 'sum'] * 2, [c[0] for c in calls])
+        calls = self._take(StatWorkload(query_ratio=0), 3)
+        self.assertEqual(['push'] * 3, [c[0] for c in calls])
+
+    def test_graph(self):
+        # queries are replaced until a node is created
+        calls = self._take(GraphWorkload(), 3)
+        self.assertEqual(['create_node'] * 3, [c[0] for c in calls])
+
+        # only node IDs returned by the server are referred
+        calls = GraphWorkload().calls(0, 1)
+        (method, args, on_result) = next(calls)
+        on_result('42')
+        self.assertEqual(('get_node', ('42',)), next(calls))
+        (method, args, on_result) = next(calls)
+        self.assertEqual('create_node', method)
+        (method, args) = next(calls)
+        self.assertEqual('create_edge', method)
+        self.assertEqual(('42', '42', '42'), (args[0], args[1].source, args[1].target))
+        self.assertEqual(['create_node', 'create_edge', 'get_node'], GraphWorkload().methods())
+
+    def test_created_bounded(self):
+        workload = GraphWorkload()
+        workload.max_created = 10
+        state = _State(workload, 0)
+        for i in range(1000):
+            state.add_created(str(i))
+        self.assertEqual(10, len(state.created))
+        self.assertTrue(any([10 <= int(created_id) for created_id in state.created])) # later IDs are sampled
+
+    def test_get_workload(self):
+        self.assertTrue(isinstance(get_workload(CLASSIFIER, seed=3), ClassifierWorkload))
+        self.assertEqual(3, get_workload(CLASSIFIER, seed=3).seed)
+        self.assertRaises(JubaTestFixtureFailedError, get_workload, 'no_such_engine')